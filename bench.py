@@ -0,0 +1,236 @@
+# -*- coding:utf-8 -*-
+"""数据库访问相关的微基准测试, 连接CREOLE_DB_URL指向的数据库
+
+    python bench.py --cmd baked -n 2000
+    python bench.py --cmd cursor --model Hotel --pages 1,10,100,500 --seed 20000
+    python bench.py --cmd deferred --page-size 20 --seed 2000
+"""
+import argparse
+import datetime
+import timeit
+
+from sqlalchemy import (
+    Integer,
+    SmallInteger,
+    Float,
+    String,
+    Unicode,
+    DateTime,
+)
+
+from creole.model import Base, DBSession
+from creole.model import (  # noqa, 注册所有模型
+    attraction,
+    country,
+    hotel,
+    restaurant,
+    shop,
+    tour_guide,
+    user,
+    vehicle,
+)
+from creole.model.base import BaseMixin
+from creole.model.query_cache import query_cache
+
+
+def _models():
+    return sorted(
+        (cls for cls in Base._decl_class_registry.values()
+         if isinstance(cls, type) and issubclass(cls, BaseMixin)),
+        key=lambda cls: cls.__name__)
+
+
+def _usec_per_call(func, number):
+    return min(timeit.repeat(func, number=number, repeat=3)) / number * 1e6
+
+
+def bench_baked(number):
+    """对比每次构造Query和BakedQuery的get_by_id单次耗时"""
+    session = DBSession()
+    print '%-28s %12s %12s %8s' % ('model', 'query(us)', 'baked(us)', 'saving')
+    legacy_total = baked_total = 0
+    for model in _models():
+        def legacy():
+            session.query(model).filter(model.id==1).first()
+
+        def baked():
+            model.get_by_id(1)
+
+        baked()
+        legacy_us = _usec_per_call(legacy, number)
+        baked_us = _usec_per_call(baked, number)
+        legacy_total += legacy_us
+        baked_total += baked_us
+        print '%-28s %12.1f %12.1f %7.1f%%' % (
+            model.__name__, legacy_us, baked_us,
+            (legacy_us - baked_us) / legacy_us * 100)
+    print '%-28s %12.1f %12.1f %7.1f%%' % (
+        'total', legacy_total, baked_total,
+        (legacy_total - baked_total) / legacy_total * 100)
+    DBSession.remove()
+
+
+def _fake_row(table, index, full_text=False):
+    """按列类型生成一行假数据, 只填不能为空且没有默认值的列
+
+    full_text为True时, 可以为空的字符串列也按最大长度填满, 模拟最大的行
+    """
+    row = {}
+    for column in table.columns:
+        if column.primary_key or column.server_default is not None:
+            continue
+        if column.nullable:
+            if full_text and isinstance(column.type, String) \
+                    and column.type.length:
+                row[column.name] = (
+                    u'\u4ecb' if isinstance(column.type, Unicode) else 'x'
+                ) * column.type.length
+            continue
+        if isinstance(column.type, (Integer, SmallInteger)):
+            row[column.name] = 1
+        elif isinstance(column.type, Float):
+            row[column.name] = 0
+        elif isinstance(column.type, DateTime):
+            row[column.name] = datetime.datetime.now()
+        elif isinstance(column.type, String):
+            value = 'b{}'.format(index)
+            row[column.name] = value[-column.type.length:] \
+                if column.type.length else value
+    return row
+
+
+def _seed(model, number, full_text=False):
+    """插入number行假数据, 返回它们的id范围, 用于结束后删除"""
+    session = DBSession()
+    table = model.__table__
+    start_id = session.execute(
+        table.select().with_only_columns([table.c.id]).order_by(
+            table.c.id.desc()).limit(1)).scalar() or 0
+    for offset in xrange(0, number, 1000):
+        session.execute(table.insert(), [
+            _fake_row(table, start_id + index + 1, full_text)
+            for index in xrange(offset, min(offset + 1000, number))])
+    session.commit()
+    return start_id
+
+
+def bench_cursor(model_name, pages, page_size, number, seed):
+    """对比offset分页和cursor分页在不同页深度的单次耗时"""
+    model = Base._decl_class_registry[model_name]
+    session = DBSession()
+    # 不走查询缓存, 每次都真正查库
+    query_cache.max_size = 0
+    start_id = _seed(model, seed) if seed else None
+    try:
+        print '%-8s %12s %12s' % ('page', 'offset(us)', 'cursor(us)')
+        for page in pages:
+            cursor = session.query(model.id).order_by(model.id).offset(
+                (page - 1) * page_size - 1).limit(1).scalar() \
+                if page > 1 else 0
+            if cursor is None:
+                print '%-8d not enough rows' % page
+                break
+
+            def offset():
+                model.search(page=page, number=page_size)
+
+            def keyset():
+                model.search(cursor=cursor, number=page_size)
+
+            print '%-8d %12.1f %12.1f' % (
+                page, _usec_per_call(offset, number),
+                _usec_per_call(keyset, number))
+    finally:
+        if start_id is not None:
+            _delete_seeded(model, start_id)
+        DBSession.remove()
+
+
+def _row_bytes(row):
+    """一行结果的大致字节数: 字符串按utf-8编码的长度, 其他非空值按8字节"""
+    size = 0
+    for value in row:
+        if isinstance(value, unicode):
+            size += len(value.encode('utf-8'))
+        elif isinstance(value, str):
+            size += len(value)
+        elif value is not None:
+            size += 8
+    return size
+
+
+def _delete_seeded(model, start_id):
+    session = DBSession()
+    session.rollback()
+    session.execute(model.__table__.delete().where(
+        model.__table__.c.id > start_id))
+    session.commit()
+
+
+def bench_deferred(page_size, number, seed):
+    """对比加载全部列(延迟加载之前)和不加载延迟列组时, 读一页数据的字节数和耗时"""
+    session = DBSession()
+    query_cache.max_size = 0
+    print '%-12s %12s %12s %10s %12s %12s' % (
+        'model', 'all(bytes)', 'lazy(bytes)', 'saving',
+        'all(us)', 'lazy(us)')
+    for model in _models():
+        if not model.DEFERRED_GROUPS:
+            continue
+        start_id = _seed(model, seed, full_text=True) if seed else None
+        try:
+            eager_query = model._undefer_groups(
+                session.query(model)).limit(page_size)
+            lazy_query = session.query(model).limit(page_size)
+
+            def _bytes(query):
+                return sum(_row_bytes(row)
+                           for row in session.execute(query.statement))
+
+            def eager():
+                session.expunge_all()
+                eager_query.all()
+
+            def lazy():
+                session.expunge_all()
+                lazy_query.all()
+
+            eager_bytes = _bytes(eager_query)
+            lazy_bytes = _bytes(lazy_query)
+            print '%-12s %12d %12d %9.1f%% %12.1f %12.1f' % (
+                model.__name__, eager_bytes, lazy_bytes,
+                (eager_bytes - lazy_bytes) * 100.0 / eager_bytes
+                if eager_bytes else 0,
+                _usec_per_call(eager, number), _usec_per_call(lazy, number))
+        finally:
+            if start_id is not None:
+                _delete_seeded(model, start_id)
+    DBSession.remove()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-c', '--cmd', help='benchmark',
+                        choices=['baked', 'cursor', 'deferred'])
+    parser.add_argument('-n', '--number', type=int, default=2000,
+                        help='calls per measurement')
+    parser.add_argument('--model', default='Hotel',
+                        help='model to paginate, for cursor')
+    parser.add_argument('--pages', default='1,10,100,500',
+                        help='comma separated page numbers, for cursor')
+    parser.add_argument('--page-size', type=int, default=20,
+                        help='rows per page, for cursor and deferred')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='insert fake rows before and delete them after')
+    args = parser.parse_args()
+
+    if args.cmd and args.cmd == 'baked':
+        bench_baked(args.number)
+    elif args.cmd and args.cmd == 'cursor':
+        pages = [int(page) for page in args.pages.split(',')]
+        bench_cursor(args.model, pages, args.page_size, args.number, args.seed)
+    elif args.cmd and args.cmd == 'deferred':
+        bench_deferred(args.page_size, args.number, args.seed)
+
+if __name__ == '__main__':
+    main()
@@ -1,50 +1,257 @@
+# coding: utf-8
 import logging
 import functools
+import random
+import time
 import uuid
+from contextlib import contextmanager
 
 import gevent
-from sqlalchemy import create_engine as sqlalchemy_create_engine
+from sqlalchemy import event, create_engine as sqlalchemy_create_engine
 from sqlalchemy.orm import Session, sessionmaker, scoped_session
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import SQLAlchemyError, TimeoutError
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.sql.expression import Select, CompoundSelect, UpdateBase
 
 from .config import setting
+from . import profiler
 
 logger = logging.getLogger(__name__)
 
 
 class RoutingSession(Session):
-    def __init__(self, engine, *args, **kwargs):
+    """读写分离的Session
+
+    只读的SELECT语句路由到从库, 其余语句(以及flush)都走主库;
+    一旦本Session写过数据(flush, query.update/delete或者execute执行
+    INSERT/UPDATE/DELETE), 之后的读也固定走主库, 避免读到从库延迟的数据.
+    commit/close之后仍然保持, 直到请求结束时`remove_sessions`丢弃Session.
+    """
+    def __init__(self, engine, replica_engines=None, *args, **kwargs):
         super(RoutingSession, self).__init__(*args, **kwargs)
         self.engine = engine
+        self.replica_engines = replica_engines or []
+        self.stick_to_primary = False
 
     def get_bind(self, mapper=None, clause=None):
-        return self.engine
+        if isinstance(clause, UpdateBase):
+            # query.update/delete和execute(DML)不触发after_flush
+            self.stick_to_primary = True
+        if self._flushing or self.stick_to_primary \
+                or not self.replica_engines:
+            return self.engine
+        if not _is_read_only(clause):
+            return self.engine
+        return random.choice(self.replica_engines)
 
     def rollback(self):
         with gevent.Timeout(5):
             super(RoutingSession, self).rollback()
 
     def close(self):
+        # 不重置stick_to_primary: commit装饰器在每次提交后close,
+        # 同一请求之后的读仍要读到刚写入的数据
         with gevent.Timeout(5):
             super(RoutingSession, self).close()
 
 
-def make_session(engine, info=None):
+def _is_read_only(clause):
+    if not isinstance(clause, (Select, CompoundSelect)):
+        return False
+    # SELECT ... FOR UPDATE需要在主库加锁
+    return getattr(clause, '_for_update_arg', None) is None
+
+
+def _stick_to_primary_after_write(session, flush_context):
+    if session.new or session.dirty or session.deleted:
+        session.stick_to_primary = True
+
+
+@contextmanager
+def read_from_primary(session):
+    """with块内session的读都走主库, 结束后恢复原来的设置"""
+    stick_to_primary = session.stick_to_primary
+    session.stick_to_primary = True
+    try:
+        yield session
+    finally:
+        session.stick_to_primary = stick_to_primary
+
+
+def make_session(engine, replica_engines=None, info=None):
+    # 每个greenlet(即每个请求)一个Session, 请求结束时需要调用remove()
     session = scoped_session(
         session_factory=sessionmaker(
             class_=RoutingSession,
             expire_on_commit=False,
             engine=engine,
-            info=info or {"name": uuid.uuid4.hex},
+            replica_engines=replica_engines,
+            info=info or {"name": uuid.uuid4().hex},
         ),
-        scopefunc=None
+        scopefunc=gevent.getcurrent
     )
+    # sessionmaker生成的是RoutingSession的子类, 监听要注册在它上面,
+    # 注册在RoutingSession上不会生效
+    event.listen(session, 'after_flush', _stick_to_primary_after_write)
     return session
 
 
+class PoolAdmissionError(TimeoutError):
+    """等待连接的请求超过准入队列长度时直接拒绝"""
+
+
+class PoolStats(object):
+    def __init__(self, name):
+        self.name = name
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.max_checked_out = 0
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.connect_total = 0.0
+        self.connect_max = 0.0
+        self.timeouts = 0
+        self.rejected = 0
+
+    def record_wait(self, seconds):
+        self.wait_count += 1
+        self.wait_total += seconds
+        self.wait_max = max(self.wait_max, seconds)
+
+    def record_connect(self, seconds):
+        self.connects += 1
+        self.connect_total += seconds
+        self.connect_max = max(self.connect_max, seconds)
+
+    def as_dict(self, pool):
+        def _avg_ms(total, count):
+            return round(total * 1000 / count, 3) if count else 0
+        return {
+            'pool_size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'overflow': pool.overflow(),
+            'max_overflow': pool._max_overflow,
+            'waiting': pool.waiting,
+            'admission_queue_size': pool.admission_queue_size,
+            'max_checked_out': self.max_checked_out,
+            'checkouts': self.checkouts,
+            'checkins': self.checkins,
+            'connects': self.connects,
+            'timeouts': self.timeouts,
+            'rejected': self.rejected,
+            'wait_avg_ms': _avg_ms(self.wait_total, self.wait_count),
+            'wait_max_ms': round(self.wait_max * 1000, 3),
+            'connect_avg_ms': _avg_ms(self.connect_total, self.connects),
+            'connect_max_ms': round(self.connect_max * 1000, 3),
+        }
+
+
+class AdmissionQueuePool(QueuePool):
+    """带准入队列和统计信息的连接池
+
+    连接全部被占用时, 最多允许`admission_queue_size`个请求排队等待,
+    每个请求最多等待`pool_timeout`秒, 超出的请求直接抛出TimeoutError,
+    由接口层返回503, 而不是继续向MySQL申请新连接.
+    """
+    stats = None
+    admission_queue_size = None
+
+    def __init__(self, *args, **kwargs):
+        super(AdmissionQueuePool, self).__init__(*args, **kwargs)
+        self.waiting = 0
+
+    def setup(self, name, admission_queue_size=None):
+        self.stats = PoolStats(name)
+        self.admission_queue_size = admission_queue_size
+        return self
+
+    def _do_get(self):
+        if self.stats is None:
+            return super(AdmissionQueuePool, self)._do_get()
+        # 空闲连接用完并且不能再溢出时才需要等待, 只有这种情况进准入队列
+        if self._max_overflow > -1 and self._pool.empty() \
+                and self._overflow >= self._max_overflow:
+            conn = self._wait_get()
+        else:
+            conn = super(AdmissionQueuePool, self)._do_get()
+        self.stats.checkouts += 1
+        self.stats.max_checked_out = max(
+            self.stats.max_checked_out, self.checkedout())
+        return conn
+
+    def _wait_get(self):
+        if self.admission_queue_size is not None \
+                and self.waiting >= self.admission_queue_size:
+            self.stats.rejected += 1
+            raise PoolAdmissionError(
+                'Pool admission queue of %s is full, %d waiting' %
+                (self.stats.name, self.waiting))
+        self.waiting += 1
+        start = time.time()
+        try:
+            return super(AdmissionQueuePool, self)._do_get()
+        except TimeoutError:
+            self.stats.timeouts += 1
+            raise
+        finally:
+            self.waiting -= 1
+            self.stats.record_wait(time.time() - start)
+
+    def _do_return_conn(self, conn):
+        if self.stats is not None:
+            self.stats.checkins += 1
+        super(AdmissionQueuePool, self)._do_return_conn(conn)
+
+    def _create_connection(self):
+        if self.stats is None:
+            return super(AdmissionQueuePool, self)._create_connection()
+        start = time.time()
+        try:
+            return super(AdmissionQueuePool, self)._create_connection()
+        finally:
+            self.stats.record_connect(time.time() - start)
+
+    def recreate(self):
+        # 统计在连接池内部计数, 不注册事件监听, 新池沿用旧池的dispatch
+        # 也不会重复计数; 累计的统计数据延续到新池
+        pool = super(AdmissionQueuePool, self).recreate()
+        pool.stats = self.stats
+        pool.admission_queue_size = self.admission_queue_size
+        return pool
+
+
+class SessionStats(object):
+    def __init__(self, name):
+        self.name = name
+        self.removes = 0
+        self.identity_map_total = 0
+        self.identity_map_max = 0
+        self.identity_map_last = 0
+
+    def record_remove(self, identity_map_size):
+        self.removes += 1
+        self.identity_map_total += identity_map_size
+        self.identity_map_max = max(self.identity_map_max, identity_map_size)
+        self.identity_map_last = identity_map_size
+
+    def as_dict(self):
+        return {
+            'removes': self.removes,
+            'identity_map_avg': round(
+                float(self.identity_map_total) / self.removes, 3)
+            if self.removes else 0,
+            'identity_map_max': self.identity_map_max,
+            'identity_map_last': self.identity_map_last,
+        }
+
+
 class DBManager(object):
     def __init__(self):
         self._session_map = {}
+        self._engine_map = {}
+        self._session_stats = {}
 
     def create_sessions(self):
         for db, db_config in setting.DB_SETTINGS.iteritems():
@@ -62,18 +269,64 @@ class DBManager(object):
             raise ValueError('Duplicate session name `{}`' % db)
         session = self._create_session(db, db_config)
         self._session_map[db] = session
+        self._session_stats[db] = SessionStats(db)
         return session
 
+    def remove_sessions(self, invalidate=False):
+        """关闭并丢弃当前greenlet持有的Session, 归还连接
+
+        `invalidate`为True时(如语句执行中被gevent.Timeout打断),
+        连接的状态不可信, 直接丢弃而不是放回连接池.
+        """
+        for name, session in self._session_map.iteritems():
+            if not session.registry.has():
+                continue
+            try:
+                self._session_stats[name].record_remove(
+                    len(session().identity_map))
+                if invalidate:
+                    session().invalidate()
+            finally:
+                session.remove()
+
+    def get_session_stats(self):
+        return {
+            name: stats.as_dict()
+            for name, stats in self._session_stats.iteritems()
+        }
+
     def _create_session(self, db_name, db_config):
-        engine = self.create_engine(db_name, **db_config) 
-        return make_session(engine, info={"name": db_name})
+        db_config = dict(db_config)
+        replica_urls = db_config.pop('replica_urls', None) or []
+        engine = self.create_engine(db_name, **db_config)
+        replica_engines = [
+            self.create_engine(
+                '{}.replica.{}'.format(db_name, index),
+                **dict(db_config, url=url))
+            for index, url in enumerate(replica_urls)
+        ]
+        return make_session(
+            engine, replica_engines=replica_engines, info={"name": db_name})
 
     def create_engine(self, db, *args, **kwargs):
         url = kwargs.pop('url')
+        admission_queue_size = kwargs.pop('admission_queue_size', None)
+        kwargs.setdefault('poolclass', AdmissionQueuePool)
         engine = sqlalchemy_create_engine(url, **kwargs)
+        if isinstance(engine.pool, AdmissionQueuePool):
+            engine.pool.setup(db, admission_queue_size)
+        profiler.instrument_engine(engine)
+        self._engine_map[db] = engine
         logger.info('db: %s inited.', db)
         return engine
 
+    def get_pool_stats(self):
+        return {
+            name: engine.pool.stats.as_dict(engine.pool)
+            for name, engine in self._engine_map.iteritems()
+            if getattr(engine.pool, 'stats', None) is not None
+        }
+
 def gen_commit_deco(DBSession, raise_exc, error_type):
     def decorated(func):
         @functools.wraps(func)
@@ -6,6 +6,7 @@ class BaseCreoleErrCode(object):
 
     # database error
     DATABASE_ERROR = 1101
+    DATABASE_BUSY = 1102
 
     # service error
     VALIDATION_ERROR = 2001
@@ -73,6 +74,7 @@ class BaseCreoleErrCode(object):
     HOTEL_ACCOUNT_DUPLICATED = 3088
     HOTEL_COMPANY_NOT_EXIST = 3089
     HOTEL_COMPANY_DUPLICATED = 3090
+    HOTEL_PRICE_OVERLAPPED = 3091
 
 
 class CreoleErrCode(BaseCreoleErrCode):
@@ -85,6 +87,7 @@ TRANSLATIONS = {
 
     # database error
     CreoleErrCode.DATABASE_ERROR: u'database error',
+    CreoleErrCode.DATABASE_BUSY: u'database busy, please retry later',
 
     # service error
     CreoleErrCode.VALIDATION_ERROR: u'validation error',
@@ -141,6 +144,7 @@ TRANSLATIONS = {
     CreoleErrCode.MEAL_PRICE_NOT_EXIST: u'the meal price does not exist',
     CreoleErrCode.FESTIVAL_PRICE_NOT_EXIST: u'the festival price does not exist',
     CreoleErrCode.ROOM_ADDITIONAL_PRICE_NOT_EXIST: u'the room additional price does not exist',
+    CreoleErrCode.HOTEL_PRICE_OVERLAPPED: u'the date range of the price overlaps another price',
 }
 
 
@@ -13,6 +13,11 @@ from sqlalchemy.ext.declarative import declared_attr
 
 from . import Base, DBSession
 from .base import BaseMixin
+from . import fulltext
+from .geo import geo_index
+from .mixins import GeoMixin
+from ..redis import entity_cache
+from .lookup import reference_lookup
 from .country import Country, City
 from ..exc import (
     raise_error_json,
@@ -50,9 +55,7 @@ class AttractionFee(Base, BaseMixin):
 
     @classmethod
     def get_by_attraction_id(cls, attraction_id):
-        session = DBSession()
-        fee = session.query(cls).filter(
-            cls.attraction_id==attraction_id).first()
+        fee = cls._get_by_column('attraction_id', attraction_id).first()
         return fee
 
     @classmethod
@@ -110,7 +113,7 @@ class AttractionFee(Base, BaseMixin):
             session.flush()
 
 
-class Attraction(Base, BaseMixin):
+class Attraction(Base, BaseMixin, GeoMixin):
     __tablename__ = 'attraction'
 
     country_id = Column(Integer, nullable=False, doc=u'国家id')
@@ -133,30 +136,30 @@ class Attraction(Base, BaseMixin):
 
     @validates('country_id')
     def _validate_country_id(self, key, country_id):
-        country = DBSession().query(Country).filter(
-            Country.id==country_id).first()
-        if not country:
+        if not reference_lookup.exists(Country, country_id):
             raise_error_json(InvalidateError(args=('country_id', country_id,)))
         return country_id
 
     @classmethod
     def _validate_country_and_city(cls, country_id, city_id):
-        city = DBSession().query(City).filter(City.id==city_id).first()
+        city = reference_lookup.get(City, city_id)
         if not city:
             raise_error_json(ClientError(errcode=CreoleErrCode.CITY_NOT_EXIST))
-        elif city.country_id != country_id:
+        elif city['country_id'] != country_id:
             raise_error_json(InvalidateError(errcode=CreoleErrCode.COUNTRY_NOT_EXIST))
 
     @classmethod
     def create(cls, country_id, city_id, address, name,
-               name_en, nickname_en, intro_cn, intro_en, note=None):
+               name_en, nickname_en, intro_cn, intro_en, note=None,
+               latitude=None, longitude=None):
         cls._validate_country_and_city(country_id, city_id)
         session = DBSession()
         attraction = cls(
             country_id=country_id, city_id=city_id,
             address=address, name=name, name_en=name_en,
             nickname_en=nickname_en, note=note,
-            intro_cn=intro_cn, intro_en=intro_en)
+            intro_cn=intro_cn, intro_en=intro_en,
+            latitude=latitude, longitude=longitude)
         session.add(attraction)
         try:
             session.flush()
@@ -178,6 +181,7 @@ class Attraction(Base, BaseMixin):
             setattr(attraction, k, v)
         session = DBSession()
         session.merge(attraction)
+        entity_cache.invalidate(cls.__tablename__, id)
         try:
             session.flush()
         except IntegrityError:
@@ -193,12 +197,14 @@ class Attraction(Base, BaseMixin):
             raise_error_json(
                 ClientError(errcode=CreoleErrCode.ATTRACTION_NOT_EXIST))
         session.delete(attraction)
+        entity_cache.invalidate(cls.__tablename__, id)
         session.flush()
 
     @classmethod
-    def search(cls, country_id=None, city_id=None, name=None, page=1, number=20):
+    def search(cls, country_id=None, city_id=None, name=None, page=1, number=20,
+               cursor=None, q=None, fields=None):
         """根据国家或者城市id查找"""
-        query = DBSession().query(cls)
+        query = cls._load_only(DBSession().query(cls), fields)
         total = None
         if name:
             attraction_list = query.filter(cls.name==name).all()
@@ -207,7 +213,16 @@ class Attraction(Base, BaseMixin):
                 query = query.filter(cls.city_id==city_id)
             elif country_id:
                 query = query.filter(cls.country_id==country_id)
-            if page == 1:
-                total = query.count()
-            attraction_list = query.offset((page - 1) * number).limit(number).all()
+            if q:
+                query = fulltext.search(query, cls, q)
+            attraction_list, total = cls._paginate(query, page, number, cursor)
         return attraction_list, total
+
+
+fulltext.register(
+    Attraction,
+    fulltext.FullTextIndex('ft_intro_cn', ['intro_cn'], fulltext.CN),
+    fulltext.FullTextIndex('ft_intro_en', ['intro_en'], fulltext.EN),
+)
+
+geo_index.register('attraction', Attraction)
@@ -5,10 +5,20 @@ from sqlalchemy import (
     DateTime,
     text,
     Index,
+    bindparam,
 )
+from sqlalchemy.ext import baked
 from sqlalchemy.ext.declarative import declared_attr
+from sqlalchemy.orm import load_only, undefer_group
 
 from . import DBSession
+from ..exc import raise_error_json, InvalidateError
+from .query_cache import query_cache
+from .count_cache import count_cache
+
+bakery = baked.bakery()
+# IN查询每批的最大参数个数
+IN_CHUNK_SIZE = 500
 
 
 class BaseMixin(object):
@@ -19,6 +29,10 @@ class BaseMixin(object):
             Index('ix_updated_at', 'updated_at'),
         )
 
+    # 延迟加载(deferred)的列组, 只在查询详情或列表时一起加载,
+    # update()和校验中的get_by_id不会读取这些大字段
+    DEFERRED_GROUPS = ()
+
     id = Column(Integer, primary_key=True)
     created_at = Column(DateTime, nullable=False,
                         server_default=text('CURRENT_TIMESTAMP'))
@@ -28,7 +42,105 @@ class BaseMixin(object):
                         ))
 
     @classmethod
-    def get_by_id(cls, id):
+    def _baked_query_by(cls, column_name):
+        """按列等值查询的BakedQuery, 编译后的SQL按(模型, 列)缓存"""
+        baked_query = bakery(lambda session: session.query(cls), cls)
+        baked_query += (
+            lambda q: q.filter(
+                getattr(cls, column_name)==bindparam(column_name)),
+            column_name,
+        )
+        return baked_query
+
+    @classmethod
+    def _get_by_column(cls, column_name, value):
+        """返回baked Result, 调用方再取.first()或.all()"""
+        return cls._baked_query_by(column_name)(DBSession()).params(
+            **{column_name: value})
+
+    @classmethod
+    def _get_by_column_in(cls, column_name, values, chunk_size=IN_CHUNK_SIZE,
+                          undefer=False):
+        """按列批量查询, values过多时分批执行IN查询"""
+        values = list(set(values))
         session = DBSession()
-        obj = session.query(cls).filter(cls.id==id).first()
-        return obj
+        column = getattr(cls, column_name)
+        query = session.query(cls)
+        if undefer:
+            query = cls._undefer_groups(query)
+        obj_list = []
+        for index in xrange(0, len(values), chunk_size):
+            obj_list.extend(query.filter(
+                column.in_(values[index:index + chunk_size])).all())
+        return obj_list
+
+    @classmethod
+    def _undefer_groups(cls, query):
+        for group in cls.DEFERRED_GROUPS:
+            query = query.options(undefer_group(group))
+        return query
+
+    @classmethod
+    def get_by_id(cls, id):
+        return cls._get_by_column('id', id).first()
+
+    @classmethod
+    def get_by_ids(cls, ids, chunk_size=IN_CHUNK_SIZE):
+        """根据id列表批量查询, 返回{id: obj}, 不存在的id不在结果中"""
+        return {
+            obj.id: obj
+            for obj in cls._get_by_column_in('id', ids, chunk_size)
+        }
+
+    @classmethod
+    def get_detail_by_id(cls, id):
+        """同get_by_id, 但同时加载延迟加载的列, 用于返回详情"""
+        if not cls.DEFERRED_GROUPS:
+            return cls.get_by_id(id)
+        return cls._undefer_groups(DBSession().query(cls)).filter(
+            cls.id==id).first()
+
+    @classmethod
+    def get_details_by_ids(cls, ids, chunk_size=IN_CHUNK_SIZE):
+        """同get_by_ids, 但同时加载延迟加载的列"""
+        return {
+            obj.id: obj
+            for obj in cls._get_by_column_in(
+                'id', ids, chunk_size, undefer=True)
+        }
+
+    @classmethod
+    def validate_fields(cls, fields):
+        for field in fields:
+            if field not in cls.__table__.columns:
+                raise_error_json(InvalidateError(args=('fields', field,)))
+
+    @classmethod
+    def _load_only(cls, query, fields=None):
+        """只查询fields中的列(主键总会查询), fields为空时查询所有列,
+        包括延迟加载的列"""
+        if not fields:
+            return cls._undefer_groups(query)
+        cls.validate_fields(fields)
+        return query.options(load_only(*fields))
+
+    @classmethod
+    def _paginate(cls, query, page, number, cursor=None):
+        """分页查询, 返回(结果列表, 总数)
+
+        传了cursor(上一页最后一条的id)时按id做keyset分页, 查询耗时与翻到第几页无关,
+        不计算总数; 否则沿用offset分页, 只有第一页计算总数.
+        offset分页在原有排序之后再按id排序: 没有其他排序时页与页之间不会
+        重复或遗漏, 最后一条的id也可以作为下一页的cursor.
+        """
+        if cursor is not None:
+            # 丢掉原有排序(如全文检索的相关度), cursor分页只能按id排序
+            query = query.filter(cls.id > cursor).order_by(None).order_by(
+                cls.id)
+            return query_cache.all(query.limit(number)), None
+        total = None
+        if page == 1:
+            total = count_cache.count(query)
+        obj_list = query_cache.all(
+            query.order_by(cls.id).offset((page - 1) * number).limit(number))
+        return obj_list, total
@@ -0,0 +1,334 @@
+# coding: utf-8
+"""从CSV/JSON文件批量导入资源, 用于新开国家时一次录入大量酒店, 餐厅, 景点等
+
+`python db.py --cmd import --entity hotel --file hotel.csv`
+
+输入按批处理, 每批:
+
+1. 按列类型转换取值: CSV中都是字符串, 空串视为NULL; 时间列接受时间戳,
+   与`/export/<entity>`导出的格式一致, 导出的文件可以直接导入;
+2. 整批预取引用的国家, 城市, 公司等(每张表一次IN查询), 再逐行执行模型上
+   的校验(`@validates`和国家/城市是否匹配), 校验不再逐行查库;
+3. 唯一列先在文件内查重, 再到库里查重(每列一次IN查询);
+4. 通过校验的行用`bulk_insert_mappings`(executemany)插入, 每批一个事务.
+   插入仍然失败时(比如并发写入了重复的行)回滚该批, 再逐行插入找出失败的行.
+
+被拒绝的行以NDJSON写入拒绝文件(行号, 原因, 原始数据), 不影响其他行导入.
+导入在独立的进程中执行, web进程中的查询缓存按各自的TTL过期.
+"""
+import csv
+import json
+import datetime
+
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+
+from . import DBSession
+from .base import IN_CHUNK_SIZE
+from .lookup import reference_lookup
+from .geo import geo_index
+from .country import Country, City
+from .hotel import Hotel, HotelCompany
+from .restaurant import Restaurant
+from .attraction import Attraction
+from .shop import Shop, ShopCompany
+from .tour_guide import TourGuide
+from .vehicle import Vehicle, VehicleCompany, VehicleType
+from ..util import timestamp_to_date
+from ..exc import raise_error_json, ClientError, InvalidateError
+
+IMPORT_BATCH_SIZE = 1000
+
+# 导出文件中带有这些列, 导入时忽略, 由数据库生成
+IGNORED_COLUMNS = ('id', 'created_at', 'updated_at')
+
+# 所有资源共有的引用列
+COMMON_REFERENCES = {'country_id': Country, 'city_id': City}
+
+# entity -> (model, {列名: 引用的模型})
+IMPORT_SPECS = {
+    'hotel': (Hotel, {'company_id': HotelCompany}),
+    'hotel_company': (HotelCompany, {}),
+    'restaurant': (Restaurant, {}),
+    'attraction': (Attraction, {}),
+    'shop': (Shop, {'company_id': ShopCompany}),
+    'shop_company': (ShopCompany, {}),
+    'tour_guide': (TourGuide, {}),
+    'vehicle': (Vehicle, {
+        'company_id': VehicleCompany, 'vehicle_type_id': VehicleType}),
+    'vehicle_company': (VehicleCompany, {}),
+}
+
+
+class ImportResult(object):
+    def __init__(self):
+        self.read = 0
+        self.inserted = 0
+        self.rejected = 0
+
+    def __repr__(self):
+        return '<ImportResult read={} inserted={} rejected={}>'.format(
+            self.read, self.inserted, self.rejected)
+
+
+class RejectWriter(object):
+    """把被拒绝的行写成NDJSON, 没有指定文件时只计数"""
+
+    def __init__(self, result, fileobj=None):
+        self.result = result
+        self.fileobj = fileobj
+
+    def write(self, line_no, raw, reason):
+        self.result.rejected += 1
+        if self.fileobj is None:
+            return
+        self.fileobj.write(json.dumps(
+            {'line': line_no, 'reason': reason, 'row': raw},
+            ensure_ascii=False, default=repr).encode('utf-8') + '\n')
+
+
+def iter_csv(fileobj):
+    """第一行是列名, 返回(行号, {列名: 值})"""
+    reader = csv.reader(fileobj)
+    header = next(reader, None)
+    if header is None:
+        return
+    header = [name.decode('utf-8-sig').strip() for name in header]
+    for values in reader:
+        if not values:
+            continue
+        yield reader.line_num, dict(
+            zip(header, [value.decode('utf-8') for value in values]))
+
+
+def iter_json(fileobj):
+    """JSON对象数组, 返回(序号, 对象)"""
+    for index, row in enumerate(json.load(fileobj)):
+        yield index + 1, row
+
+
+def iter_ndjson(fileobj):
+    """每行一个JSON对象(/export的输出), 返回(行号, 对象)
+
+    不是合法JSON的行原样返回, 由校验拒绝
+    """
+    for index, line in enumerate(fileobj):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield index + 1, json.loads(line)
+        except ValueError:
+            yield index + 1, line.decode('utf-8', 'replace')
+
+
+READERS = {
+    'csv': iter_csv,
+    'json': iter_json,
+    'ndjson': iter_ndjson,
+    'jsonl': iter_ndjson,
+}
+
+
+def _convert(column, value):
+    if value is None or value == '':
+        return None
+    python_type = column.type.python_type
+    try:
+        if python_type is datetime.datetime:
+            if isinstance(value, datetime.datetime):
+                return value
+            return timestamp_to_date(int(value))
+        if python_type in (int, float):
+            return python_type(value)
+    except (TypeError, ValueError):
+        raise_error_json(InvalidateError(args=(column.name, value,)))
+    return value
+
+
+def _coerce_row(table, required_columns, raw):
+    if not isinstance(raw, dict):
+        raise_error_json(InvalidateError(args=('row', raw,)))
+    row = {}
+    for name, value in raw.iteritems():
+        if name in IGNORED_COLUMNS:
+            continue
+        if name not in table.c:
+            raise_error_json(InvalidateError(args=(name, value,)))
+        value = _convert(table.c[name], value)
+        if value is not None:
+            row[name] = value
+    for name in required_columns:
+        if name not in row:
+            raise_error_json(InvalidateError(args=(name, None,)))
+    return row
+
+
+def _validate_row(model, row):
+    # 构造一个不加入Session的对象, 触发模型上的@validates
+    model(**row)
+    if 'city_id' in row and hasattr(model, '_validate_country_and_city'):
+        model._validate_country_and_city(row.get('country_id'), row['city_id'])
+
+
+class BulkImporter(object):
+    def __init__(self, model, references=None, batch_size=IMPORT_BATCH_SIZE):
+        self.model = model
+        self.table = model.__table__
+        self.batch_size = batch_size
+        self.references = dict(COMMON_REFERENCES, **(references or {}))
+        self.required_columns = [
+            column.name for column in self.table.c
+            if not column.nullable and not column.primary_key
+            and column.default is None and column.server_default is None
+        ]
+        self.unique_columns = [
+            column for column in self.table.c
+            if column.unique and column.name not in IGNORED_COLUMNS
+        ]
+        # 列名 -> 文件中已经插入成功的值
+        self._seen = {column.name: set() for column in self.unique_columns}
+
+    def run(self, rows, reject_file=None):
+        """导入(行号, 原始数据)序列, 被拒绝的行写入reject_file, 返回ImportResult"""
+        result = ImportResult()
+        reject_writer = RejectWriter(result, reject_file)
+        session = DBSession()
+        # 查重要读到刚提交的行, 不能读从库
+        session.stick_to_primary = True
+        try:
+            batch = []
+            for line_no, raw in rows:
+                result.read += 1
+                batch.append((line_no, raw))
+                if len(batch) >= self.batch_size:
+                    result.inserted += self._import_batch(batch, reject_writer)
+                    batch = []
+            if batch:
+                result.inserted += self._import_batch(batch, reject_writer)
+        finally:
+            DBSession.remove()
+        return result
+
+    def _import_batch(self, batch, reject_writer):
+        items = []
+        for line_no, raw in batch:
+            try:
+                items.append(
+                    (line_no, raw,
+                     _coerce_row(self.table, self.required_columns, raw)))
+            except ClientError as e:
+                reject_writer.write(line_no, raw, e.msg)
+        self._prime_references(items)
+
+        valid_items = []
+        for line_no, raw, row in items:
+            try:
+                _validate_row(self.model, row)
+            except ClientError as e:
+                reject_writer.write(line_no, raw, e.msg)
+            else:
+                valid_items.append((line_no, raw, row))
+        valid_items = self._check_unique(valid_items, reject_writer)
+        if not valid_items:
+            return 0
+        inserted = self._insert(valid_items, reject_writer)
+        if any('latitude' in row for _, _, row in valid_items):
+            # bulk_insert_mappings不触发Session事件, 通知各进程重新加载坐标索引
+            geo_index.bump_version()
+            DBSession().commit()
+        return inserted
+
+    def _prime_references(self, items):
+        for column_name, model in self.references.iteritems():
+            if column_name in self.table.c:
+                reference_lookup.prime(
+                    model, [row.get(column_name) for _, _, row in items])
+
+    def _get_existing(self, column, values):
+        session = DBSession()
+        values = list(values)
+        existing = set()
+        for index in xrange(0, len(values), IN_CHUNK_SIZE):
+            existing.update(value for value, in session.execute(
+                select([column]).where(
+                    column.in_(values[index:index + IN_CHUNK_SIZE]))))
+        return existing
+
+    def _check_unique(self, items, reject_writer):
+        existing_map = {}
+        for column in self.unique_columns:
+            values = set(
+                row[column.name] for _, _, row in items if column.name in row)
+            existing_map[column.name] = self._get_existing(column, values)
+
+        # 本批中已经出现过的值; 插入成功之后才记到self._seen,
+        # 插入失败的行不影响文件中后面同名的行
+        batch_seen = {column.name: set() for column in self.unique_columns}
+        unique_items = []
+        for line_no, raw, row in items:
+            duplicated = [
+                column.name for column in self.unique_columns
+                if column.name in row and (
+                    row[column.name] in existing_map[column.name]
+                    or row[column.name] in self._seen[column.name]
+                    or row[column.name] in batch_seen[column.name])
+            ]
+            if duplicated:
+                reject_writer.write(line_no, raw, 'duplicated: {}'.format(
+                    ', '.join(duplicated)))
+                continue
+            for column in self.unique_columns:
+                if column.name in row:
+                    batch_seen[column.name].add(row[column.name])
+            unique_items.append((line_no, raw, row))
+        return unique_items
+
+    def _mark_seen(self, rows):
+        for row in rows:
+            for column in self.unique_columns:
+                if column.name in row:
+                    self._seen[column.name].add(row[column.name])
+
+    def _insert(self, items, reject_writer):
+        session = DBSession()
+        try:
+            rows = [row for _, _, row in items]
+            session.bulk_insert_mappings(self.model, rows)
+            session.commit()
+            self._mark_seen(rows)
+            return len(items)
+        except SQLAlchemyError:
+            session.rollback()
+        # 整批插入失败, 逐行插入找出失败的行
+        inserted = 0
+        for line_no, raw, row in items:
+            try:
+                session.bulk_insert_mappings(self.model, [row])
+                session.commit()
+                self._mark_seen([row])
+                inserted += 1
+            except SQLAlchemyError as e:
+                session.rollback()
+                reject_writer.write(
+                    line_no, raw, repr(getattr(e, 'orig', None) or e))
+        return inserted
+
+
+def import_file(entity, path, file_format=None, reject_path=None,
+                batch_size=IMPORT_BATCH_SIZE):
+    """导入一个文件, 格式默认按扩展名判断, 返回ImportResult"""
+    if entity not in IMPORT_SPECS:
+        raise ValueError('unknown entity: {}'.format(entity))
+    file_format = file_format or path.rsplit('.', 1)[-1].lower()
+    if file_format not in READERS:
+        raise ValueError('unknown file format: {}'.format(file_format))
+    model, references = IMPORT_SPECS[entity]
+    importer = BulkImporter(model, references, batch_size)
+    reject_file = open(reject_path, 'wb') if reject_path else None
+    try:
+        with open(path, 'rb') as fileobj:
+            return importer.run(READERS[file_format](fileobj), reject_file)
+    finally:
+        if reject_file is not None:
+            reject_file.close()
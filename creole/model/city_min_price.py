@@ -0,0 +1,199 @@
+# coding: utf-8
+"""按(城市, 日期, 星级, 房型)物化的最低房价, 用于"某城市今晚xx起"
+
+最低价取每个酒店(一个酒店取id最小的费用)当天的基础房价, 同一酒店同一房型
+区间重叠时以后录入的为准, 与rate_calendar一致; 不含附加费.
+
+`RoomPriceService.edit_room_service`在同一事务中调用`refresh`, 只重新计算
+受影响的城市和星级在受影响日期内的行: 先删除, 再根据价格表重新插入.
+
+同一城市同一星级的刷新要串行执行, 否则并发的两次编辑可能互相覆盖:
+编辑价格之前先用`lock_groups`锁住这一组酒店的行(SELECT ... FOR UPDATE),
+重新计算时用加锁读(LOCK IN SHARE MODE)读到最新提交的价格, 而不是事务
+开始时的快照. 唯一键以(城市, 星级)开头, 删除一组的行不会锁到其他星级.
+酒店的城市, 星级变化或者删除费用不会触发刷新, 需要时用
+`python db.py --cmd min_price`全量重建.
+"""
+import datetime
+from collections import defaultdict
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Integer,
+    Float,
+    UniqueConstraint,
+    select,
+    func,
+    and_,
+    or_,
+)
+from sqlalchemy.dialects.mysql import TINYINT
+from sqlalchemy.ext.declarative import declared_attr
+
+from . import Base, DBSession
+from .base import BaseMixin
+from .hotel import Hotel, HotelFee, RoomPrice
+
+
+class CityMinRoomPrice(Base, BaseMixin):
+    __tablename__ = 'city_min_room_price'
+
+    city_id = Column(Integer, nullable=False, doc=u'城市id')
+    date = Column(DateTime, nullable=False, doc=u'日期')
+    star_level = Column(TINYINT, nullable=False, doc=u'酒店星级')
+    room_type = Column(TINYINT, nullable=False, doc=u'房型')
+    price = Column(Float(3), nullable=False, doc=u'最低房价')
+    hotel_id = Column(Integer, nullable=False, doc=u'最低房价的酒店ID')
+
+    @declared_attr
+    def __table_args__(self):
+        table_args = (
+            UniqueConstraint(
+                'city_id', 'star_level', 'date', 'room_type',
+                name='uq_city_star_date_room'),
+        )
+        return table_args + BaseMixin.__table_args__
+
+    @classmethod
+    def search(cls, city_id, start_date, end_date, star_level=None,
+               room_type=None):
+        """[start_date, end_date]内的最低价, 按日期, 星级, 房型排序"""
+        table = cls.__table__
+        statement = select([
+            table.c.date, table.c.star_level, table.c.room_type,
+            table.c.price, table.c.hotel_id,
+        ]).where(and_(
+            table.c.city_id == city_id,
+            table.c.date >= start_date,
+            table.c.date <= end_date,
+        ))
+        if star_level is not None:
+            statement = statement.where(table.c.star_level == star_level)
+        if room_type is not None:
+            statement = statement.where(table.c.room_type == room_type)
+        statement = statement.order_by(
+            table.c.date, table.c.star_level, table.c.room_type)
+        return [dict(row) for row in DBSession().execute(statement)]
+
+    @classmethod
+    def lock_groups(cls, hotel_fee_ids):
+        """锁住这些费用所在城市和星级的所有酒店行, 返回set((city_id, star_level))
+
+        在修改价格之前调用, 锁随调用方的事务提交或回滚时释放.
+        """
+        session = DBSession()
+        hotel = Hotel.__table__
+        fee = HotelFee.__table__
+        groups = set(tuple(row) for row in session.execute(
+            select([hotel.c.city_id, hotel.c.star_level])
+            .select_from(hotel.join(fee, fee.c.hotel_id == hotel.c.id))
+            .where(fee.c.id.in_(set(hotel_fee_ids)))))
+        if groups:
+            session.execute(
+                select([hotel.c.id]).where(cls._group_condition(hotel, groups))
+                .order_by(hotel.c.id).with_for_update())
+        return groups
+
+    @classmethod
+    def refresh(cls, groups, start_date, end_date):
+        """重新计算这些城市和星级在[start_date, end_date]内的最低价
+
+        groups是lock_groups的返回值; 在调用方的事务中执行, 随调用方一起
+        提交或回滚.
+        """
+        if groups:
+            cls._rebuild(groups, start_date, end_date)
+
+    @staticmethod
+    def _group_condition(table, groups):
+        return or_(*[
+            and_(table.c.city_id == city_id, table.c.star_level == star_level)
+            for city_id, star_level in groups])
+
+    @classmethod
+    def rebuild_all(cls):
+        """全量重建, 用于初始化或者酒店信息变化之后"""
+        session = DBSession()
+        table = cls.__table__
+        room_price = RoomPrice.__table__
+        start_time, end_time = session.execute(select([
+            func.min(room_price.c.start_time),
+            func.max(room_price.c.end_time),
+        ])).first()
+        session.execute(table.delete())
+        if start_time is None:
+            return
+        cls._rebuild(None, start_time, end_time)
+
+    @classmethod
+    def _rebuild(cls, groups, start_date, end_date):
+        """groups: set((city_id, star_level)), 为None时计算所有城市"""
+        session = DBSession()
+        table = cls.__table__
+        start_ordinal = start_date.toordinal()
+        end_ordinal = end_date.toordinal()
+        # 按天计算, 去掉时间部分
+        start_date = datetime.datetime.fromordinal(start_ordinal)
+        end_date = datetime.datetime.fromordinal(end_ordinal)
+
+        hotel = Hotel.__table__
+        fee = HotelFee.__table__
+        room_price = RoomPrice.__table__
+        # 每个酒店只取id最小的费用, 与HotelFee.get_by_hotel_ids一致
+        fee_id = select([func.min(fee.c.id)]).where(
+            fee.c.hotel_id == hotel.c.id).as_scalar()
+        statement = select([
+            hotel.c.id, hotel.c.city_id, hotel.c.star_level,
+            room_price.c.id, room_price.c.room_type,
+            room_price.c.start_time, room_price.c.end_time,
+            room_price.c.price,
+        ]).select_from(hotel.join(
+            room_price, room_price.c.hotel_fee_id == fee_id
+        )).where(and_(
+            room_price.c.start_time < end_date + datetime.timedelta(days=1),
+            room_price.c.end_time >= start_date,
+        )).with_for_update(read=True)
+        if groups is not None:
+            statement = statement.where(cls._group_condition(hotel, groups))
+
+        # (酒店id, 房型) -> {日期: 房价}, 按价格id顺序覆盖, 后录入的为准
+        hotel_price_map = defaultdict(dict)
+        hotel_group_map = {}
+        for (hotel_id, city_id, star_level, _, room_type, start_time,
+                end_time, price) in sorted(
+                    session.execute(statement), key=lambda row: row[3]):
+            hotel_group_map[hotel_id] = (city_id, star_level)
+            day_prices = hotel_price_map[(hotel_id, room_type)]
+            for ordinal in xrange(
+                    max(start_time.date().toordinal(), start_ordinal),
+                    min(end_time.date().toordinal(), end_ordinal) + 1):
+                day_prices[ordinal] = price
+
+        # (城市, 日期, 星级, 房型) -> (最低价, 酒店id)
+        min_price_map = {}
+        for (hotel_id, room_type), day_prices in hotel_price_map.iteritems():
+            city_id, star_level = hotel_group_map[hotel_id]
+            for ordinal, price in day_prices.iteritems():
+                key = (city_id, ordinal, star_level, room_type)
+                value = (price, hotel_id)
+                if key not in min_price_map or value < min_price_map[key]:
+                    min_price_map[key] = value
+
+        delete = table.delete().where(and_(
+            table.c.date >= start_date,
+            table.c.date < end_date + datetime.timedelta(days=1),
+        ))
+        if groups is not None:
+            delete = delete.where(cls._group_condition(table, groups))
+        session.execute(delete)
+        if min_price_map:
+            session.execute(table.insert(), [{
+                'city_id': city_id,
+                'date': datetime.datetime.fromordinal(ordinal),
+                'star_level': star_level,
+                'room_type': room_type,
+                'price': price,
+                'hotel_id': hotel_id,
+            } for (city_id, ordinal, star_level, room_type), (price, hotel_id)
+                in min_price_map.iteritems()])
@@ -0,0 +1,172 @@
+# coding: utf-8
+"""search()分页总数的缓存
+
+把查询的WHERE条件规整成(列, 操作符, 值)的集合:
+
+- 没有过滤条件, 或只有一个`COUNTER_COLUMNS`中的列做等值过滤时,
+  总数来自内存中的计数器. 计数器用一次GROUP BY加载, 之后本进程的新增,
+  删除和修改在提交后增量更新, 每`CREOLE_COUNT_CACHE_TTL`秒重新统计一次;
+- 其他条件组合以(表, 条件集合)为key放进`query_cache`, 表被写入时失效;
+- 条件无法规整(如OR, 函数)时退回`query_cache.count`.
+"""
+import time
+from itertools import chain
+from collections import Counter, defaultdict
+
+from gevent.lock import Semaphore
+from sqlalchemy import event, func, select
+from sqlalchemy.orm.attributes import get_history
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import (
+    BinaryExpression,
+    BindParameter,
+    BooleanClauseList,
+)
+from sqlalchemy.sql.schema import Column
+
+from . import DBSession
+from .query_cache import query_cache, _has_pending_changes
+from ..config import setting
+
+# 维护计数器的单列过滤条件
+COUNTER_COLUMNS = (
+    'city_id',
+    'country_id',
+    'company_id',
+    'star_level',
+    'shop_type',
+    'guide_type',
+)
+_PENDING_KEY = 'count_cache_pending_deltas'
+# 整表总数在计数器中的key
+_ALL = None
+
+
+def _normalized_filters(query):
+    """返回排好序的((列名, 操作符名, 值), ...), 无法规整时返回None"""
+    clause = query.whereclause
+    if clause is None:
+        return ()
+    if isinstance(clause, BooleanClauseList) \
+            and clause.operator is operators.and_:
+        clauses = clause.clauses
+    else:
+        clauses = [clause]
+    filters = []
+    for item in clauses:
+        if not isinstance(item, BinaryExpression) \
+                or not isinstance(item.left, Column) \
+                or not isinstance(item.right, BindParameter):
+            return None
+        filters.append(
+            (item.left.name, item.operator.__name__, item.right.effective_value))
+    return tuple(sorted(filters))
+
+
+class _ColumnCounter(object):
+    def __init__(self, counts, loaded_at):
+        self.counts = counts
+        self.loaded_at = loaded_at
+
+
+class CountCache(object):
+    def __init__(self, ttl, counter_columns=COUNTER_COLUMNS):
+        self.ttl = ttl
+        self.counter_columns = counter_columns
+        # (table_name, column_name) -> _ColumnCounter
+        self._counters = {}
+        self._lock = Semaphore()
+
+    def _load_counter(self, table, column_name):
+        loaded_at = time.time()
+        session = DBSession()
+        if column_name is _ALL:
+            total = session.execute(
+                select([func.count()]).select_from(table)).scalar()
+            counts = Counter({_ALL: total})
+        else:
+            column = table.c[column_name]
+            rows = session.execute(
+                select([column, func.count()]).group_by(column))
+            counts = Counter(dict(rows.fetchall()))
+        return _ColumnCounter(counts, loaded_at)
+
+    def _get_counter(self, table, column_name):
+        key = (table.name, column_name)
+        counter = self._counters.get(key)
+        if counter is not None and counter.loaded_at + self.ttl > time.time():
+            return counter
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is None or counter.loaded_at + self.ttl <= time.time():
+                counter = self._counters[key] = \
+                    self._load_counter(table, column_name)
+        return counter
+
+    def count(self, query):
+        """缓存版的query.count()"""
+        session = query.session
+        if _has_pending_changes(session):
+            return query.count()
+        filters = _normalized_filters(query)
+        if filters is None:
+            return query_cache.count(query)
+        table = query.column_descriptions[0]['entity'].__table__
+        if not filters:
+            return self._get_counter(table, _ALL).counts[_ALL]
+        if len(filters) == 1:
+            column_name, operator_name, value = filters[0]
+            if operator_name == 'eq' and column_name in self.counter_columns \
+                    and column_name in table.c:
+                return self._get_counter(table, column_name).counts[value]
+        return query_cache.get_or_compute(
+            ('count', table.name, filters), [table.name], query.count)
+
+    def clear(self):
+        self._counters.clear()
+
+    def bind_session(self, scoped_session):
+        event.listen(scoped_session, 'after_flush', self._after_flush)
+        event.listen(scoped_session, 'after_commit', self._after_commit)
+        event.listen(scoped_session, 'after_soft_rollback',
+                     self._after_rollback)
+
+    def _after_flush(self, session, flush_context):
+        deltas = session.info.setdefault(_PENDING_KEY, Counter())
+        for obj, sign in chain(
+                ((obj, 1) for obj in session.new),
+                ((obj, -1) for obj in session.deleted)):
+            table_name = obj.__table__.name
+            deltas[(table_name, _ALL, _ALL)] += sign
+            for column_name in self.counter_columns:
+                if column_name in obj.__table__.c:
+                    value = getattr(obj, column_name)
+                    deltas[(table_name, column_name, value)] += sign
+        for obj in session.dirty:
+            table_name = obj.__table__.name
+            for column_name in self.counter_columns:
+                if column_name not in obj.__table__.c:
+                    continue
+                history = get_history(obj, column_name)
+                if not history.has_changes():
+                    continue
+                for value in history.deleted:
+                    deltas[(table_name, column_name, value)] -= 1
+                for value in history.added:
+                    deltas[(table_name, column_name, value)] += 1
+
+    def _after_commit(self, session):
+        deltas = session.info.pop(_PENDING_KEY, None)
+        if not deltas:
+            return
+        for (table_name, column_name, value), delta in deltas.iteritems():
+            counter = self._counters.get((table_name, column_name))
+            if counter is not None:
+                counter.counts[value] += delta
+
+    def _after_rollback(self, session, previous_transaction):
+        session.info.pop(_PENDING_KEY, None)
+
+
+count_cache = CountCache(ttl=setting.CREOLE_COUNT_CACHE_TTL)
+count_cache.bind_session(DBSession)
@@ -12,6 +12,9 @@ from sqlalchemy.ext.declarative import declared_attr
 
 from . import Base, DBSession
 from .base import BaseMixin
+from .lookup import reference_lookup
+from .reference_data import ReferenceDataStore
+from ..config import setting
 from ..exc import (
     raise_error_json,
     ParameterError,
@@ -43,7 +46,7 @@ class Country(Base, BaseMixin):
 
     @classmethod
     def get(cls, id):
-        country = DBSession().query(cls).filter(cls.id==id).first()
+        country = cls._get_by_column('id', id).first()
         return country
 
     @classmethod
@@ -61,6 +64,7 @@ class Country(Base, BaseMixin):
             setattr(country, k, v)
         try:
             session.merge(country)
+            country_city_store.bump_version()
             session.commit()
         except IntegrityError as e:
             session.rollback()
@@ -78,6 +82,7 @@ class Country(Base, BaseMixin):
             raise_error_json(ClientError(errcode=CreoleErrCode.COUNTRY_NOT_EXIST))
         session.delete(country)
         session.flush()
+        country_city_store.bump_version()
 
     @classmethod
     def create(cls, name, name_en, nationality, language,
@@ -89,6 +94,7 @@ class Country(Base, BaseMixin):
             country_code=country_code, note=note)
         session.add(country)
         try:
+            country_city_store.bump_version()
             session.commit()
         except IntegrityError as e:
             session.rollback()
@@ -120,20 +126,18 @@ class City(Base, BaseMixin):
 
     @validates('country_id')
     def _validate_country_id(self, key, country_id):
-        country = Country.get(country_id)
-        if not country:
+        if not reference_lookup.exists(Country, country_id):
             raise_error_json(ClientError(errcode=CreoleErrCode.COUNTRY_NOT_EXIST))
         return country_id
 
     @classmethod
     def get(cls, id):
-        city = DBSession().query(cls).filter(cls.id==id).first()
+        city = cls._get_by_column('id', id).first()
         return city
 
     @classmethod
     def get_by_country_id(cls, country_id):
-        city_list = DBSession().query(cls).filter(
-            cls.country_id==country_id).all()
+        city_list = cls._get_by_column('country_id', country_id).all()
         return city_list
 
     @classmethod
@@ -146,6 +150,7 @@ class City(Base, BaseMixin):
             setattr(city, k, v)
         try:
             session.merge(city)
+            country_city_store.bump_version()
             session.commit()
         except IntegrityError as e:
             session.rollback()
@@ -164,6 +169,7 @@ class City(Base, BaseMixin):
                 ClientError(errcode=CreoleErrCode.COUNTRY_NOT_EXIST))
         session.delete(country)
         try:
+            country_city_store.bump_version()
             session.commit()
         except SQLAlchemyError as e:
             session.rollback()
@@ -177,6 +183,7 @@ class City(Base, BaseMixin):
             abbreviation=abbreviation, note=note)
         session.add(city)
         try:
+            country_city_store.bump_version()
             session.commit()
         except IntegrityError as e:
             session.rollback()
@@ -185,3 +192,11 @@ class City(Base, BaseMixin):
         except SQLAlchemyError as e:
             session.rollback()
             raise_error_json(DatabaseError(msg=repr(e)))
+
+
+# 国家/城市的进程内快照, 增删改时提升版本号, 各worker据此刷新
+country_city_store = ReferenceDataStore(
+    'country_city', Country, City,
+    check_interval=setting.CREOLE_REFERENCE_DATA_CHECK_INTERVAL)
+reference_lookup.register_source(Country, country_city_store.get_country)
+reference_lookup.register_source(City, country_city_store.get_city)
@@ -0,0 +1,85 @@
+# coding: utf-8
+import time
+
+from gevent.lock import Semaphore
+from sqlalchemy import (
+    Column,
+    String,
+    Integer,
+    select,
+)
+
+from . import Base, DBSession
+from .base import BaseMixin
+from ..db import read_from_primary
+
+
+class DataVersion(Base, BaseMixin):
+    """引用数据的版本号, 数据变更时+1, 各进程据此判断本地快照是否过期"""
+    __tablename__ = 'data_version'
+
+    name = Column(String(30), unique=True, nullable=False, doc=u'数据名')
+    version = Column(Integer, nullable=False, default=0, doc=u'版本号')
+
+    @classmethod
+    def get_version(cls, name):
+        session = DBSession()
+        version = session.execute(
+            select([cls.version]).where(cls.name==name)).scalar()
+        return version or 0
+
+    @classmethod
+    def bump(cls, name):
+        """在调用方的事务中把版本号+1, 随调用方一起提交或回滚"""
+        session = DBSession()
+        table = cls.__table__
+        result = session.execute(
+            table.update().where(table.c.name==name).values(
+                version=table.c.version + 1))
+        if result.rowcount == 0:
+            session.execute(table.insert().values(name=name, version=1))
+
+
+class VersionedSnapshot(object):
+    """按data_version版本号整体重新加载的进程内快照, 子类实现`_load`
+
+    最多每`check_interval`秒查询一次版本号, 变化时调用`_load`.
+    版本号和数据都从主库读: 分别读到不同的从库时, 可能把延迟的旧数据
+    记成新版本, 直到下次版本号变化才会重新加载.
+    """
+    def __init__(self, name, check_interval):
+        self.name = name
+        self.check_interval = check_interval
+        self._version = None
+        self._checked_at = 0
+        # 同一时刻只让一个greenlet去检查和加载
+        self._lock = Semaphore()
+
+    def bump_version(self):
+        """在当前事务中提升版本号, 并让本进程下次读取时重新加载"""
+        DataVersion.bump(self.name)
+        self.mark_stale()
+
+    def mark_stale(self):
+        self._version = None
+        self._checked_at = 0
+
+    def _is_fresh(self):
+        return (self._version is not None and
+                time.time() - self._checked_at < self.check_interval)
+
+    def _refresh(self):
+        if self._is_fresh():
+            return
+        with self._lock:
+            if self._is_fresh():
+                return
+            with read_from_primary(DBSession()):
+                version = DataVersion.get_version(self.name)
+                if version != self._version:
+                    self._load()
+                    self._version = version
+            self._checked_at = time.time()
+
+    def _load(self):
+        raise NotImplementedError
@@ -0,0 +1,117 @@
+# coding: utf-8
+"""介绍类文本列的全文检索
+
+模型通过`register(model, *indexes)`声明全文索引:
+
+- MySQL上建表后执行`ALTER TABLE ... ADD FULLTEXT INDEX`, 中文列使用
+  ngram parser(MySQL 5.7.6+); 已有的库用`python db.py --cmd fulltext`补建;
+- 查询时按关键词是否包含非ASCII字符选择中文或英文索引, MySQL用
+  `MATCH ... AGAINST`过滤并按相关度排序, 其他数据库(如测试用的SQLite)
+  退化为LIKE匹配, 按id排序.
+"""
+from sqlalchemy import DDL, event, or_, text
+
+from . import DBSession
+
+CN = 'cn'
+EN = 'en'
+
+# model -> (FullTextIndex, ...)
+_registry = {}
+
+
+class FullTextIndex(object):
+    def __init__(self, name, column_names, language, ngram=None):
+        self.name = name
+        self.column_names = tuple(column_names)
+        self.language = language
+        # 中文没有空格分词, 默认使用ngram parser
+        self.ngram = language == CN if ngram is None else ngram
+
+    def ddl(self, table_name):
+        return 'ALTER TABLE `{}` ADD FULLTEXT INDEX `{}` ({}){}'.format(
+            table_name, self.name,
+            ', '.join('`{}`'.format(name) for name in self.column_names),
+            ' WITH PARSER ngram' if self.ngram else '')
+
+    def match_clause(self):
+        return 'MATCH ({}) AGAINST (:fulltext_q IN NATURAL LANGUAGE MODE)'.format(
+            ', '.join('`{}`'.format(name) for name in self.column_names))
+
+
+def register(model, *indexes):
+    _registry[model] = indexes
+    table = model.__table__
+    for index in indexes:
+        event.listen(
+            table, 'after_create',
+            DDL(index.ddl(table.name)).execute_if(dialect='mysql'))
+
+
+def get_indexes(model):
+    return _registry.get(model, ())
+
+
+def _choose_index(model, q):
+    indexes = get_indexes(model)
+    if not indexes:
+        raise ValueError('{} has no fulltext index'.format(model.__name__))
+    try:
+        q.encode('ascii')
+        language = EN
+    except (UnicodeEncodeError, UnicodeDecodeError):
+        language = CN
+    for index in indexes:
+        if index.language == language:
+            return index
+    return indexes[0]
+
+
+class MySQLFullTextEngine(object):
+    def search(self, query, model, index, q):
+        match = index.match_clause()
+        return query.filter(text(match).bindparams(fulltext_q=q)).order_by(
+            text(match + ' DESC').bindparams(fulltext_q=q))
+
+
+class LikeFullTextEngine(object):
+    """不支持全文索引的数据库上的退化实现"""
+    def search(self, query, model, index, q):
+        pattern = u'%{}%'.format(
+            q.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_'))
+        return query.filter(or_(*[
+            getattr(model, name).like(pattern, escape='\\')
+            for name in index.column_names
+        ])).order_by(model.id)
+
+
+_engines = {
+    'mysql': MySQLFullTextEngine(),
+}
+_fallback_engine = LikeFullTextEngine()
+
+
+def search(query, model, q):
+    """给query加上全文检索条件和相关度排序"""
+    index = _choose_index(model, q)
+    engine = _engines.get(
+        DBSession().engine.dialect.name, _fallback_engine)
+    return engine.search(query, model, index, q)
+
+
+def ensure_indexes(engine, models=None):
+    """给已有的表补建缺失的全文索引, 返回新建的索引名列表"""
+    if engine.dialect.name != 'mysql':
+        return []
+    created = []
+    for model in models or _registry.keys():
+        table_name = model.__table__.name
+        existing = set(
+            row[2] for row in engine.execute(
+                'SHOW INDEX FROM `{}`'.format(table_name)))
+        for index in get_indexes(model):
+            if index.name in existing:
+                continue
+            engine.execute(index.ddl(table_name))
+            created.append('{}.{}'.format(table_name, index.name))
+    return created
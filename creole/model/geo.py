@@ -0,0 +1,173 @@
+# coding: utf-8
+"""酒店, 餐厅, 景点, 购物店坐标的进程内网格索引, 用于附近搜索
+
+经纬度按`GRID_CELL_DEG`划分网格, 每个网格保存落在其中的(资源名, id).
+查询半径r公里内最近的k个点时只遍历覆盖查询方框的网格, 再逐点计算球面距离,
+不访问数据库.
+
+- 本进程的写入在事务提交后增量更新索引: after_flush收集坐标的变化,
+  after_commit生效, 回滚时丢弃;
+- 坐标有变化时在同一事务中把`data_version`里的版本号+1, 其他worker最多每
+  `CREOLE_REFERENCE_DATA_CHECK_INTERVAL`秒检查一次版本号, 变化时从主库整体
+  重新加载(见`VersionedSnapshot`).
+  批量导入等不经过ORM的写入需要自己调用`bump_version`.
+"""
+import math
+import heapq
+from collections import defaultdict
+
+from sqlalchemy import event, select
+from sqlalchemy.orm.attributes import get_history
+
+from . import DBSession
+from .data_version import DataVersion, VersionedSnapshot
+from ..config import setting
+
+# 网格边长(度), 赤道附近约5.5公里
+GRID_CELL_DEG = 0.05
+EARTH_RADIUS_KM = 6371.0
+
+_PENDING_KEY = 'geo_index_pending'
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """两点间的球面距离(公里)"""
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2 +
+         math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _cell(lat, lng):
+    return (int(math.floor(lat / GRID_CELL_DEG)),
+            int(math.floor(lng / GRID_CELL_DEG)))
+
+
+class GeoIndex(VersionedSnapshot):
+    def __init__(self, name, check_interval):
+        super(GeoIndex, self).__init__(name, check_interval)
+        # 资源名 -> model
+        self._models = {}
+        # (资源名, id) -> (纬度, 经度)
+        self._points = {}
+        # 网格 -> set((资源名, id))
+        self._cells = defaultdict(set)
+
+    def register(self, kind, model):
+        self._models[kind] = model
+
+    @property
+    def kinds(self):
+        return sorted(self._models)
+
+    def _get_kind(self, obj):
+        for kind, model in self._models.iteritems():
+            if isinstance(obj, model):
+                return kind
+
+    def _load(self):
+        session = DBSession()
+        points = {}
+        cells = defaultdict(set)
+        for kind, model in self._models.iteritems():
+            table = model.__table__
+            rows = session.execute(
+                select([table.c.id, table.c.latitude, table.c.longitude])
+                .where(table.c.latitude != None)
+                .where(table.c.longitude != None))
+            for id, lat, lng in rows:
+                points[(kind, id)] = (lat, lng)
+                cells[_cell(lat, lng)].add((kind, id))
+        # 整体替换, 读取方不会看到加载了一半的数据
+        self._points, self._cells = points, cells
+
+    def _set_point(self, key, point):
+        old = self._points.pop(key, None)
+        if old is not None:
+            cell = _cell(*old)
+            self._cells[cell].discard(key)
+            if not self._cells[cell]:
+                del self._cells[cell]
+        if point is not None:
+            self._points[key] = point
+            self._cells[_cell(*point)].add(key)
+
+    def get_point(self, kind, id):
+        """返回(纬度, 经度), 没有坐标时返回None"""
+        self._refresh()
+        return self._points.get((kind, id))
+
+    def nearby(self, lat, lng, radius_km, kinds=None, number=10,
+               exclude=None):
+        """返回半径内最近的number个点: [(距离公里数, 资源名, id), ...]"""
+        self._refresh()
+        lat_span = math.degrees(radius_km / EARTH_RADIUS_KM)
+        lng_span = lat_span / max(math.cos(math.radians(lat)), 1e-6)
+        min_y, min_x = _cell(lat - lat_span, lng - lng_span)
+        max_y, max_x = _cell(lat + lat_span, lng + lng_span)
+        points, cells = self._points, self._cells
+        candidates = []
+        for y in xrange(min_y, max_y + 1):
+            for x in xrange(min_x, max_x + 1):
+                for key in cells.get((y, x), ()):
+                    if kinds and key[0] not in kinds or key == exclude:
+                        continue
+                    distance = haversine_km(lat, lng, *points[key])
+                    if distance <= radius_km:
+                        candidates.append((distance, key[0], key[1]))
+        return heapq.nsmallest(number, candidates)
+
+    def bind_session(self, scoped_session):
+        event.listen(scoped_session, 'after_flush', self._after_flush)
+        event.listen(scoped_session, 'after_commit', self._after_commit)
+        event.listen(scoped_session, 'after_soft_rollback',
+                     self._after_rollback)
+
+    def _after_flush(self, session, flush_context):
+        changes = {}
+        for obj in session.new:
+            kind = self._get_kind(obj)
+            if kind is not None and obj.latitude is not None \
+                    and obj.longitude is not None:
+                changes[(kind, obj.id)] = (obj.latitude, obj.longitude)
+        for obj in session.dirty:
+            kind = self._get_kind(obj)
+            if kind is None:
+                continue
+            if not (get_history(obj, 'latitude').has_changes() or
+                    get_history(obj, 'longitude').has_changes()):
+                continue
+            if obj.latitude is None or obj.longitude is None:
+                changes[(kind, obj.id)] = None
+            else:
+                changes[(kind, obj.id)] = (obj.latitude, obj.longitude)
+        for obj in session.deleted:
+            kind = self._get_kind(obj)
+            if kind is not None and obj.latitude is not None:
+                changes[(kind, obj.id)] = None
+        if not changes:
+            return
+        DataVersion.bump(self.name)
+        pending = session.info.setdefault(
+            _PENDING_KEY, {'changes': {}, 'bumps': 0})
+        pending['changes'].update(changes)
+        pending['bumps'] += 1
+        pending['version'] = DataVersion.get_version(self.name)
+
+    def _after_commit(self, session):
+        pending = session.info.pop(_PENDING_KEY, None)
+        if not pending or self._version is None:
+            return
+        for key, point in pending['changes'].iteritems():
+            self._set_point(key, point)
+        # 期间没有其他进程修改过时, 增量更新后的索引就是最新版本, 不用重新加载
+        if self._version + pending['bumps'] == pending['version']:
+            self._version = pending['version']
+
+    def _after_rollback(self, session, previous_transaction):
+        session.info.pop(_PENDING_KEY, None)
+
+
+geo_index = GeoIndex(
+    'geo', check_interval=setting.CREOLE_REFERENCE_DATA_CHECK_INTERVAL)
+geo_index.bind_session(DBSession)
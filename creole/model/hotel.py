@@ -1,4 +1,6 @@
 # coding: utf-8
+from collections import OrderedDict
+
 from sqlalchemy import (
     Column,
     DateTime,
@@ -7,19 +9,29 @@ from sqlalchemy import (
     Integer,
     Index,
     Float,
+    select,
+    func,
+    literal,
+    null,
+    type_coerce,
+    union_all,
 )
 from sqlalchemy.dialects.mysql import (
     TINYINT,
     SMALLINT,
 )
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import validates
+from sqlalchemy.orm import validates, deferred
 from sqlalchemy.ext.declarative import declared_attr
 
 from ..util import Enum
 from . import Base, DBSession
 from .base import BaseMixin
-from .mixins import CompanyMixin, ContactMixin, AccountMixin
+from . import fulltext
+from .geo import geo_index
+from ..redis import entity_cache
+from .lookup import reference_lookup
+from .mixins import CompanyMixin, ContactMixin, AccountMixin, GeoMixin
 from .country import Country, City
 from ..exc import (
     raise_error_json,
@@ -82,17 +94,16 @@ class HotelCompany(Base, CompanyMixin):
         session.flush()
 
     @classmethod
-    def search(cls, country_id=None, city_id=None, page=1, number=20):
+    def search(cls, country_id=None, city_id=None, page=1, number=20,
+               cursor=None, fields=None):
         session = DBSession()
-        query = session.query(cls)
+        query = cls._load_only(session.query(cls), fields)
         total = None
         if city_id:
             query = query.filter(cls.city_id==city_id)
         elif country_id:
             query = query.filter(cls.country_id==country_id)
-        if page == 1:
-            total = query.count()
-        company_list = query.offset((page - 1) * number).limit(number).all()
+        company_list, total = cls._paginate(query, page, number, cursor)
         return company_list, total
 
 
@@ -110,8 +121,7 @@ class HotelCompanyContact(Base, ContactMixin):
 
     @classmethod
     def get_by_company_id(cls, company_id):
-        session = DBSession()
-        return session.query(cls).filter(cls.company_id==company_id).all()
+        return cls._get_by_column('company_id', company_id).all()
 
     @classmethod
     def create(cls, contact, position, telephone, email, company_id):
@@ -134,8 +144,9 @@ class HotelCompanyContact(Base, ContactMixin):
         session.flush()
 
 
-class Hotel(Base, BaseMixin):
+class Hotel(Base, BaseMixin, GeoMixin):
     __tablename__ = 'hotel'
+    DEFERRED_GROUPS = ('intro',)
 
     LEVEL = Enum(
         ('ONE', 1, u'一星'),
@@ -163,13 +174,22 @@ class Hotel(Base, BaseMixin):
     telephone = Column(String(20), nullable=False, doc=u'预定电话')
     email = Column(String(30), nullable=False, doc=u'预定邮箱')
 
-    intro_cn = Column(Unicode(500), nullable=True, doc=u'中文介绍')
-    intro_en = Column(String(800), nullable=True, doc=u'英文介绍')
+    intro_cn = deferred(
+        Column(Unicode(500), nullable=True, doc=u'中文介绍'),
+        group='intro')
+    intro_en = deferred(
+        Column(String(800), nullable=True, doc=u'英文介绍'),
+        group='intro')
 
     @declared_attr
     def __table_args__(self):
         table_args = (
             Index('ix_company_id', 'company_id'),
+            Index('ix_country_id', 'country_id'),
+            Index('ix_city_id', 'city_id'),
+            Index('ix_star_level', 'star_level'),
+            Index('idx_country_id_star_level', 'country_id', 'star_level'),
+            Index('idx_city_id_star_level', 'city_id', 'star_level'),
         )
         return table_args + BaseMixin.__table_args__
 
@@ -187,26 +207,22 @@ class Hotel(Base, BaseMixin):
 
     @validates('country_id')
     def _validate_country_id(self, key, country_id):
-        country = DBSession().query(Country).filter(
-            Country.id==country_id).first()
-        if not country:
+        if not reference_lookup.exists(Country, country_id):
             raise_error_json(InvalidateError(args=('country_id', country_id,)))
         return country_id
 
     @validates('company_id')
     def _validate_company_id(self, key, company_id):
-        company = DBSession().query(HotelCompany).filter(
-            HotelCompany.id==company_id).first()
-        if not company:
+        if not reference_lookup.exists(HotelCompany, company_id):
             raise_error_json(InvalidateError(args=('company_id', company_id,)))
         return company_id
 
     @classmethod
     def _validate_country_and_city(cls, country_id, city_id):
-        city = DBSession().query(City).filter(City.id==city_id).first()
+        city = reference_lookup.get(City, city_id)
         if not city:
             raise_error_json(ClientError(errcode=CreoleErrCode.CITY_NOT_EXIST))
-        elif city.country_id != country_id:
+        elif city['country_id'] != country_id:
             raise_error_json(InvalidateError(errcode=CreoleErrCode.COUNTRY_NOT_EXIST))
 
     @classmethod
@@ -214,7 +230,8 @@ class Hotel(Base, BaseMixin):
                name_en, nickname_en, star_level, comment_level,
                standard_room_number, standard_double_room_number,
                triple_room_number, suite_room_number, tour_guide_room_number,
-               start_year, telephone, email, intro_cn=None, intro_en=None):
+               start_year, telephone, email, intro_cn=None, intro_en=None,
+               latitude=None, longitude=None):
         session = DBSession()
         hotel = cls(
             country_id=country_id, city_id=city_id, company_id=company_id,
@@ -226,7 +243,8 @@ class Hotel(Base, BaseMixin):
             suite_room_number=suite_room_number,
             tour_guide_room_number=tour_guide_room_number,
             start_year=start_year, telephone=telephone, email=email,
-            intro_cn=intro_cn, intro_en=intro_en
+            intro_cn=intro_cn, intro_en=intro_en,
+            latitude=latitude, longitude=longitude
         )
         session.add(hotel)
         try:
@@ -249,6 +267,7 @@ class Hotel(Base, BaseMixin):
             setattr(hotel, k, v)
         session = DBSession()
         session.merge(hotel)
+        entity_cache.invalidate(cls.__tablename__, id)
         try:
             session.flush()
         except IntegrityError:
@@ -264,6 +283,7 @@ class Hotel(Base, BaseMixin):
             raise_error_json(
                 ClientError(errcode=CreoleErrCode.HOTEL_NOT_EXIST))
         session.delete(hotel)
+        entity_cache.invalidate(cls.__tablename__, id)
         session.flush()
 
     @classmethod
@@ -272,19 +292,21 @@ class Hotel(Base, BaseMixin):
         hotel_list = cls.get_by_company_id(company_id)
         for hotel in hotel_list:
             session.delete(hotel)
+        entity_cache.invalidate(
+            cls.__tablename__, *[hotel.id for hotel in hotel_list])
         session.flush()
 
     @classmethod
     def get_by_company_id(cls, company_id):
-        session = DBSession()
-        return session.query(cls).filter(cls.company_id==company_id).all()
+        return cls._get_by_column('company_id', company_id).all()
 
     @classmethod
     def search(cls, country_id=None, city_id=None, company_id=None,
                name=None, name_en=None, nickname_en=None,
-               star_level=None, page=1, number=20):
+               star_level=None, page=1, number=20, cursor=None, q=None,
+               fields=None):
         session = DBSession()
-        query = session.query(cls)
+        query = cls._load_only(session.query(cls), fields)
         total = None
         if city_id:
             query = query.filter(cls.city_id==city_id)
@@ -298,9 +320,9 @@ class Hotel(Base, BaseMixin):
             query = query.filter(cls.nickname_en==nickname_en)
         if star_level:
             query = query.filter(cls.star_level==star_level)
-        if page == 1:
-            total = query.count()
-        hotel_list = query.offset((page - 1) * number).limit(number).all()
+        if q:
+            query = fulltext.search(query, cls, q)
+        hotel_list, total = cls._paginate(query, page, number, cursor)
         return hotel_list, total
 
 
@@ -337,8 +359,7 @@ class HotelAccount(Base, AccountMixin):
 
     @classmethod
     def get_by_hotel_id(cls, hotel_id):
-        return DBSession().query(cls).\
-            filter(cls.hotel_id==hotel_id).all()
+        return cls._get_by_column('hotel_id', hotel_id).all()
 
     @classmethod
     def delete(cls, id):
@@ -390,8 +411,7 @@ class HotelContact(Base, ContactMixin):
 
     @classmethod
     def get_by_hotel_id(cls, hotel_id):
-        session = DBSession()
-        return session.query(cls).filter(cls.hotel_id==hotel_id).all()
+        return cls._get_by_column('hotel_id', hotel_id).all()
 
     @classmethod
     def create(cls, contact, position, telephone, email, hotel_id):
@@ -414,6 +434,11 @@ class HotelContact(Base, ContactMixin):
         session.flush()
 
 
+# 酒店价格日历(见rate_calendar.py)在entity_cache中的表名, 按hotel_fee_id缓存,
+# 下面各价格表的增删改都要让对应费用的缓存失效
+RATE_CACHE_TABLE = 'hotel_rate'
+
+
 class HotelFee(Base, BaseMixin):
     __tablename__ = 'hotel_fee'
 
@@ -429,6 +454,13 @@ class HotelFee(Base, BaseMixin):
     confirm_person = Column(String(30), nullable=False, doc=u'确认人')
     attachment_hash = Column(String(128), nullable=True, doc=u'附件哈希值')
 
+    @declared_attr
+    def __table_args__(self):
+        table_args = (
+            Index('ix_hotel_id', 'hotel_id'),
+        )
+        return table_args + BaseMixin.__table_args__
+
     @validates('free_policy')
     def _validate_free_policy(self, key, free_policy):
         if free_policy not in self.FREE_TYPE.values():
@@ -437,9 +469,19 @@ class HotelFee(Base, BaseMixin):
 
     @classmethod
     def get_by_hotel_id(cls, hotel_id):
+        """一个酒店有多个费用时取id最小的, 与get_by_hotel_ids一致"""
         session = DBSession()
-        fee = session.query(cls).filter(cls.hotel_id==hotel_id).first()
-        return fee
+        return session.query(cls).filter(
+            cls.hotel_id==hotel_id).order_by(cls.id).first()
+
+    @classmethod
+    def get_by_hotel_ids(cls, hotel_ids):
+        """返回{hotel_id: fee}, 一个酒店有多个费用时取id最小的"""
+        fee_map = {}
+        for fee in sorted(cls._get_by_column_in('hotel_id', hotel_ids),
+                          key=lambda fee: fee.id):
+            fee_map.setdefault(fee.hotel_id, fee)
+        return fee_map
 
     @classmethod
     def create(cls, hotel_id, confirm_person, free_policy=None,
@@ -518,8 +560,7 @@ class RoomPrice(Base, BaseMixin):
 
     @classmethod
     def get_by_hotel_fee_id(cls, hotel_fee_id):
-        session = DBSession()
-        _list = session.query(cls).filter(cls.hotel_fee_id==hotel_fee_id).all()
+        _list = cls._get_by_column('hotel_fee_id', hotel_fee_id).all()
         return _list
 
     @classmethod
@@ -532,6 +573,7 @@ class RoomPrice(Base, BaseMixin):
             price=price, note=note
         )
         session.add(price)
+        entity_cache.invalidate(RATE_CACHE_TABLE, hotel_fee_id)
         session.flush()
 
     @classmethod
@@ -540,10 +582,13 @@ class RoomPrice(Base, BaseMixin):
         if not price:
             raise_error_json(
                 ClientError(errcode=CreoleErrCode.ROOM_PRICE_NOT_EXIST))
+        fee_ids = {price.hotel_fee_id,
+                   kwargs.get('hotel_fee_id', price.hotel_fee_id)}
         for k, v in kwargs.iteritems():
             setattr(price, k, v)
         session = DBSession()
         session.merge(price)
+        entity_cache.invalidate(RATE_CACHE_TABLE, *fee_ids)
         session.flush()
 
     @classmethod
@@ -554,6 +599,7 @@ class RoomPrice(Base, BaseMixin):
                 ClientError(errcode=CreoleErrCode.ROOM_PRICE_NOT_EXIST))
         session = DBSession()
         session.delete(price)
+        entity_cache.invalidate(RATE_CACHE_TABLE, price.hotel_fee_id)
         session.flush()
 
     @classmethod
@@ -562,6 +608,7 @@ class RoomPrice(Base, BaseMixin):
         price_list = cls.get_by_hotel_fee_id(hotel_fee_id)
         for price in price_list:
             session.delete(price)
+        entity_cache.invalidate(RATE_CACHE_TABLE, hotel_fee_id)
         session.flush()
 
 
@@ -596,8 +643,7 @@ class MealPrice(Base, BaseMixin):
 
     @classmethod
     def get_by_hotel_fee_id(cls, hotel_fee_id):
-        session = DBSession()
-        _list = session.query(cls).filter(cls.hotel_fee_id==hotel_fee_id).all()
+        _list = cls._get_by_column('hotel_fee_id', hotel_fee_id).all()
         return _list
 
     @classmethod
@@ -610,6 +656,7 @@ class MealPrice(Base, BaseMixin):
             price=price, note=note
         )
         session.add(price)
+        entity_cache.invalidate(RATE_CACHE_TABLE, hotel_fee_id)
         session.flush()
 
     @classmethod
@@ -618,10 +665,13 @@ class MealPrice(Base, BaseMixin):
         if not price:
             raise_error_json(
                 ClientError(errcode=CreoleErrCode.MEAL_PRICE_NOT_EXIST))
+        fee_ids = {price.hotel_fee_id,
+                   kwargs.get('hotel_fee_id', price.hotel_fee_id)}
         for k, v in kwargs.iteritems():
             setattr(price, k, v)
         session = DBSession()
         session.merge(price)
+        entity_cache.invalidate(RATE_CACHE_TABLE, *fee_ids)
         session.flush()
 
     @classmethod
@@ -632,6 +682,7 @@ class MealPrice(Base, BaseMixin):
                 ClientError(errcode=CreoleErrCode.MEAL_PRICE_NOT_EXIST))
         session = DBSession()
         session.delete(price)
+        entity_cache.invalidate(RATE_CACHE_TABLE, price.hotel_fee_id)
         session.flush()
 
     @classmethod
@@ -640,6 +691,7 @@ class MealPrice(Base, BaseMixin):
         price_list = cls.get_by_hotel_fee_id(hotel_fee_id)
         for price in price_list:
             session.delete(price)
+        entity_cache.invalidate(RATE_CACHE_TABLE, hotel_fee_id)
         session.flush()
 
 
@@ -674,8 +726,7 @@ class RoomAdditionalCharge(Base, BaseMixin):
 
     @classmethod
     def get_by_hotel_fee_id(cls, hotel_fee_id):
-        session = DBSession()
-        _list = session.query(cls).filter(cls.hotel_fee_id==hotel_fee_id).all()
+        _list = cls._get_by_column('hotel_fee_id', hotel_fee_id).all()
         return _list
 
     @classmethod
@@ -688,6 +739,7 @@ class RoomAdditionalCharge(Base, BaseMixin):
             price=price, note=note
         )
         session.add(price)
+        entity_cache.invalidate(RATE_CACHE_TABLE, hotel_fee_id)
         session.flush()
 
     @classmethod
@@ -696,10 +748,13 @@ class RoomAdditionalCharge(Base, BaseMixin):
         if not price:
             raise_error_json(
                 ClientError(errcode=CreoleErrCode.ROOM_ADDITIONAL_PRICE_NOT_EXIST))
+        fee_ids = {price.hotel_fee_id,
+                   kwargs.get('hotel_fee_id', price.hotel_fee_id)}
         for k, v in kwargs.iteritems():
             setattr(price, k, v)
         session = DBSession()
         session.merge(price)
+        entity_cache.invalidate(RATE_CACHE_TABLE, *fee_ids)
         session.flush()
 
     @classmethod
@@ -710,6 +765,7 @@ class RoomAdditionalCharge(Base, BaseMixin):
                 ClientError(errcode=CreoleErrCode.ROOM_ADDITIONAL_PRICE_NOT_EXIST))
         session = DBSession()
         session.delete(price)
+        entity_cache.invalidate(RATE_CACHE_TABLE, price.hotel_fee_id)
         session.flush()
 
     @classmethod
@@ -718,6 +774,7 @@ class RoomAdditionalCharge(Base, BaseMixin):
         price_list = cls.get_by_hotel_fee_id(hotel_fee_id)
         for price in price_list:
             session.delete(price)
+        entity_cache.invalidate(RATE_CACHE_TABLE, hotel_fee_id)
         session.flush()
 
 
@@ -753,8 +810,7 @@ class FestivalAdditionalCharge(Base, BaseMixin):
 
     @classmethod
     def get_by_hotel_fee_id(cls, hotel_fee_id):
-        session = DBSession()
-        _list = session.query(cls).filter(cls.hotel_fee_id==hotel_fee_id).all()
+        _list = cls._get_by_column('hotel_fee_id', hotel_fee_id).all()
         return _list
 
     @classmethod
@@ -767,6 +823,7 @@ class FestivalAdditionalCharge(Base, BaseMixin):
             price=price, note=note
         )
         session.add(price)
+        entity_cache.invalidate(RATE_CACHE_TABLE, hotel_fee_id)
         session.flush()
 
     @classmethod
@@ -775,10 +832,13 @@ class FestivalAdditionalCharge(Base, BaseMixin):
         if not price:
             raise_error_json(
                 ClientError(errcode=CreoleErrCode.FESTIVAL_PRICE_NOT_EXIST))
+        fee_ids = {price.hotel_fee_id,
+                   kwargs.get('hotel_fee_id', price.hotel_fee_id)}
         for k, v in kwargs.iteritems():
             setattr(price, k, v)
         session = DBSession()
         session.merge(price)
+        entity_cache.invalidate(RATE_CACHE_TABLE, *fee_ids)
         session.flush()
 
     @classmethod
@@ -789,6 +849,7 @@ class FestivalAdditionalCharge(Base, BaseMixin):
                 ClientError(errcode=CreoleErrCode.FESTIVAL_PRICE_NOT_EXIST))
         session = DBSession()
         session.delete(price)
+        entity_cache.invalidate(RATE_CACHE_TABLE, price.hotel_fee_id)
         session.flush()
 
     @classmethod
@@ -797,4 +858,73 @@ class FestivalAdditionalCharge(Base, BaseMixin):
         price_list = cls.get_by_hotel_fee_id(hotel_fee_id)
         for price in price_list:
             session.delete(price)
+        entity_cache.invalidate(RATE_CACHE_TABLE, hotel_fee_id)
         session.flush()
+
+
+# 费用下的价格表: 数据key -> (model, 类型列名)
+HOTEL_FEE_PRICE_TABLES = OrderedDict([
+    ('room_price', (RoomPrice, 'room_type')),
+    ('meal_price', (MealPrice, 'meal_type')),
+    ('room_additional_charge', (RoomAdditionalCharge, 'room_level')),
+    ('festival_additional_charge', (FestivalAdditionalCharge, 'festival_type')),
+])
+
+
+def get_hotel_fee_aggregate(id=None, hotel_id=None):
+    """按费用id或酒店id取费用及其全部价格, 只执行一条UNION ALL语句
+
+    费用表和各价格表的列取并集, 表中没有的列补NULL, 再用`_key`列区分行
+    来自哪张表; 不创建ORM对象. 返回{列名: 值, 数据key: [{列名: 值}, ...]},
+    费用不存在时返回None.
+    """
+    if id is not None:
+        fee_id = literal(id)
+    else:
+        # 与HotelFee.get_by_hotel_id一样每个酒店取id最小的费用
+        fee_id = select([func.min(HotelFee.id)]).where(
+            HotelFee.hotel_id == hotel_id).as_scalar()
+
+    tables = OrderedDict([('fee', HotelFee.__table__)] + [
+        (key, model.__table__)
+        for key, (model, _) in HOTEL_FEE_PRICE_TABLES.iteritems()])
+    columns = OrderedDict()
+    for table in tables.itervalues():
+        for column in table.columns:
+            columns.setdefault(column.name, column.type)
+    statements = []
+    for key, table in tables.iteritems():
+        statement = select([literal(key).label('_key')] + [
+            table.c[name] if name in table.c
+            else type_coerce(null(), type).label(name)
+            for name, type in columns.iteritems()])
+        if key == 'fee':
+            statement = statement.where(table.c.id == fee_id)
+        else:
+            statement = statement.where(table.c.hotel_fee_id == fee_id)
+        statements.append(statement)
+
+    fee = None
+    price_map = {key: [] for key in HOTEL_FEE_PRICE_TABLES}
+    for row in DBSession().execute(union_all(*statements)):
+        key = row['_key']
+        data = {name: row[name] for name in tables[key].columns.keys()}
+        if key == 'fee':
+            fee = data
+        else:
+            price_map[key].append(data)
+    if fee is None:
+        return None
+    for rows in price_map.itervalues():
+        rows.sort(key=lambda data: data['id'])
+    fee.update(price_map)
+    return fee
+
+
+fulltext.register(
+    Hotel,
+    fulltext.FullTextIndex('ft_intro_cn', ['intro_cn'], fulltext.CN),
+    fulltext.FullTextIndex('ft_intro_en', ['intro_en'], fulltext.EN),
+)
+
+geo_index.register('hotel', Hotel)
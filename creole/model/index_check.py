@@ -0,0 +1,149 @@
+# coding: utf-8
+"""检查search()的过滤条件组合是否都能用上索引
+
+对每个search()方法, 枚举其过滤参数的所有组合(以及cursor分页), 记录实际执行
+的SELECT语句, 再逐条EXPLAIN. 某张表的访问方式是全表扫描且没有任何可用索引
+时视为缺索引.
+
+测试库里的数据量很小, 优化器可能在有索引的情况下仍然选择全表扫描, 所以判断
+依据是"没有可用索引"(MySQL的possible_keys为空), 而不是实际选中的执行计划.
+"""
+import datetime
+import itertools
+import contextlib
+
+from sqlalchemy import event, inspect
+
+from . import Base, DBSession
+from .query_cache import query_cache
+from .hotel import Hotel, HotelCompany
+from .restaurant import Restaurant
+from .attraction import Attraction
+from .shop import Shop, ShopCompany
+from .tour_guide import TourGuide
+from .vehicle import Vehicle, VehicleCompany, VehicleType, VehicleFee
+
+_NOW = datetime.datetime(2017, 1, 1)
+
+# (model, {过滤参数: 示例值})
+SEARCH_SPECS = (
+    (Hotel, {
+        'country_id': 1, 'city_id': 1, 'company_id': 1, 'name': u'a',
+        'name_en': 'a', 'nickname_en': 'a', 'star_level': 1}),
+    (HotelCompany, {'country_id': 1, 'city_id': 1}),
+    (Restaurant, {'country_id': 1, 'city_id': 1, 'restaurant_type': 1}),
+    (Attraction, {'country_id': 1, 'city_id': 1, 'name': u'a'}),
+    (Shop, {'country_id': 1, 'city_id': 1, 'company_id': 1, 'shop_type': 1}),
+    (ShopCompany, {
+        'name': u'a', 'name_en': 'a', 'country_id': 1, 'city_id': 1}),
+    (TourGuide, {'country_id': 1, 'gender': 1, 'guide_type': 1}),
+    (Vehicle, {
+        'country_id': 1, 'city_id': 1, 'company_id': 1,
+        'vehicle_type_id': 1, 'license': 'a'}),
+    (VehicleCompany, {
+        'name': u'a', 'name_en': 'a', 'country_id': 1, 'city_id': 1,
+        'company_type': 1}),
+    (VehicleType, {'vehicle_type': 1}),
+    (VehicleFee, {
+        'vehicle_type_id': 1, 'company_id': 1, 'unit_price': 1.0,
+        'start_time': _NOW, 'end_time': _NOW, 'confirm_person': 'a'}),
+)
+
+
+def iter_filter_combinations(sample_kwargs):
+    """枚举过滤参数的所有非空组合, 每个组合分别用offset和cursor分页"""
+    names = sorted(sample_kwargs)
+    for size in range(1, len(names) + 1):
+        for combination in itertools.combinations(names, size):
+            kwargs = {name: sample_kwargs[name] for name in combination}
+            yield dict(kwargs, page=1)
+            yield dict(kwargs, cursor=1)
+
+
+@contextlib.contextmanager
+def _capture_selects(engines):
+    captured = []
+
+    def _before_cursor_execute(conn, cursor, statement, parameters,
+                               context, executemany):
+        sql = statement.upper()
+        if sql.lstrip().startswith('SELECT') and 'WHERE' in sql:
+            captured.append((conn.engine, statement, parameters))
+
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    try:
+        yield captured
+    finally:
+        for engine in engines:
+            event.remove(
+                engine, 'before_cursor_execute', _before_cursor_execute)
+
+
+def _explain(engine, statement, parameters):
+    if engine.dialect.name == 'sqlite':
+        sql = 'EXPLAIN QUERY PLAN ' + statement
+    else:
+        sql = 'EXPLAIN ' + statement
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(sql, parameters)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+    finally:
+        connection.close()
+
+
+def _is_full_scan(dialect_name, row):
+    if dialect_name == 'sqlite':
+        detail = row['detail']
+        return detail.startswith('SCAN ') and 'INDEX' not in detail
+    # <derivedN>等临时表不是真实的表
+    if (row.get('table') or '').startswith('<'):
+        return False
+    return row.get('type') == 'ALL' and not row.get('possible_keys')
+
+
+def check_searches(specs=SEARCH_SPECS):
+    """返回缺索引的语句列表: [(model名, 过滤参数, 语句, EXPLAIN行), ...]"""
+    session = DBSession()
+    engines = [session.engine] + list(session.replica_engines)
+    max_size, query_cache.max_size = query_cache.max_size, 0
+    problems = []
+    explained = set()
+    try:
+        for model, sample_kwargs in specs:
+            for kwargs in iter_filter_combinations(sample_kwargs):
+                with _capture_selects(engines) as captured:
+                    model.search(**kwargs)
+                for engine, statement, parameters in captured:
+                    if statement in explained:
+                        continue
+                    explained.add(statement)
+                    for row in _explain(engine, statement, parameters):
+                        if _is_full_scan(engine.dialect.name, row):
+                            problems.append(
+                                (model.__name__, kwargs, statement, row))
+    finally:
+        query_cache.max_size = max_size
+        DBSession.remove()
+    return problems
+
+
+def ensure_indexes(engine):
+    """给已有的表补建模型中声明了但库里还没有的索引, 返回新建的索引名列表"""
+    inspector = inspect(engine)
+    table_names = set(inspector.get_table_names())
+    created = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in table_names:
+            continue
+        existing = set(
+            index['name'] for index in inspector.get_indexes(table.name))
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            if index.name in existing:
+                continue
+            index.create(engine)
+            created.append('{}.{}'.format(table.name, index.name))
+    return created
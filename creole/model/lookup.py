@@ -0,0 +1,120 @@
+# coding: utf-8
+"""外键校验用的引用表查询缓存
+
+国家, 城市, 各类公司, 车辆类型等引用表的存在性校验在创建/更新时被大量重复执行,
+这里做两级缓存:
+
+1. 请求级memo, 存放在Session.info中, 请求结束Session被remove时一起丢弃;
+2. 进程级TTL缓存, 只缓存确认存在的行, 行被更新或删除时立即失效.
+
+不存在的id不做缓存, 新建的行可以马上被校验通过.
+已经有进程内快照的表(国家, 城市)通过`register_source`优先从快照读取.
+"""
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import object_session
+
+from . import DBSession
+from ..config import setting
+
+_MEMO_KEY = 'reference_lookup_memo'
+
+
+class ReferenceLookup(object):
+    def __init__(self, ttl):
+        self.ttl = ttl
+        # (table_name, id) -> (expire_at, {column: value})
+        self._cache = {}
+        self._models = set()
+        # model -> get(id), 由进程内快照提供数据的表
+        self._sources = {}
+
+    def register_source(self, model, getter):
+        self._sources[model] = getter
+
+    def _register(self, model):
+        # 第一次查询某张表时才挂事件, 在此之前进程内也没有它的缓存
+        if model in self._models:
+            return
+        self._models.add(model)
+        event.listen(model, 'after_update', self._on_change)
+        event.listen(model, 'after_delete', self._on_change)
+
+    def _on_change(self, mapper, connection, target):
+        self.invalidate(target.__tablename__, target.id,
+                        session=object_session(target))
+
+    def invalidate(self, table_name, id, session=None):
+        key = (table_name, id)
+        self._cache.pop(key, None)
+        session = session or DBSession()
+        memo = session.info.get(_MEMO_KEY)
+        if memo:
+            memo.pop(key, None)
+
+    def clear(self):
+        self._cache.clear()
+
+    def get(self, model, id):
+        """返回引用行的{列名: 值}, 不存在时返回None"""
+        source = self._sources.get(model)
+        if source is not None:
+            # 快照可能还没刷新到其他进程刚新建的行, 未命中时再查库
+            value = source(id)
+            if value is not None:
+                return value
+        self._register(model)
+        key = (model.__tablename__, id)
+        memo = DBSession().info.setdefault(_MEMO_KEY, {})
+        if key in memo:
+            return memo[key]
+        now = time.time()
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] > now:
+            memo[key] = cached[1]
+            return cached[1]
+        obj = model.get_by_id(id)
+        if obj is None:
+            return None
+        return self._store(key, obj, memo, now)
+
+    def _store(self, key, obj, memo, now):
+        value = {k: getattr(obj, k) for k in obj.__table__.columns.keys()}
+        self._cache[key] = (now + self.ttl, value)
+        memo[key] = value
+        return value
+
+    def prime(self, model, ids):
+        """批量预取一组id, 之后对这些id的get/exists不再逐个查库
+
+        没有缓存的id合并成一次IN查询, 用于批量导入等一次校验很多行的场景.
+        """
+        source = self._sources.get(model)
+        self._register(model)
+        memo = DBSession().info.setdefault(_MEMO_KEY, {})
+        now = time.time()
+        missing = set()
+        for id in set(ids):
+            if id is None:
+                continue
+            if source is not None and source(id) is not None:
+                continue
+            key = (model.__tablename__, id)
+            if key in memo:
+                continue
+            cached = self._cache.get(key)
+            if cached is not None and cached[0] > now:
+                memo[key] = cached[1]
+                continue
+            missing.add(id)
+        if not missing:
+            return
+        for id, obj in model.get_by_ids(missing).iteritems():
+            self._store((model.__tablename__, id), obj, memo, now)
+
+    def exists(self, model, id):
+        return self.get(model, id) is not None
+
+
+reference_lookup = ReferenceLookup(ttl=setting.CREOLE_REFERENCE_CACHE_TTL)
@@ -5,6 +5,7 @@ from sqlalchemy import (
     Integer,
     Index,
     String,
+    Float,
 )
 from sqlalchemy.orm import validates
 from sqlalchemy.ext.declarative import declared_attr
@@ -14,6 +15,7 @@ from sqlalchemy.dialects.mysql import (
 
 from . import DBSession
 from .base import BaseMixin
+from .lookup import reference_lookup
 from .country import Country, City
 from ..util import Enum
 from ..exc import (
@@ -98,16 +100,33 @@ class CompanyMixin(BaseMixin):
 
     @validates('country_id')
     def _validate_country_id(self, key, country_id):
-        country = DBSession().query(Country).filter(
-            Country.id==country_id).first()
-        if not country:
+        if not reference_lookup.exists(Country, country_id):
             raise_error_json(InvalidateError(args=('country_id', country_id,)))
         return country_id
 
     @classmethod
     def _validate_country_and_city(cls, country_id, city_id):
-        city = DBSession().query(City).filter(City.id==city_id).first()
+        city = reference_lookup.get(City, city_id)
         if not city:
             raise_error_json(ClientError(errcode=CreoleErrCode.CITY_NOT_EXIST))
-        elif city.country_id != country_id:
+        elif city['country_id'] != country_id:
             raise_error_json(InvalidateError(errcode=CreoleErrCode.COUNTRY_NOT_EXIST))
+
+
+class GeoMixin(object):
+    """经纬度坐标, 用于附近搜索(见geo.py), 两者要么都有要么都为空"""
+    # FLOAT(53)即DOUBLE, 单精度FLOAT在经纬度上只能精确到米级
+    latitude = Column(Float(precision=53), nullable=True, doc=u'纬度')
+    longitude = Column(Float(precision=53), nullable=True, doc=u'经度')
+
+    @validates('latitude')
+    def _validate_latitude(self, key, latitude):
+        if latitude is not None and not -90 <= latitude <= 90:
+            raise_error_json(InvalidateError(args=('latitude', latitude,)))
+        return latitude
+
+    @validates('longitude')
+    def _validate_longitude(self, key, longitude):
+        if longitude is not None and not -180 <= longitude <= 180:
+            raise_error_json(InvalidateError(args=('longitude', longitude,)))
+        return longitude
@@ -0,0 +1,178 @@
+# coding: utf-8
+"""search()查询结果的进程内缓存
+
+- 以编译后的SQL加绑定参数作为key;
+- 每条结果记录它读取的表及这些表当时的版本号, Session flush写到某张表时
+  把该表的版本号+1, 提交后再+1一次, 旧版本的结果在下次读取时丢弃;
+- 按LRU淘汰, 最多保存`max_size`条;
+- 同一个key同时只有一个greenlet在查库, 其余的等待它的结果; 查库的greenlet
+  出错或被中断(gevent.Timeout等)时, 或者等待超时, 等待方自己查库.
+
+缓存的ORM对象是脱离Session的副本, 命中时用`merge(load=False)`
+放进当前Session, 不会产生SQL.
+"""
+import time
+import cPickle as pickle
+from itertools import chain
+from collections import OrderedDict, defaultdict
+
+from gevent.event import AsyncResult
+from sqlalchemy import event
+from sqlalchemy.sql.util import find_tables
+
+from . import DBSession
+from ..config import setting
+
+_PENDING_KEY = 'query_cache_pending_tables'
+
+
+def _detached_copy(obj_list):
+    return pickle.loads(pickle.dumps(obj_list, pickle.HIGHEST_PROTOCOL))
+
+
+def _has_pending_changes(session):
+    # 有未flush或已flush未提交的修改时直接查库, 既能读到自己的写,
+    # 也不会把未提交的数据放进缓存
+    return bool(session.new or session.dirty or session.deleted
+                or session.info.get(_PENDING_KEY))
+
+
+class ComputeInterrupted(Exception):
+    """查库的greenlet被BaseException(gevent.Timeout, GreenletExit)中断"""
+
+
+class QueryCache(object):
+    def __init__(self, max_size, ttl, wait_timeout):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.wait_timeout = wait_timeout
+        # key -> (expire_at, ((table_name, version), ...), value)
+        self._entries = OrderedDict()
+        self._table_versions = defaultdict(int)
+        # key -> AsyncResult, 正在查库的key
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, kind, query):
+        statement = query.statement
+        compiled = statement.compile()
+        params = tuple(sorted(compiled.params.items()))
+        tables = sorted(set(table.name for table in find_tables(statement)))
+        return (kind, unicode(compiled), params), tables
+
+    def _get_entry(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return None
+        expire_at, versions, _ = entry
+        if expire_at <= time.time():
+            return None
+        for table_name, version in versions:
+            if self._table_versions[table_name] != version:
+                return None
+        # 重新插入到末尾, 标记为最近使用
+        self._entries[key] = entry
+        return entry
+
+    def _set_entry(self, key, versions, value):
+        self._entries[key] = (time.time() + self.ttl, versions, value)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def get_or_compute(self, key, tables, compute):
+        """key未命中时调用compute()并缓存结果, tables为结果依赖的表名"""
+        entry = self._get_entry(key)
+        if entry is not None:
+            self.hits += 1
+            return entry[2]
+        waiter = self._inflight.get(key)
+        if waiter is not None:
+            waiter.wait(self.wait_timeout)
+            if waiter.successful():
+                return waiter.value
+            # 查库的greenlet失败, 被中断或者等待超时, 由自己重新查询
+            return compute()
+        self.misses += 1
+        # 在查库前记录版本号, 查询期间表被修改的话结果直接作废
+        versions = tuple(
+            (table_name, self._table_versions[table_name])
+            for table_name in tables)
+        result = self._inflight[key] = AsyncResult()
+        try:
+            value = compute()
+        except Exception as e:
+            result.set_exception(e)
+            raise
+        finally:
+            self._inflight.pop(key, None)
+            if not result.ready():
+                # 被BaseException中断, 不能把它传给等待的greenlet,
+                # 否则会被当成它们自己的超时或退出
+                result.set_exception(ComputeInterrupted())
+        self._set_entry(key, versions, value)
+        result.set(value)
+        return value
+
+    def all(self, query):
+        """缓存版的query.all()"""
+        session = query.session
+        if _has_pending_changes(session):
+            return query.all()
+        key, tables = self._key('all', query)
+        obj_list = self.get_or_compute(
+            key, tables, lambda: _detached_copy(query.all()))
+        return [session.merge(obj, load=False) for obj in obj_list]
+
+    def count(self, query):
+        """缓存版的query.count()"""
+        if _has_pending_changes(query.session):
+            return query.count()
+        key, tables = self._key('count', query)
+        return self.get_or_compute(key, tables, query.count)
+
+    def invalidate_tables(self, table_names):
+        for table_name in table_names:
+            self._table_versions[table_name] += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+    def bind_session(self, scoped_session):
+        event.listen(scoped_session, 'after_flush', self._after_flush)
+        event.listen(scoped_session, 'after_commit', self._after_commit)
+        event.listen(scoped_session, 'after_soft_rollback',
+                     self._after_rollback)
+
+    def _after_flush(self, session, flush_context):
+        table_names = set(
+            obj.__table__.name
+            for obj in chain(session.new, session.dirty, session.deleted))
+        if not table_names:
+            return
+        self.invalidate_tables(table_names)
+        session.info.setdefault(_PENDING_KEY, set()).update(table_names)
+
+    def _after_commit(self, session):
+        # 提交前其他greenlet可能又缓存了旧数据, 提交后再失效一次
+        table_names = session.info.pop(_PENDING_KEY, None)
+        if table_names:
+            self.invalidate_tables(table_names)
+
+    def _after_rollback(self, session, previous_transaction):
+        session.info.pop(_PENDING_KEY, None)
+
+
+query_cache = QueryCache(
+    max_size=setting.CREOLE_QUERY_CACHE_SIZE,
+    ttl=setting.CREOLE_QUERY_CACHE_TTL,
+    wait_timeout=setting.CREOLE_QUERY_CACHE_WAIT_TIMEOUT)
+query_cache.bind_session(DBSession)
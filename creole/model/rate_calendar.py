@@ -0,0 +1,274 @@
+# coding: utf-8
+"""酒店价格日历: 按hotel_fee_id把各价格表的日期区间建成区间索引
+
+房价, 餐饮价格, 房间级别附加费, 节日附加费都是[start_time, end_time]区间
+(按天, 两端都包含). 每张表按类型(房型/餐饮类型/房间级别)分别建一个
+`IntervalIndex`: 所有区间的端点排序后把时间轴切成互不重叠的小段, 每段记录
+覆盖它的价格, 查询某天的价格只需一次二分查找.
+
+缓存分两层:
+
+1. 某个费用的全部价格行以(RATE_CACHE_TABLE, hotel_fee_id)缓存在
+   entity_cache中, 各进程共享; 价格表的增删改会让它失效(见hotel.py),
+   重新加载时生成新的generation;
+2. 进程内按hotel_fee_id缓存建好的索引, generation与entity_cache中的
+   一致时直接复用, 只有价格被修改过才重新建索引.
+
+同一类型的价格区间不允许重叠, 写入前由`check_price_overlap`整批检查.
+"""
+import uuid
+import datetime
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+
+from sqlalchemy import select, or_
+
+from . import DBSession
+from .hotel import RATE_CACHE_TABLE, HOTEL_FEE_PRICE_TABLES
+from ..redis import entity_cache
+from ..util import timestamp_to_date
+from ..exc import (
+    raise_error_json,
+    ClientError,
+    InvalidateError,
+    CreoleErrCode,
+)
+
+# 进程内最多缓存多少个费用的索引
+RATE_INDEX_CACHE_SIZE = 1000
+
+# 数据key -> (model, 类型列名)
+RATE_TABLES = HOTEL_FEE_PRICE_TABLES
+
+# model -> 类型列名
+TYPE_COLUMN_MAP = {model: type_column for model, type_column in RATE_TABLES.values()}
+
+
+class IntervalIndex(object):
+    """闭区间[start, end]上的值, 区间端点是date.toordinal()"""
+
+    def __init__(self, intervals):
+        points = sorted(set(
+            point for start, end, _ in intervals
+            for point in (start, end + 1)))
+        segments = [[] for _ in points]
+        for start, end, value in intervals:
+            for index in xrange(bisect_left(points, start),
+                                bisect_left(points, end + 1)):
+                segments[index].append(value)
+        self._points = points
+        self._segments = segments
+
+    def query(self, day):
+        """返回覆盖day的所有值"""
+        index = bisect_right(self._points, day.toordinal()) - 1
+        if index < 0:
+            return []
+        return self._segments[index]
+
+
+class RateCalendar(object):
+    """一个费用的价格日历; 历史数据中区间重叠时以后录入的(id更大的)为准"""
+
+    def __init__(self, hotel_fee_id, rows_map):
+        self.hotel_fee_id = hotel_fee_id
+        # 数据key -> {类型: IntervalIndex}, 值为(id, 价格)
+        self._indexes = {}
+        for key, rows in rows_map.iteritems():
+            intervals_map = {}
+            for row in rows:
+                intervals_map.setdefault(row['type'], []).append(
+                    (row['start'], row['end'], (row['id'], row['price'])))
+            self._indexes[key] = {
+                type: IntervalIndex(intervals)
+                for type, intervals in intervals_map.iteritems()
+            }
+
+    def _latest_price(self, key, type, day):
+        index = self._indexes[key].get(type)
+        if index is None:
+            return None
+        values = index.query(day)
+        return max(values)[1] if values else None
+
+    def room_price(self, day, room_type):
+        return self._latest_price('room_price', room_type, day)
+
+    def meal_price(self, day, meal_type):
+        return self._latest_price('meal_price', meal_type, day)
+
+    def room_level_charge(self, day, room_level):
+        return self._latest_price('room_additional_charge', room_level, day)
+
+    def festival_charges(self, day):
+        """返回{节日类型: 附加价格}"""
+        charges = {}
+        for festival_type in self._indexes['festival_additional_charge']:
+            price = self._latest_price(
+                'festival_additional_charge', festival_type, day)
+            if price is not None:
+                charges[festival_type] = price
+        return charges
+
+
+def _load_rows_map(hotel_fee_ids):
+    """每张价格表一次IN查询, 返回{hotel_fee_id: 数据}"""
+    session = DBSession()
+    data_map = {
+        hotel_fee_id: dict(
+            {key: [] for key in RATE_TABLES}, generation=uuid.uuid4().hex)
+        for hotel_fee_id in hotel_fee_ids
+    }
+    for key, (model, type_column) in RATE_TABLES.iteritems():
+        table = model.__table__
+        rows = session.execute(
+            select([table.c.id, table.c.hotel_fee_id, table.c[type_column],
+                    table.c.start_time, table.c.end_time, table.c.price])
+            .where(table.c.hotel_fee_id.in_(data_map.keys())))
+        for id, hotel_fee_id, type, start_time, end_time, price in rows:
+            data_map[hotel_fee_id][key].append({
+                'id': id,
+                'type': type,
+                'start': start_time.date().toordinal(),
+                'end': end_time.date().toordinal(),
+                'price': price,
+            })
+    return data_map
+
+
+def _load_rows(hotel_fee_id):
+    return _load_rows_map([hotel_fee_id])[hotel_fee_id]
+
+
+class RateCalendarCache(object):
+    def __init__(self, max_size):
+        self.max_size = max_size
+        # hotel_fee_id -> (generation, RateCalendar)
+        self._calendars = OrderedDict()
+
+    def get(self, hotel_fee_id):
+        data = entity_cache.get_or_load(
+            RATE_CACHE_TABLE, hotel_fee_id, _load_rows)
+        return self._get_calendar(hotel_fee_id, data)
+
+    def get_many(self, hotel_fee_ids):
+        """批量版本, 未缓存的费用一起加载, 返回{hotel_fee_id: RateCalendar}"""
+        data_map = entity_cache.get_many_or_load(
+            RATE_CACHE_TABLE, hotel_fee_ids, _load_rows_map)
+        return {
+            hotel_fee_id: self._get_calendar(hotel_fee_id, data)
+            for hotel_fee_id, data in data_map.iteritems()
+        }
+
+    def _get_calendar(self, hotel_fee_id, data):
+        cached = self._calendars.pop(hotel_fee_id, None)
+        if cached is not None and cached[0] == data['generation']:
+            calendar = cached[1]
+        else:
+            calendar = RateCalendar(hotel_fee_id, {
+                key: data[key] for key in RATE_TABLES})
+        # 最近使用的放到最后, 超出容量时淘汰最久未使用的
+        self._calendars[hotel_fee_id] = (data['generation'], calendar)
+        while len(self._calendars) > self.max_size:
+            self._calendars.popitem(last=False)
+        return calendar
+
+    def clear(self):
+        self._calendars.clear()
+
+
+def find_overlap(ranges):
+    """ranges: [(分组key, 开始, 结束, 标识), ...], 区间两端都包含
+
+    排序后每组扫描一遍, 记录目前结束得最晚的区间, 下一个区间的开始不晚于
+    它的结束就是重叠. 返回第一对重叠区间的(标识, 标识), 没有重叠时返回None.
+    """
+    latest = None
+    for item in sorted(ranges, key=lambda item: item[:3]):
+        if latest is not None and latest[0] == item[0]:
+            if item[1] <= latest[2]:
+                return latest[3], item[3]
+            if item[2] <= latest[2]:
+                continue
+        latest = item
+    return None
+
+
+def _to_ordinal(name, value):
+    if isinstance(value, datetime.datetime):
+        return value.date().toordinal()
+    try:
+        return timestamp_to_date(int(value)).date().toordinal()
+    except (TypeError, ValueError):
+        raise_error_json(InvalidateError(args=(name, value,)))
+
+
+def check_price_overlap(model, create_list=None, update_list=None,
+                        delete_id_list=None):
+    """检查一次编辑之后同一费用, 同一类型的价格区间是否重叠
+
+    提交的新增, 修改, 删除按最终结果一起检查: 已有的区间一次查询取出,
+    去掉被修改和删除的行, 加上修改后和新增的行, 再排序扫描.
+    """
+    type_column = TYPE_COLUMN_MAP[model]
+    create_list = [item for item in create_list or [] if item]
+    update_list = [item for item in update_list or [] if item]
+    if not create_list and not update_list:
+        return
+    update_map = {int(item['id']): item for item in update_list}
+    delete_ids = set(int(id) for id in delete_id_list or [])
+    fee_ids = set(
+        int(item['hotel_fee_id']) for item in create_list + update_list
+        if item.get('hotel_fee_id') is not None)
+
+    session = DBSession()
+    # 写请求, 要读到最新的数据
+    session.stick_to_primary = True
+    table = model.__table__
+    condition = table.c.hotel_fee_id.in_(fee_ids)
+    if update_map:
+        condition = or_(condition, table.c.id.in_(update_map.keys()))
+    rows = session.execute(
+        select([table.c.id, table.c.hotel_fee_id, table.c[type_column],
+                table.c.start_time, table.c.end_time]).where(condition))
+
+    ranges = []
+
+    def add_range(ref, values):
+        start = _to_ordinal('start_time', values['start_time'])
+        end = _to_ordinal('end_time', values['end_time'])
+        if end < start:
+            raise_error_json(
+                InvalidateError(args=('end_time', values['end_time'],)))
+        key = (int(values['hotel_fee_id']), int(values[type_column]))
+        ranges.append((key, start, end, ref))
+
+    for id, hotel_fee_id, type, start_time, end_time in rows:
+        if id in delete_ids:
+            continue
+        values = {
+            'hotel_fee_id': hotel_fee_id,
+            type_column: type,
+            'start_time': start_time,
+            'end_time': end_time,
+        }
+        # 修改时没有提交的字段沿用原值
+        values.update(update_map.pop(id, {}))
+        add_range(u'id={}'.format(id), values)
+    for index, item in enumerate(create_list):
+        add_range(u'create_list[{}]'.format(index), item)
+
+    overlap = find_overlap(ranges)
+    if overlap is not None:
+        raise_error_json(ClientError(
+            errcode=CreoleErrCode.HOTEL_PRICE_OVERLAPPED,
+            msg=u'the date range of {} overlaps {}'.format(*overlap)))
+
+
+def iter_days(start_date, end_date):
+    """[start_date, end_date)中的每一天"""
+    for offset in xrange((end_date - start_date).days):
+        yield start_date + datetime.timedelta(days=offset)
+
+
+rate_calendar_cache = RateCalendarCache(RATE_INDEX_CACHE_SIZE)
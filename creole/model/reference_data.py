@@ -0,0 +1,69 @@
+# coding: utf-8
+"""进程内的国家/城市数据快照
+
+国家和城市表很少变化, 却在国家列表, 城市下拉框和各类外键校验中被频繁读取.
+这里在每个worker内保存一份完整快照:
+
+- 按id索引的国家和城市;
+- 国家id到城市列表的映射.
+
+增删改国家或城市时在同一事务中把`data_version`表里的版本号+1,
+各worker最多每`CREOLE_REFERENCE_DATA_CHECK_INTERVAL`秒查询一次版本号,
+版本号变化时整体重新加载, 其余请求不访问数据库. 版本号和数据都从主库读取,
+见`VersionedSnapshot`.
+"""
+from collections import defaultdict
+
+from . import DBSession
+from .data_version import VersionedSnapshot
+
+
+class ReferenceDataStore(VersionedSnapshot):
+    def __init__(self, name, country_model, city_model, check_interval):
+        super(ReferenceDataStore, self).__init__(name, check_interval)
+        self.country_model = country_model
+        self.city_model = city_model
+        self._country_map = {}
+        self._city_map = {}
+        self._country_city_map = {}
+
+    def _select_all(self, model):
+        # 直接执行select, 不经过Session的identity map和autoflush
+        table = model.__table__
+        rows = DBSession().execute(table.select().order_by(table.c.id))
+        return [dict(row) for row in rows]
+
+    def _load(self):
+        country_list = self._select_all(self.country_model)
+        city_list = self._select_all(self.city_model)
+        country_city_map = defaultdict(list)
+        for city in city_list:
+            country_city_map[city['country_id']].append(city)
+        # 整体替换, 读取方不会看到加载了一半的数据
+        self._country_map, self._city_map, self._country_city_map = (
+            {country['id']: country for country in country_list},
+            {city['id']: city for city in city_list},
+            dict(country_city_map),
+        )
+
+    def get_country(self, id):
+        """返回国家的{列名: 值}, 不存在时返回None"""
+        self._refresh()
+        country = self._country_map.get(id)
+        return dict(country) if country is not None else None
+
+    def get_city(self, id):
+        self._refresh()
+        city = self._city_map.get(id)
+        return dict(city) if city is not None else None
+
+    def get_all_countries(self):
+        self._refresh()
+        return [dict(self._country_map[id])
+                for id in sorted(self._country_map)]
+
+    def get_cities_by_country_id(self, country_id):
+        self._refresh()
+        return [dict(city)
+                for city in self._country_city_map.get(country_id, [])]
+
@@ -11,12 +11,16 @@ from sqlalchemy.dialects.mysql import (
     TINYINT,
 )
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm import validates
+from sqlalchemy.orm import validates, deferred
 from sqlalchemy.ext.declarative import declared_attr
 
 from . import Base, DBSession
 from .base import BaseMixin
-from .mixins import AccountMixin
+from . import fulltext
+from .geo import geo_index
+from ..redis import entity_cache
+from .lookup import reference_lookup
+from .mixins import AccountMixin, GeoMixin
 from ..util import Enum
 from .country import Country, City
 from ..exc import (
@@ -68,7 +72,11 @@ class Meal(Base, BaseMixin):
 
     @classmethod
     def get_by_restaurant_id(cls, restaurant_id):
-        return DBSession().query(cls).filter(cls.restaurant_id==restaurant_id).all()
+        return cls._get_by_column('restaurant_id', restaurant_id).all()
+
+    @classmethod
+    def get_by_restaurant_ids(cls, restaurant_ids):
+        return cls._get_by_column_in('restaurant_id', restaurant_ids)
 
     @classmethod
     def delete(cls, id):
@@ -78,6 +86,8 @@ class Meal(Base, BaseMixin):
             raise_error_json(
                 ClientError(errcode=CreoleErrCode.RESTAURANT_MEAL_TYPE_NOT_EXIST))
         session.delete(meal)
+        # 餐厅详情的缓存中带有套餐信息
+        entity_cache.invalidate(Restaurant.__tablename__, meal.restaurant_id)
         session.flush()
 
     @classmethod
@@ -89,6 +99,7 @@ class Meal(Base, BaseMixin):
             adult_fee=adult_fee, adult_cost=adult_cost,
             child_fee=child_fee, child_cost=child_cost)
         session.add(meal)
+        entity_cache.invalidate(Restaurant.__tablename__, restaurant_id)
         session.flush()
 
     @classmethod
@@ -108,11 +119,13 @@ class Meal(Base, BaseMixin):
         if child_cost:
             meal.child_cost = child_cost
         session.merge(meal)
+        entity_cache.invalidate(Restaurant.__tablename__, meal.restaurant_id)
         session.flush()
 
 
-class Restaurant(Base, BaseMixin):
+class Restaurant(Base, BaseMixin, GeoMixin):
     __tablename__ = 'restaurant'
+    DEFERRED_GROUPS = ('meal_intro',)
 
     TYPE = Enum(
         ('CHINESE', 1, u'中餐'),
@@ -190,12 +203,24 @@ class Restaurant(Base, BaseMixin):
     email_three = Column(String(30), nullable=True, doc=u'邮箱')
 
     # 餐厅套餐介绍
-    standard_meal_intro_cn = Column(Unicode(500), nullable=True, doc=u'标准餐中文介绍')
-    standard_meal_intro_en = Column(String(800), nullable=True, doc=u'标准餐英文介绍')
-    upgrade_meal_intro_cn = Column(Unicode(500), nullable=True, doc=u'升级餐中文介绍')
-    upgrade_meal_intro_en = Column(String(800), nullable=True, doc=u'升级餐英文介绍')
-    luxury_meal_intro_cn = Column(Unicode(500), nullable=True, doc=u'豪华餐中文介绍')
-    luxury_meal_intro_en = Column(String(800), nullable=True, doc=u'豪华餐英文介绍')
+    standard_meal_intro_cn = deferred(
+        Column(Unicode(500), nullable=True, doc=u'标准餐中文介绍'),
+        group='meal_intro')
+    standard_meal_intro_en = deferred(
+        Column(String(800), nullable=True, doc=u'标准餐英文介绍'),
+        group='meal_intro')
+    upgrade_meal_intro_cn = deferred(
+        Column(Unicode(500), nullable=True, doc=u'升级餐中文介绍'),
+        group='meal_intro')
+    upgrade_meal_intro_en = deferred(
+        Column(String(800), nullable=True, doc=u'升级餐英文介绍'),
+        group='meal_intro')
+    luxury_meal_intro_cn = deferred(
+        Column(Unicode(500), nullable=True, doc=u'豪华餐中文介绍'),
+        group='meal_intro')
+    luxury_meal_intro_en = deferred(
+        Column(String(800), nullable=True, doc=u'豪华餐英文介绍'),
+        group='meal_intro')
 
     @declared_attr
     def __table_args__(self):
@@ -205,14 +230,15 @@ class Restaurant(Base, BaseMixin):
             Index('ix_country_id', 'country_id'),
             Index('ix_city_id', 'city_id'),
             Index('ix_restaurant_type', 'restaurant_type'),
+            Index('idx_country_id_restaurant_type',
+                  'country_id', 'restaurant_type'),
+            Index('idx_city_id_restaurant_type', 'city_id', 'restaurant_type'),
         )
         return table_args + BaseMixin.__table_args__
 
     @validates('country_id')
     def _validate_country_id(self, key, country_id):
-        country = DBSession().query(Country).filter(
-            Country.id==country_id).first()
-        if not country:
+        if not reference_lookup.exists(Country, country_id):
             raise_error_json(InvalidateError(args=('country_id', country_id,)))
         return country_id
 
@@ -260,10 +286,10 @@ class Restaurant(Base, BaseMixin):
 
     @classmethod
     def _validate_country_and_city(cls, country_id, city_id):
-        city = DBSession().query(City).filter(City.id==city_id).first()
+        city = reference_lookup.get(City, city_id)
         if not city:
             raise_error_json(ClientError(errcode=CreoleErrCode.CITY_NOT_EXIST))
-        elif city.country_id != country_id:
+        elif city['country_id'] != country_id:
             raise_error_json(InvalidateError(errcode=CreoleErrCode.COUNTRY_NOT_EXIST))
 
     @classmethod
@@ -274,6 +300,7 @@ class Restaurant(Base, BaseMixin):
             raise_error_json(
                 ClientError(errcode=CreoleErrCode.RESTAURANT_NOT_EXIST))
         session.delete(restaurant)
+        entity_cache.invalidate(cls.__tablename__, id)
         session.flush()
 
     @classmethod
@@ -287,7 +314,7 @@ class Restaurant(Base, BaseMixin):
                standard_meal_intro_cn=None, standard_meal_intro_en=None,
                upgrade_meal_intro_cn=None, upgrade_meal_intro_en=None,
                luxury_meal_intro_cn=None, luxury_meal_intro_en=None,
-               intro_cn=None, intro_en=None):
+               intro_cn=None, intro_en=None, latitude=None, longitude=None):
         cls._validate_country_and_city(country_id, city_id)
         session = DBSession()
         restaurant = cls(
@@ -309,7 +336,8 @@ class Restaurant(Base, BaseMixin):
             upgrade_meal_intro_en=upgrade_meal_intro_en,
             luxury_meal_intro_cn=luxury_meal_intro_cn,
             luxury_meal_intro_en=luxury_meal_intro_en,
-            intro_cn=intro_cn, intro_en=intro_en
+            intro_cn=intro_cn, intro_en=intro_en,
+            latitude=latitude, longitude=longitude
         )
         try:
             session.add(restaurant)
@@ -332,6 +360,7 @@ class Restaurant(Base, BaseMixin):
         session = DBSession()
         try:
             session.merge(restaurant)
+            entity_cache.invalidate(cls.__tablename__, id)
             session.commit()
         except SQLAlchemyError as e:
             session.rollback()
@@ -340,9 +369,9 @@ class Restaurant(Base, BaseMixin):
     @classmethod
     def search(cls, country_id=None, city_id=None,
                restaurant_type=None,
-               page=1, number=20):
+               page=1, number=20, cursor=None, q=None, fields=None):
         session = DBSession()
-        query = session.query(cls)
+        query = cls._load_only(session.query(cls), fields)
         total = None
         if city_id:
             query = query.filter(cls.city_id==city_id)
@@ -350,9 +379,9 @@ class Restaurant(Base, BaseMixin):
             query = query.filter(cls.country_id==country_id)
         if restaurant_type:
             query = query.filter(cls.restaurant_type==restaurant_type)
-        if page == 1:
-            total = query.count()
-        shop_list = query.offset((page - 1) * number).limit(number).all()
+        if q:
+            query = fulltext.search(query, cls, q)
+        shop_list, total = cls._paginate(query, page, number, cursor)
         return shop_list, total
 
 
@@ -378,8 +407,7 @@ class RestaurantAccount(Base, AccountMixin):
 
     @classmethod
     def get_by_restaurant_id(cls, restaurant_id):
-        account = DBSession().query(cls).filter(
-            cls.restaurant_id==restaurant_id).all()
+        account = cls._get_by_column('restaurant_id', restaurant_id).all()
         return account
 
     @classmethod
@@ -420,3 +448,20 @@ class RestaurantAccount(Base, AccountMixin):
             setattr(account, k, v)
         session.merge(account)
         session.flush()
+
+
+fulltext.register(
+    Restaurant,
+    fulltext.FullTextIndex(
+        'ft_meal_intro_cn',
+        ['standard_meal_intro_cn', 'upgrade_meal_intro_cn',
+         'luxury_meal_intro_cn'],
+        fulltext.CN),
+    fulltext.FullTextIndex(
+        'ft_meal_intro_en',
+        ['standard_meal_intro_en', 'upgrade_meal_intro_en',
+         'luxury_meal_intro_en'],
+        fulltext.EN),
+)
+
+geo_index.register('restaurant', Restaurant)
@@ -11,13 +11,17 @@ from sqlalchemy.exc import IntegrityError
 from sqlalchemy.dialects.mysql import (
     TINYINT,
 )
-from sqlalchemy.orm import validates
+from sqlalchemy.orm import validates, deferred
 from sqlalchemy.ext.declarative import declared_attr
 
 from . import Base, DBSession
 from .country import Country, City
 from .base import BaseMixin
-from .mixins import CompanyMixin, ContactMixin
+from . import fulltext
+from .geo import geo_index
+from ..redis import entity_cache
+from .lookup import reference_lookup
+from .mixins import CompanyMixin, ContactMixin, GeoMixin
 from ..exc import (
     raise_error_json,
     InvalidateError,
@@ -78,9 +82,9 @@ class ShopCompany(Base, CompanyMixin):
 
     @classmethod
     def search(cls, name=None, name_en=None, country_id=None,
-               city_id=None, page=1, number=20):
+               city_id=None, page=1, number=20, cursor=None, fields=None):
         session = DBSession()
-        query = session.query(cls)
+        query = cls._load_only(session.query(cls), fields)
         total = None
         if name:
             company_list = query.filter(cls.name==name).all()
@@ -91,9 +95,7 @@ class ShopCompany(Base, CompanyMixin):
                 query = query.filter(cls.city_id==city_id)
             elif country_id:
                 query = query.filter(cls.country_id==country_id)
-            if page == 1:
-                total = query.count()
-            company_list = query.offset((page - 1) * number).limit(number).all()
+            company_list, total = cls._paginate(query, page, number, cursor)
         return company_list, total
 
 
@@ -111,8 +113,7 @@ class ShopCompanyContact(Base, ContactMixin):
 
     @classmethod
     def get_by_company_id(cls, company_id):
-        session = DBSession()
-        return session.query(cls).filter(cls.company_id==company_id).all()
+        return cls._get_by_column('company_id', company_id).all()
 
     @classmethod
     def create(cls, contact, position, telephone, email, company_id):
@@ -190,8 +191,7 @@ class ShopFee(Base, BaseMixin):
 
     @classmethod
     def get_by_shop_id(cls, shop_id):
-        session = DBSession()
-        fee_list = session.query(cls).filter(cls.shop_id==shop_id).all()
+        fee_list = cls._get_by_column('shop_id', shop_id).all()
         return fee_list
 
     @classmethod
@@ -260,8 +260,7 @@ class ShopContact(Base, ContactMixin):
 
     @classmethod
     def get_by_shop_id(cls, shop_id):
-        session = DBSession()
-        return session.query(cls).filter(cls.shop_id==shop_id).all()
+        return cls._get_by_column('shop_id', shop_id).all()
 
     @classmethod
     def create(cls, contact, position, telephone, email, shop_id):
@@ -284,7 +283,7 @@ class ShopContact(Base, ContactMixin):
         session.flush()
 
 
-class Shop(Base, BaseMixin):
+class Shop(Base, BaseMixin, GeoMixin):
     """购物店"""
     __tablename__ = 'shop'
     SHOP_TYPE = Enum(
@@ -292,6 +291,7 @@ class Shop(Base, BaseMixin):
         ('TEA', 2, u'红茶'),
         ('OTHER', 3, u'其他'),
     )
+    DEFERRED_GROUPS = ('intro',)
 
     country_id = Column(Integer, nullable=False, doc=u'国家名')
     city_id = Column(Integer, nullable=False, doc=u'城市名')
@@ -302,8 +302,12 @@ class Shop(Base, BaseMixin):
     name_en = Column(String(60), unique=True, nullable=False, doc=u'英文店名')
     nickname_en = Column(String(20), nullable=False, doc=u'英文简称')
 
-    intro_cn = Column(Unicode(500), doc=u'中文介绍')
-    intro_en = Column(String(500), doc=u'英文介绍')
+    intro_cn = deferred(
+        Column(Unicode(500), doc=u'中文介绍'),
+        group='intro')
+    intro_en = deferred(
+        Column(String(500), doc=u'英文介绍'),
+        group='intro')
     note = Column(String(100), nullable=True, doc=u'备注')
 
     @declared_attr
@@ -321,9 +325,7 @@ class Shop(Base, BaseMixin):
 
     @validates('company_id')
     def _validate_company_id(self, key, company_id):
-        shop_company = DBSession().query(ShopCompany).filter(
-            ShopCompany.id==company_id).first()
-        if not shop_company:
+        if not reference_lookup.exists(ShopCompany, company_id):
             raise_error_json(InvalidateError(args=('company_id' ,company_id,)))
         return company_id
 
@@ -335,33 +337,29 @@ class Shop(Base, BaseMixin):
 
     @validates('country_id')
     def _validate_country_id(self, key, country_id):
-        country = DBSession().query(Country).filter(
-            Country.id==country_id).first()
-        if not country:
+        if not reference_lookup.exists(Country, country_id):
             raise_error_json(InvalidateError(args=('country_id', country_id,)))
         return country_id
 
     @classmethod
     def _validate_country_and_city(cls, country_id, city_id):
-        city = DBSession().query(City).filter(
-            City.id==city_id).first()
+        city = reference_lookup.get(City, city_id)
         if not city:
             raise_error_json(ClientError(errcode=CreoleErrCode.CITY_NOT_EXIST))
-        elif city.country_id != country_id:
+        elif city['country_id'] != country_id:
             raise_error_json(InvalidateError(errcode=CreoleErrCode.COUNTRY_NOT_EXIST))
 
     @classmethod
     def get_by_company_id(cls, company_id):
-        session = DBSession()
-        shop_list = session.query(cls).filter(
-            cls.company_id==company_id).all()
+        shop_list = cls._get_by_column('company_id', company_id).all()
         return shop_list
 
     @classmethod
     def search(cls, country_id=None, city_id=None, company_id=None,
-               shop_type=None, page=1, number=20):
+               shop_type=None, page=1, number=20, cursor=None, q=None,
+               fields=None):
         session = DBSession()
-        query = session.query(cls)
+        query = cls._load_only(session.query(cls), fields)
         total = None
         if city_id:
             query = query.filter(cls.city_id==city_id)
@@ -371,22 +369,23 @@ class Shop(Base, BaseMixin):
             query = query.filter(cls.company_id==company_id)
         if shop_type:
             query = query.filter(cls.shop_type==shop_type)
-        if page == 1:
-            total = query.count()
-        shop_list = query.offset((page - 1) * number).limit(number).all()
+        if q:
+            query = fulltext.search(query, cls, q)
+        shop_list, total = cls._paginate(query, page, number, cursor)
         return shop_list, total
 
     @classmethod
     def create(cls, name, name_en, nickname_en, address, country_id,
                city_id, company_id, shop_type, intro_cn='', intro_en='',
-               note=None):
+               note=None, latitude=None, longitude=None):
         cls._validate_country_and_city(country_id, city_id)
         session = DBSession()
         shop = cls(
             name=name, name_en=name_en, address=address,
             nickname_en=nickname_en, country_id=country_id,
             city_id=city_id, company_id=company_id, shop_type=shop_type,
-            intro_cn=intro_cn, intro_en=intro_en, note=note)
+            intro_cn=intro_cn, intro_en=intro_en, note=note,
+            latitude=latitude, longitude=longitude)
         session.add(shop)
         try:
             session.flush()
@@ -408,6 +407,7 @@ class Shop(Base, BaseMixin):
             setattr(shop, k, v)
         try:
             session.merge(shop)
+            entity_cache.invalidate(cls.__tablename__, id)
             session.flush()
         except IntegrityError:
             session.rollback()
@@ -422,6 +422,7 @@ class Shop(Base, BaseMixin):
             raise_error_json(
                 ClientError(errcode=CreoleErrCode.SHOP_NOT_EXIST))
         session.delete(shop)
+        entity_cache.invalidate(cls.__tablename__, id)
         session.flush()
 
     @classmethod
@@ -430,6 +431,8 @@ class Shop(Base, BaseMixin):
         session = DBSession()
         for item in shop_list:
             session.delete(item)
+        entity_cache.invalidate(
+            cls.__tablename__, *[item.id for item in shop_list])
         session.flush()
 
 
@@ -439,3 +442,12 @@ class ShopImage(Base, BaseMixin):
 
     shop_id = Column(Integer, nullable=False, doc=u'店铺id')
     image_hash = Column(String(128), default=None)
+
+
+fulltext.register(
+    Shop,
+    fulltext.FullTextIndex('ft_intro_cn', ['intro_cn'], fulltext.CN),
+    fulltext.FullTextIndex('ft_intro_en', ['intro_en'], fulltext.EN),
+)
+
+geo_index.register('shop', Shop)
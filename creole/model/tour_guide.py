@@ -13,13 +13,16 @@ from sqlalchemy.dialects.mysql import (
     TINYINT,
     SMALLINT,
 )
-from sqlalchemy.orm import validates
+from sqlalchemy.orm import validates, deferred
 from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy.exc import IntegrityError
 
 from . import Base, DBSession
 from .country import Country
 from .base import BaseMixin
+from . import fulltext
+from ..redis import entity_cache
+from .lookup import reference_lookup
 from .mixins import AccountMixin
 from ..exc import (
     raise_error_json,
@@ -33,6 +36,7 @@ from ..util import Enum
 class TourGuide(Base, BaseMixin):
     """导游"""
     __tablename__ = 'tour_guide'
+    DEFERRED_GROUPS = ('intro', 'passport_note')
 
     GUIDE_TYPE = Enum(
         ('INTERNATIONAL', 1, u'国际导游'),
@@ -81,12 +85,16 @@ class TourGuide(Base, BaseMixin):
     tour_guide_number = Column(String(20), nullable=False, doc=u'导游证编号')
     passport_country = Column(String(30), nullable=False, doc=u'签证国别')
     passport_type = Column(TINYINT, nullable=False, doc=u'签证类型')
-    passport_note = Column(String(128), nullable=True, doc=u'签证备注')
+    passport_note = deferred(
+        Column(String(128), nullable=True, doc=u'签证备注'),
+        group='passport_note')
     telephone_one = Column(String(20), nullable=False, doc=u'电话')
     telephone_two = Column(String(20), nullable=True, doc=u'电话')
     email = Column(String(30), nullable=True, doc=u'邮箱')
     company_id = Column(Integer, nullable=False, doc=u'所属公司')
-    intro = Column(String(256), nullable=True, doc=u'自我介绍')
+    intro = deferred(
+        Column(String(256), nullable=True, doc=u'自我介绍'),
+        group='intro')
     image_hash = Column(String(128), nullable=False, doc=u'护照/身份证照片')
 
     @declared_attr
@@ -98,14 +106,14 @@ class TourGuide(Base, BaseMixin):
             Index('ix_country_id', 'country_id'),
             Index('ix_gender', 'gender'),
             Index('idx_country_id_gender', 'country_id', 'gender'),
+            Index('ix_guide_type', 'guide_type'),
+            Index('idx_country_id_guide_type', 'country_id', 'guide_type'),
         )
         return table_args + BaseMixin.__table_args__
 
     @validates('country_id')
     def _validate_country_id(self, key, country_id):
-        country = DBSession().query(Country).filter(
-            Country.id==country_id).first()
-        if not country:
+        if not reference_lookup.exists(Country, country_id):
             raise_error_json(InvalidateError(args=('country_id', country_id,)))
         return country_id
 
@@ -190,6 +198,7 @@ class TourGuide(Base, BaseMixin):
             raise_error_json(
                 ClientError(errcode=CreoleErrCode.TOUR_GUIDE_NOT_EXIST))
         session.delete(tour_guide)
+        entity_cache.invalidate(cls.__tablename__, id)
         session.flush()
 
     @classmethod
@@ -202,13 +211,15 @@ class TourGuide(Base, BaseMixin):
         for k, v in kwargs.iteritems():
             setattr(tour_guide, k, v)
         session.merge(tour_guide)
+        entity_cache.invalidate(cls.__tablename__, id)
         session.flush()
 
     @classmethod
     def search(cls, country_id=None, gender=None,
-               guide_type=None, page=1, number=20):
+               guide_type=None, page=1, number=20, cursor=None, q=None,
+               fields=None):
         session = DBSession()
-        query = session.query(cls)
+        query = cls._load_only(session.query(cls), fields)
         total = None
         if country_id:
             query = query.filter(cls.country_id==country_id)
@@ -216,10 +227,9 @@ class TourGuide(Base, BaseMixin):
             query = query.filter(cls.gender==gender)
         if guide_type:
             query = query.filter(cls.guide_type==guide_type)
-        if page == 1:
-            total = query.count()
-        tour_guide_list = \
-            query.offset((page - 1) * number).limit(number).all()
+        if q:
+            query = fulltext.search(query, cls, q)
+        tour_guide_list, total = cls._paginate(query, page, number, cursor)
         return tour_guide_list, total
 
 
@@ -273,8 +283,7 @@ class TourGuideFee(Base,BaseMixin):
 
     @classmethod
     def get_by_tour_guide_id(cls, tour_guide_id):
-        fee = DBSession().query(cls).filter(
-            cls.tour_guide_id==tour_guide_id).first()
+        fee = cls._get_by_column('tour_guide_id', tour_guide_id).first()
         return fee
 
     @classmethod
@@ -337,8 +346,7 @@ class TourGuideAccount(Base, AccountMixin):
 
     @classmethod
     def get_by_tour_guide_id(cls, tour_guide_id):
-        account = DBSession().query(cls).filter(
-            cls.tour_guide_id==tour_guide_id).all()
+        account = cls._get_by_column('tour_guide_id', tour_guide_id).all()
         return account
 
     @classmethod
@@ -382,3 +390,10 @@ class TourGuideAccount(Base, AccountMixin):
             setattr(account, k, v)
         session.merge(account)
         session.flush()
+
+
+# 自我介绍中英文混写, 只建一个ngram索引
+fulltext.register(
+    TourGuide,
+    fulltext.FullTextIndex('ft_intro', ['intro'], fulltext.CN),
+)
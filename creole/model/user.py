@@ -106,27 +106,22 @@ class User(Base, BaseMixin):
 
     @classmethod
     def get_by_uuid(cls, uuid):
-        session = DBSession()
-        user = session.query(cls).filter(cls.uuid==uuid).first()
+        user = cls._get_by_column('uuid', uuid).first()
         return user
 
     @classmethod
     def get_by_id(cls, id):
-        session = DBSession()
-        user = session.query(cls).filter(cls.id==id).first()
+        user = cls._get_by_column('id', id).first()
         return user
 
     @classmethod
     def get_by_name(cls, user_name):
-        session = DBSession()
-        user = session.query(cls).filter(cls.user_name==user_name).first()
+        user = cls._get_by_column('user_name', user_name).first()
         return user
 
     @classmethod
     def get_by_customer_name(cls, customer_name):
-        session = DBSession()
-        user = session.query(cls).filter(
-            cls.customer_name==customer_name).first()
+        user = cls._get_by_column('customer_name', customer_name).first()
         return user
 
     @classmethod
@@ -18,6 +18,8 @@ from sqlalchemy.ext.declarative import declared_attr
 from ..util import Enum
 from . import Base, DBSession
 from .base import BaseMixin
+from ..redis import entity_cache
+from .lookup import reference_lookup
 from .mixins import AccountMixin, ContactMixin, CompanyMixin
 from .country import Country, City
 from ..exc import (
@@ -102,9 +104,10 @@ class VehicleCompany(Base, CompanyMixin):
 
     @classmethod
     def search(cls, name=None, name_en=None, country_id=None,
-               city_id=None, company_type=None, number=20, page=1):
+               city_id=None, company_type=None, number=20, page=1,
+               cursor=None, fields=None):
         session = DBSession()
-        query = session.query(cls)
+        query = cls._load_only(session.query(cls), fields)
         total = None
         if name:
             company_list = query.filter(cls.name==name).all()
@@ -117,9 +120,7 @@ class VehicleCompany(Base, CompanyMixin):
                 query = query.filter(cls.country_id==country_id)
             if company_type:
                 query = query.filter(cls.company_type==company_type)
-            if page == 1:
-                total = query.count()
-            company_list = query.offset((page - 1) * number).limit(number).all()
+            company_list, total = cls._paginate(query, page, number, cursor)
         return company_list, total
 
 
@@ -137,8 +138,7 @@ class VehicleContact(Base, ContactMixin):
 
     @classmethod
     def get_by_company_id(cls, company_id):
-        session = DBSession()
-        return session.query(cls).filter(cls.company_id==company_id).all()
+        return cls._get_by_column('company_id', company_id).all()
 
     @classmethod
     def create(cls, contact, position, telephone, email, company_id):
@@ -187,8 +187,7 @@ class VehicleAccount(Base, AccountMixin):
 
     @classmethod
     def get_by_company_id(cls, company_id):
-        return DBSession().query(cls).\
-            filter(cls.company_id==company_id).all()
+        return cls._get_by_column('company_id', company_id).all()
 
     @classmethod
     def delete(cls, id):
@@ -239,6 +238,13 @@ class VehicleType(Base, BaseMixin):
     passenger_count = Column(TINYINT, nullable=False, doc=u'建议乘客人数')
     note = Column(String(100), nullable=True, doc=u'备注')
 
+    @declared_attr
+    def __table_args__(self):
+        table_args = (
+            Index('ix_vehicle_type', 'vehicle_type'),
+        )
+        return table_args + BaseMixin.__table_args__
+
     @validates('vehicle_type')
     def _validate_vehicle_type(self, key, vehicle_type):
         if vehicle_type not in self.VEHICLE_TYPE.values():
@@ -280,15 +286,14 @@ class VehicleType(Base, BaseMixin):
         session.flush()
 
     @classmethod
-    def search(cls, vehicle_type=None, number=20, page=1):
+    def search(cls, vehicle_type=None, number=20, page=1, cursor=None,
+               fields=None):
         total = None
         session = DBSession()
-        query = session.query(cls)
+        query = cls._load_only(session.query(cls), fields)
         if vehicle_type:
             query = query.filter(cls.vehicle_type==vehicle_type)
-        if page == 1:
-            total = query.count()
-        type_list = query.offset((page - 1) * number).limit(number).all()
+        type_list, total = cls._paginate(query, page, number, cursor)
         return type_list, total
 
 
@@ -321,41 +326,33 @@ class Vehicle(Base, BaseMixin):
 
     @validates('company_id')
     def _validate_company_id(self, key, company_id):
-        company = DBSession().query(VehicleCompany).filter(
-            VehicleCompany.id==company_id).first()
-        if not company:
+        if not reference_lookup.exists(VehicleCompany, company_id):
             raise_error_json(InvalidateError(args=('company_id', company_id)))
         return company_id
 
     @validates('vehicle_type_id')
     def _validate_vehicle_type_id(self, key, vehicle_type_id):
-        company = DBSession().query(VehicleType).filter(
-            VehicleType.id==vehicle_type_id).first()
-        if not company:
+        if not reference_lookup.exists(VehicleType, vehicle_type_id):
             raise_error_json(InvalidateError(args=('vehicle_type_id', vehicle_type_id)))
         return vehicle_type_id
 
     @validates('country_id')
     def _validate_country_id(self, key, country_id):
-        country = DBSession().query(Country).filter(
-            Country.id==country_id).first()
-        if not country:
+        if not reference_lookup.exists(Country, country_id):
             raise_error_json(InvalidateError(args=('country_id', country_id,)))
         return country_id
 
     @classmethod
     def _validate_country_and_city(cls, country_id, city_id):
-        city = DBSession().query(City).filter(City.id==city_id).first()
+        city = reference_lookup.get(City, city_id)
         if not city:
             raise_error_json(ClientError(errcode=CreoleErrCode.CITY_NOT_EXIST))
-        elif city.country_id != country_id:
+        elif city['country_id'] != country_id:
             raise_error_json(InvalidateError(errcode=CreoleErrCode.COUNTRY_NOT_EXIST))
 
     @classmethod
     def get_by_company_id(cls, company_id):
-        session = DBSession()
-        vehicle_list = session.query(cls).filter(
-            cls.company_id==company_id).all()
+        vehicle_list = cls._get_by_column('company_id', company_id).all()
         return vehicle_list
 
     @classmethod
@@ -390,6 +387,7 @@ class Vehicle(Base, BaseMixin):
             setattr(vehicle, k, v)
         session = DBSession()
         session.merge(vehicle)
+        entity_cache.invalidate(cls.__tablename__, id)
         try:
             session.flush()
         except IntegrityError:
@@ -405,12 +403,24 @@ class Vehicle(Base, BaseMixin):
             raise_error_json(
                 ClientError(errcode=CreoleErrCode.SHOP_NOT_EXIST))
         session.delete(vehicle)
+        entity_cache.invalidate(cls.__tablename__, id)
+        session.flush()
+
+    @classmethod
+    def delete_by_company_id(cls, company_id):
+        session = DBSession()
+        vehicle_list = cls.get_by_company_id(company_id)
+        for vehicle in vehicle_list:
+            session.delete(vehicle)
+        entity_cache.invalidate(
+            cls.__tablename__, *[vehicle.id for vehicle in vehicle_list])
         session.flush()
 
     @classmethod
     def search(cls, country_id=None, city_id=None, company_id=None,
-               vehicle_type_id=None, license=None, page=1, number=20):
-        query = DBSession().query(cls)
+               vehicle_type_id=None, license=None, page=1, number=20,
+               cursor=None, fields=None):
+        query = cls._load_only(DBSession().query(cls), fields)
         total = None
         if license:
             vehicle_list = query.filter(cls.license==license).all()
@@ -423,9 +433,7 @@ class Vehicle(Base, BaseMixin):
                 query = query.filter(cls.company_id==company_id)
             if vehicle_type_id:
                 query = query.filter(cls.vehicle_type_id==vehicle_type_id)
-            if page == 1:
-                total = query.count()
-            vehicle_list = query.offset((page - 1) * number).limit(number).all()
+            vehicle_list, total = cls._paginate(query, page, number, cursor)
         return vehicle_list, total
 
 
@@ -440,10 +448,23 @@ class VehicleFee(Base, BaseMixin):
     confirm_person = Column(String(30), nullable=True, doc=u'确认人')
     attachment_hash = Column(String(128), nullable=False, doc=u'合同附件')
 
+    @declared_attr
+    def __table_args__(self):
+        # 时间范围条件放在复合索引的最后一列
+        table_args = (
+            Index('idx_company_id_start_time', 'company_id', 'start_time'),
+            Index('idx_vehicle_type_id_start_time',
+                  'vehicle_type_id', 'start_time'),
+            Index('ix_start_time', 'start_time'),
+            Index('ix_end_time', 'end_time'),
+            Index('ix_unit_price', 'unit_price'),
+            Index('ix_confirm_person', 'confirm_person'),
+        )
+        return table_args + BaseMixin.__table_args__
+
     @classmethod
     def get_by_company_id(cls, company_id):
-        session = DBSession()
-        return session.query(cls).filter(cls.company_id==company_id).all()
+        return cls._get_by_column('company_id', company_id).all()
 
     @classmethod
     def delete(cls, id):
@@ -484,10 +505,10 @@ class VehicleFee(Base, BaseMixin):
     @classmethod
     def search(cls, vehicle_type_id=None, company_id=None, unit_price=None,
                start_time=None, end_time=None, confirm_person=None,
-               number=20, page=1):
+               number=20, page=1, cursor=None, fields=None):
         session = DBSession()
         total = None
-        query = session.query(cls)
+        query = cls._load_only(session.query(cls), fields)
         if vehicle_type_id:
             query = query.filter(cls.vehicle_type_id==vehicle_type_id)
         if company_id:
@@ -500,9 +521,7 @@ class VehicleFee(Base, BaseMixin):
             query = query.filter(cls.end_time<=end_time)
         if confirm_person:
             query = query.filter(cls.confirm_person==confirm_person)
-        if page == 1:
-            total = query.count()
-        fee_list = query.offset((page - 1) * number).limit(number).all()
+        fee_list, total = cls._paginate(query, page, number, cursor)
         return fee_list, total
 
 
@@ -0,0 +1,139 @@
+# coding: utf-8
+"""按请求统计SQL执行情况
+
+每个请求开始时调用`start(rid)`, 之后当前greenlet上执行的SQL都会记录到
+对应的SQLProfile中: 语句数, 总耗时, 以及相同形状语句的重复次数(N+1).
+"""
+import re
+import time
+import logging
+import contextlib
+from collections import Counter
+
+from gevent.local import local
+from sqlalchemy import event
+
+from .config import setting
+
+logger = logging.getLogger(__name__)
+
+_local = local()
+_profile_map = {}
+
+# IN (%s, %s, ...)的参数个数不影响语句形状
+_IN_PARAMS_RE = re.compile(
+    r'\(\s*(?:%s|\?|%\(\w+\)s)(?:\s*,\s*(?:%s|\?|%\(\w+\)s))*\s*\)')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def _statement_shape(statement):
+    shape = _IN_PARAMS_RE.sub('(?)', statement)
+    return _WHITESPACE_RE.sub(' ', shape).strip()
+
+
+class SQLProfile(object):
+    def __init__(self, rid):
+        self.rid = rid
+        self.statement_count = 0
+        self.total_time = 0.0
+        self.shape_counter = Counter()
+
+    def record(self, statement, elapsed):
+        self.statement_count += 1
+        self.total_time += elapsed
+        self.shape_counter[_statement_shape(statement)] += 1
+
+    def repeated_shapes(self, threshold=None):
+        threshold = threshold or setting.CREOLE_SQL_REPEAT_THRESHOLD
+        return [(shape, count)
+                for shape, count in self.shape_counter.most_common()
+                if count >= threshold]
+
+    @property
+    def total_time_ms(self):
+        return self.total_time * 1000
+
+    def server_timing(self):
+        return 'db;dur={:.3f};desc="{} queries, {} repeated"'.format(
+            self.total_time_ms, self.statement_count,
+            len(self.repeated_shapes()))
+
+    def log(self, endpoint=None):
+        logger.info(
+            u'sql profile: endpoint: %s statements: %d db_time: %.3fms',
+            endpoint, self.statement_count, self.total_time_ms)
+        if self.statement_count > setting.CREOLE_SQL_STATEMENT_BUDGET:
+            logger.warning(
+                u'sql budget exceeded: endpoint: %s statements: %d budget: %d',
+                endpoint, self.statement_count,
+                setting.CREOLE_SQL_STATEMENT_BUDGET)
+        for shape, count in self.repeated_shapes():
+            logger.warning(
+                u'possible N+1: endpoint: %s repeated %d times: %s',
+                endpoint, count, shape[:300])
+
+
+def start(rid):
+    profile = _profile_map[rid] = SQLProfile(rid)
+    _local.rid = rid
+    return profile
+
+
+def get(rid):
+    return _profile_map.get(rid)
+
+
+def finish(rid):
+    if getattr(_local, 'rid', None) == rid:
+        _local.rid = None
+    return _profile_map.pop(rid, None)
+
+
+def current_rid():
+    return getattr(_local, 'rid', None)
+
+
+@contextlib.contextmanager
+def bind(rid):
+    """在其他greenlet中把SQL记到请求`rid`下"""
+    old_rid = getattr(_local, 'rid', None)
+    _local.rid = rid
+    try:
+        yield _profile_map.get(rid)
+    finally:
+        _local.rid = old_rid
+
+
+def _current_profile():
+    rid = getattr(_local, 'rid', None)
+    if rid is None:
+        return None
+    return _profile_map.get(rid)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters,
+                           context, executemany):
+    conn.info.setdefault('query_start_time', []).append(time.time())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters,
+                          context, executemany):
+    start_time = conn.info['query_start_time'].pop()
+    profile = _current_profile()
+    if profile is not None:
+        profile.record(statement, time.time() - start_time)
+
+
+def _handle_error(context):
+    if context.connection is None:
+        return
+    start_times = context.connection.info.get('query_start_time')
+    if start_times:
+        start_times.pop()
+
+
+def instrument_engine(engine):
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(engine, 'handle_error', _handle_error)
+    return engine
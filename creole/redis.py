@@ -0,0 +1,171 @@
+# coding: utf-8
+"""实体详情的读穿透缓存
+
+`*Service.get_by_id`返回的字典按(表名, id)序列化后缓存在redis中, 带TTL.
+模型的update/delete/delete_by_*调用`entity_cache.invalidate`:
+立即删除一次, 并在当前Session提交后再删除一次, 避免提交前有并发读把
+旧数据重新写回缓存.
+
+未命中时从主库加载再写入缓存, 不能把从库延迟的旧数据写回缓存.
+
+缓存不可用时只记日志, 读写都直接落到数据库.
+"""
+from __future__ import absolute_import
+
+import json
+import time
+import logging
+
+import redis
+from sqlalchemy import event
+
+from .config import setting
+from .db import read_from_primary
+from .model import DBSession
+
+logger = logging.getLogger(__name__)
+
+_PENDING_KEY = 'entity_cache_pending'
+
+
+class FakeRedis(object):
+    """进程内的redis替身, 只实现缓存用到的命令"""
+    def __init__(self):
+        # key -> (expire_at, value)
+        self._data = {}
+
+    def _get(self, key):
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expire_at, value = item
+        if expire_at is not None and expire_at <= time.time():
+            self._data.pop(key, None)
+            return None
+        return value
+
+    def get(self, key):
+        return self._get(key)
+
+    def mget(self, keys):
+        return [self._get(key) for key in keys]
+
+    def set(self, key, value, ex=None):
+        expire_at = time.time() + ex if ex else None
+        self._data[key] = (expire_at, value)
+        return True
+
+    def delete(self, *keys):
+        return sum(1 for key in keys if self._data.pop(key, None) is not None)
+
+    def flushdb(self):
+        self._data.clear()
+        return True
+
+
+def create_backend(backend, url):
+    if backend == 'fake':
+        return FakeRedis()
+    # 缓存只是优化, 超时要短, 不能拖慢请求
+    return redis.StrictRedis.from_url(
+        url, socket_timeout=0.2, socket_connect_timeout=0.2)
+
+
+class EntityCache(object):
+    KEY_PREFIX = 'creole:entity:v1'
+
+    def __init__(self, backend, ttl):
+        self.backend = backend
+        self.ttl = ttl
+
+    def _key(self, table_name, id):
+        return '{}:{}:{}'.format(self.KEY_PREFIX, table_name, id)
+
+    def _set(self, key, data):
+        try:
+            self.backend.set(key, json.dumps(data), ex=self.ttl)
+        except redis.RedisError as e:
+            logger.warning(u'entity cache set failed: %s %r', key, e)
+
+    def get_or_load(self, table_name, id, loader):
+        """缓存命中时直接返回, 否则调用loader(id)并写入缓存
+
+        loader返回空字典(记录不存在)时不缓存.
+        """
+        key = self._key(table_name, id)
+        try:
+            value = self.backend.get(key)
+        except redis.RedisError as e:
+            logger.warning(u'entity cache get failed: %s %r', key, e)
+            value = None
+        if value is not None:
+            return json.loads(value)
+        with read_from_primary(DBSession()):
+            data = loader(id)
+        if data:
+            self._set(key, data)
+        return data
+
+    def get_many_or_load(self, table_name, ids, loader):
+        """批量版本, loader(ids)返回{id: data}, 结果同样是{id: data}"""
+        ids = list(set(ids))
+        if not ids:
+            return {}
+        keys = [self._key(table_name, id) for id in ids]
+        try:
+            values = self.backend.mget(keys)
+        except redis.RedisError as e:
+            logger.warning(u'entity cache mget failed: %s %r', table_name, e)
+            values = [None] * len(ids)
+        data_map = {}
+        missing_ids = []
+        for id, value in zip(ids, values):
+            if value is None:
+                missing_ids.append(id)
+            else:
+                data_map[id] = json.loads(value)
+        if missing_ids:
+            with read_from_primary(DBSession()):
+                loaded_map = loader(missing_ids)
+            for id, data in loaded_map.iteritems():
+                if data:
+                    self._set(self._key(table_name, id), data)
+            data_map.update(loaded_map)
+        return data_map
+
+    def _delete(self, keys):
+        try:
+            self.backend.delete(*keys)
+        except redis.RedisError as e:
+            logger.warning(u'entity cache delete failed: %s %r', keys, e)
+
+    def invalidate(self, table_name, *ids):
+        """删除缓存, 并登记到当前Session上在提交后再删一次"""
+        keys = [self._key(table_name, id) for id in ids]
+        if not keys:
+            return
+        self._delete(keys)
+        DBSession().info.setdefault(_PENDING_KEY, set()).update(keys)
+
+    def bind_session(self, scoped_session):
+        event.listen(scoped_session, 'after_commit', self._after_commit)
+        event.listen(scoped_session, 'after_soft_rollback',
+                     self._after_rollback)
+
+    def _after_commit(self, session):
+        keys = session.info.pop(_PENDING_KEY, None)
+        if keys:
+            self._delete(list(keys))
+
+    def _after_rollback(self, session, previous_transaction):
+        # 回滚后数据库没有变化, 立即删除的那次已经足够
+        session.info.pop(_PENDING_KEY, None)
+
+    def clear(self):
+        self.backend.flushdb()
+
+
+entity_cache = EntityCache(
+    create_backend(setting.CREOLE_CACHE_BACKEND, setting.CREOLE_REDIS_URL),
+    ttl=setting.CREOLE_ENTITY_CACHE_TTL)
+entity_cache.bind_session(DBSession)
@@ -4,6 +4,7 @@ from sqlalchemy.exc import SQLAlchemyError
 from ..model import DBSession
 from ..model.attraction import Attraction, AttractionFee
 from .base import BaseService
+from ..redis import entity_cache
 from ..exc import (
     raise_error_json,
     DatabaseError,
@@ -12,18 +13,36 @@ from ..exc import (
 
 class AttractionService(BaseService):
     @classmethod
-    def get_by_id(cls, id):
+    def get_by_id(cls, id, fields=None):
+        attraction = entity_cache.get_or_load(
+            Attraction.__tablename__, id, cls._load_by_id)
+        return cls._project_fields(attraction, fields)
+
+    @classmethod
+    def _load_by_id(cls, id):
         attraction = Attraction.get_by_id(id)
         return cls._get_db_obj_data_dict(attraction)
 
+    @classmethod
+    def get_by_ids(cls, ids, fields=None):
+        attraction_map = entity_cache.get_many_or_load(
+            Attraction.__tablename__, ids, cls._load_by_ids)
+        return cls._project_fields_map(attraction_map, fields)
+
+    @classmethod
+    def _load_by_ids(cls, ids):
+        return cls._get_data_dict_map(Attraction.get_by_ids(ids))
+
     @classmethod
     def create_attraction(cls, country_id, city_id, address, name, name_en,
-                          nickname_en, intro_cn, intro_en, note=None):
+                          nickname_en, intro_cn, intro_en, note=None,
+                          latitude=None, longitude=None):
         Attraction.create(
             country_id=country_id, city_id=city_id,
             address=address, name=name, name_en=name_en,
             nickname_en=nickname_en, note=note,
-            intro_cn=intro_cn, intro_en=intro_en)
+            intro_cn=intro_cn, intro_en=intro_en,
+            latitude=latitude, longitude=longitude)
         session = DBSession()
         try:
             session.commit()
@@ -54,13 +73,15 @@ class AttractionService(BaseService):
 
     @classmethod
     def search_attraction(cls, country_id=None, city_id=None,
-                          name=None, page=1, number=20):
+                          name=None, page=1, number=20, cursor=None, q=None,
+                          fields=None):
         raw_data = []
         attraction_list, total = Attraction.search(
             country_id=country_id, city_id=city_id,
-            name=None, page=page, number=number)
+            name=None, page=page, number=number, cursor=cursor, q=q,
+            fields=fields)
         for attraction in attraction_list:
-            raw_data.append(cls._get_db_obj_data_dict(attraction))
+            raw_data.append(cls._get_db_obj_data_dict(attraction, fields))
         return raw_data, total
 
 
@@ -2,18 +2,50 @@
 import datetime
 
 from ..util import datetime_to_timestamp
+from ..exc import raise_error_json, InvalidateError
 
 
 class BaseService(object):
     @classmethod
-    def _get_db_obj_data_dict(cls, obj):
-        _dict = {}
+    def _get_db_obj_data_dict(cls, obj, fields=None):
+        """fields为空时返回所有列, 否则只返回(也只会读取)fields中的列"""
         if obj is None:
-            return _dict
-        for k in obj.__table__.columns._data:
-            value = getattr(obj, k, None)
+            return {}
+        columns = fields or obj.__table__.columns._data
+        return cls._format_data_dict(
+            {k: getattr(obj, k, None) for k in columns})
+
+    @classmethod
+    def _project_fields(cls, data, fields):
+        """从完整的数据(如实体缓存中的)中只保留fields中的字段"""
+        if not fields or not data:
+            return data
+        for field in fields:
+            if field not in data:
+                raise_error_json(InvalidateError(args=('fields', field,)))
+        return {k: data[k] for k in fields}
+
+    @classmethod
+    def _project_fields_map(cls, data_map, fields):
+        return {
+            id: cls._project_fields(data, fields)
+            for id, data in data_map.iteritems()
+        }
+
+    @classmethod
+    def _format_data_dict(cls, data):
+        """把{列名: 值}中的datetime转换成时间戳"""
+        _dict = {}
+        for k, value in data.iteritems():
             if isinstance(value, datetime.datetime):
                 value = datetime_to_timestamp(value)
             _dict[k] = value
         return _dict
 
+    @classmethod
+    def _get_data_dict_map(cls, obj_map):
+        return {
+            id: cls._get_db_obj_data_dict(obj)
+            for id, obj in obj_map.iteritems()
+        }
+
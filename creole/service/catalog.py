@@ -0,0 +1,95 @@
+# coding: utf-8
+import logging
+
+import gevent
+from gevent.pool import Pool
+
+from .base import BaseService
+from .hotel import HotelService
+from .restaurant import RestaurantService
+from .attraction import AttractionService
+from .shop import ShopService
+from .tour_guide import TourGuideService
+from .. import profiler
+from ..db import db_manager
+from ..config import setting
+from ..model.country import country_city_store
+from ..exc import raise_error_json, ClientError, CreoleErrCode
+
+logger = logging.getLogger(__name__)
+
+
+def _run_branch(rid, name, timeout, search_func, kwargs):
+    """在独立的greenlet中执行一个分支, 使用自己的Session, 结束时归还连接
+
+    超时或出错时返回None, 不把异常抛给hub(否则会打印traceback).
+    超时可能发生在query_cache查库期间, query_cache会释放这个key,
+    其他分支或请求中等待同一个key的greenlet自己重新查库, 不会一直阻塞.
+    """
+    timed_out = False
+    with profiler.bind(rid):
+        try:
+            with gevent.Timeout(timeout):
+                return search_func(**kwargs)
+        except gevent.Timeout:
+            timed_out = True
+            logger.warning('catalog search: %s timed out', name)
+        except Exception:
+            logger.exception('catalog search: %s failed', name)
+        finally:
+            db_manager.remove_sessions(invalidate=timed_out)
+
+
+class CatalogService(BaseService):
+    # (资源名, 搜索函数, 是否支持按城市过滤)
+    BRANCHES = (
+        ('hotel', HotelService.search_hotel, True),
+        ('restaurant', RestaurantService.search_restaurant, True),
+        ('attraction', AttractionService.search_attraction, True),
+        ('shop', ShopService.search_shop, True),
+        ('tour_guide', TourGuideService.search_tour_guide, False),
+    )
+
+    @classmethod
+    def _get_branch_kwargs(cls, by_city, country_id, city_id, q, number):
+        kwargs = {'q': q, 'number': number}
+        if by_city:
+            kwargs.update(country_id=country_id, city_id=city_id)
+        else:
+            kwargs['country_id'] = country_id
+        return kwargs
+
+    @classmethod
+    def search(cls, country_id=None, city_id=None, q=None, number=10):
+        """并发搜索某个国家/城市下的各类资源
+
+        每类资源的search在有界的gevent池中各跑一个分支, 总耗时取决于最慢的
+        分支; 超时或出错的分支返回空列表, 并记录在`incomplete`中.
+        """
+        if city_id:
+            city = country_city_store.get_city(city_id)
+            if not city:
+                raise_error_json(
+                    ClientError(errcode=CreoleErrCode.CITY_NOT_EXIST))
+            # 导游没有城市信息, 按城市所在的国家过滤
+            country_id = city['country_id']
+
+        rid = profiler.current_rid()
+        timeout = setting.CREOLE_CATALOG_SEARCH_TIMEOUT_MS / 1000.0
+        pool = Pool(setting.CREOLE_CATALOG_SEARCH_CONCURRENCY)
+        greenlet_map = {}
+        for name, search_func, by_city in cls.BRANCHES:
+            kwargs = cls._get_branch_kwargs(
+                by_city, country_id, city_id, q, number)
+            greenlet_map[name] = pool.spawn(
+                _run_branch, rid, name, timeout, search_func, kwargs)
+        pool.join()
+
+        data = {'total': {}, 'incomplete': []}
+        for name, _, _ in cls.BRANCHES:
+            result = greenlet_map[name].value
+            if result is None:
+                result = [], None
+                data['incomplete'].append(name)
+            data['{}_data'.format(name)], data['total'][name] = result
+        return data
@@ -2,7 +2,7 @@
 from sqlalchemy.exc import SQLAlchemyError
 
 from ..model import DBSession
-from ..model.country import Country, City
+from ..model.country import Country, City, country_city_store
 from ..model import gen_commit_deco
 from ..exc import (
     raise_error_json,
@@ -14,13 +14,17 @@ from .base import BaseService
 class CountryService(BaseService):
     @classmethod
     def get_by_id(cls, id):
-        country = Country.get(id)
+        country = country_city_store.get_country(id)
         if not country:
             return {}
-        country_data = cls._get_db_obj_data_dict(country)
-        city_list = City.get_by_country_id(country.id)
+        return cls._get_country_data_dict(country)
+
+    @classmethod
+    def _get_country_data_dict(cls, country):
+        country_data = cls._format_data_dict(country)
+        city_list = country_city_store.get_cities_by_country_id(country['id'])
         country_data['city_data'] = \
-            [cls._get_db_obj_data_dict(city) for city in city_list]
+            [cls._format_data_dict(city) for city in city_list]
         return country_data
 
     @classmethod
@@ -63,15 +67,8 @@ class CountryService(BaseService):
                 },
             ]
         """
-        resp_data = []
-        country_list = Country.get_all()
-        for country in country_list:
-            country_dict = cls._get_db_obj_data_dict(country)
-            city_list = City.get_by_country_id(country.id)
-            country_dict['city_data'] = \
-                [cls._get_db_obj_data_dict(city) for city in city_list]
-            resp_data.append(country_dict)
-        return resp_data
+        return [cls._get_country_data_dict(country)
+                for country in country_city_store.get_all_countries()]
 
     @classmethod
     def update_by_id(cls, id, **kwargs):
@@ -104,12 +101,12 @@ class CountryService(BaseService):
 class CityService(BaseService):
     @classmethod
     def get_by_id(cls, id):
-        city = City.get(id)
+        city = country_city_store.get_city(id)
         if not city:
             return {}
-        city_data = cls._get_db_obj_data_dict(city)
-        country = Country.get(city.country_id)
-        city_data['country'] = cls._get_db_obj_data_dict(country)
+        city_data = cls._format_data_dict(city)
+        country = country_city_store.get_country(city['country_id'])
+        city_data['country'] = cls._format_data_dict(country or {})
         return city_data
 
     @classmethod
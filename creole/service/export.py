@@ -0,0 +1,67 @@
+# coding: utf-8
+from sqlalchemy import select
+
+from .base import BaseService
+from ..model import DBSession
+from ..model.hotel import Hotel, HotelCompany
+from ..model.restaurant import Restaurant
+from ..model.attraction import Attraction
+from ..model.shop import Shop, ShopCompany
+from ..model.tour_guide import TourGuide
+from ..model.vehicle import Vehicle, VehicleCompany, VehicleType, VehicleFee
+from ..util import timestamp_to_date
+from ..exc import raise_error_json, ParameterError
+
+# 每次从服务端游标取回的行数
+EXPORT_FETCH_SIZE = 1000
+
+
+class ExportService(BaseService):
+    ENTITY_MODEL_MAP = {
+        'hotel': Hotel,
+        'hotel_company': HotelCompany,
+        'restaurant': Restaurant,
+        'attraction': Attraction,
+        'shop': Shop,
+        'shop_company': ShopCompany,
+        'tour_guide': TourGuide,
+        'vehicle': Vehicle,
+        'vehicle_company': VehicleCompany,
+        'vehicle_type': VehicleType,
+        'vehicle_fee': VehicleFee,
+    }
+
+    @classmethod
+    def get_export_statement(cls, entity, updated_since=None, fields=None):
+        """校验参数并返回导出用的SELECT, 在开始输出响应之前调用"""
+        model = cls.ENTITY_MODEL_MAP.get(entity)
+        if model is None:
+            raise_error_json(ParameterError(args=(entity,)))
+        table = model.__table__
+        if fields:
+            model.validate_fields(fields)
+            columns = [table.c[field] for field in fields]
+        else:
+            columns = list(table.columns)
+        statement = select(columns)
+        if updated_since:
+            statement = statement.where(
+                table.c.updated_at >= timestamp_to_date(updated_since))
+        # 服务端游标: 边读边输出, 内存占用和表的大小无关
+        return statement.execution_options(stream_results=True)
+
+    @classmethod
+    def iter_rows(cls, statement, fetch_size=EXPORT_FETCH_SIZE):
+        """逐行返回导出数据, 只读的SELECT会路由到从库"""
+        session = DBSession()
+        result = session.execute(statement)
+        try:
+            while True:
+                rows = result.fetchmany(fetch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield cls._format_data_dict(dict(row))
+        finally:
+            result.close()
+            DBSession.remove()
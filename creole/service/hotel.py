@@ -1,4 +1,7 @@
 # coding: utf-8
+import datetime
+from collections import OrderedDict
+
 from sqlalchemy.exc import SQLAlchemyError
 
 from ..model import DBSession
@@ -13,13 +16,25 @@ from ..model.hotel import (
     MealPrice,
     RoomAdditionalCharge,
     FestivalAdditionalCharge,
+    HOTEL_FEE_PRICE_TABLES,
+    get_hotel_fee_aggregate,
+)
+from ..model.city_min_price import CityMinRoomPrice
+from ..model.rate_calendar import (
+    rate_calendar_cache,
+    iter_days,
+    check_price_overlap,
 )
 from .base import BaseService
+from ..redis import entity_cache
 from ..exc import (
     raise_error_json,
     DatabaseError,
+    ClientError,
+    InvalidateError,
+    CreoleErrCode,
 )
-from ..util import timestamp_to_date, _func
+from ..util import timestamp_to_date, datetime_to_timestamp, _func
 
 
 class HotelCompanyContactService(BaseService):
@@ -71,9 +86,9 @@ class HotelCompanyContactService(BaseService):
 
 class HotelCompanyService(BaseService):
     @classmethod
-    def get_by_id(cls, company_id):
+    def get_by_id(cls, company_id, fields=None):
         company = HotelCompany.get_by_id(company_id)
-        return cls._get_db_obj_data_dict(company)
+        return cls._project_fields(cls._get_db_obj_data_dict(company), fields)
 
     @classmethod
     def create_hotel_company(cls, country_id, city_id, name, name_en,
@@ -147,21 +162,38 @@ class HotelCompanyService(BaseService):
 
     @classmethod
     def search_hotel_company(cls, country_id=None, city_id=None,
-                             page=1, number=20):
+                             page=1, number=20, cursor=None, fields=None):
         company_list, total = \
             HotelCompany.search(
                 country_id=country_id, city_id=city_id,
-                page=page, number=number
+                page=page, number=number, cursor=cursor, fields=fields
             )
-        return [cls._get_db_obj_data_dict(item) for item in company_list], total
+        return [cls._get_db_obj_data_dict(item, fields)
+                for item in company_list], total
 
 
 class HotelService(BaseService):
     @classmethod
-    def get_by_id(cls, id):
-        hotel = Hotel.get_by_id(id)
+    def get_by_id(cls, id, fields=None):
+        hotel = entity_cache.get_or_load(
+            Hotel.__tablename__, id, cls._load_by_id)
+        return cls._project_fields(hotel, fields)
+
+    @classmethod
+    def _load_by_id(cls, id):
+        hotel = Hotel.get_detail_by_id(id)
         return cls._get_db_obj_data_dict(hotel)
 
+    @classmethod
+    def get_by_ids(cls, ids, fields=None):
+        hotel_map = entity_cache.get_many_or_load(
+            Hotel.__tablename__, ids, cls._load_by_ids)
+        return cls._project_fields_map(hotel_map, fields)
+
+    @classmethod
+    def _load_by_ids(cls, ids):
+        return cls._get_data_dict_map(Hotel.get_details_by_ids(ids))
+
     @classmethod
     def get_by_company_id(cls, company_id):
         hotel = Hotel.get_by_company_id(company_id)
@@ -172,7 +204,8 @@ class HotelService(BaseService):
                      name_en, nickname_en, star_level, comment_level,
                      standard_room_number, standard_double_room_number,
                      triple_room_number, suite_room_number, tour_guide_room_number,
-                     start_year, telephone, email, intro_cn=None, intro_en=None):
+                     start_year, telephone, email, intro_cn=None, intro_en=None,
+                     latitude=None, longitude=None):
         Hotel.create(
             country_id=country_id, city_id=city_id, company_id=company_id,
             address=address, name=name, name_en=name_en, nickname_en=nickname_en,
@@ -183,7 +216,8 @@ class HotelService(BaseService):
             suite_room_number=suite_room_number,
             tour_guide_room_number=tour_guide_room_number,
             start_year=start_year, telephone=telephone, email=email,
-            intro_cn=intro_cn, intro_en=intro_en
+            intro_cn=intro_cn, intro_en=intro_en,
+            latitude=latitude, longitude=longitude
         )
         session = DBSession()
         try:
@@ -238,16 +272,17 @@ class HotelService(BaseService):
     @classmethod
     def search_hotel(cls, country_id=None, city_id=None, company_id=None,
                      name=None, name_en=None, nickname_en=None,
-                     star_level=None, page=1, number=20):
+                     star_level=None, page=1, number=20, cursor=None, q=None,
+                     fields=None):
         raw_data = []
         hotel_list, total = Hotel.search(
             country_id=country_id, city_id=city_id,
             company_id=company_id, name=name, name_en=name_en,
             nickname_en=nickname_en, star_level=star_level,
-            page=page, number=number
+            page=page, number=number, cursor=cursor, q=q, fields=fields
         )
         for hotel in hotel_list:
-            raw_data.append(cls._get_db_obj_data_dict(hotel))
+            raw_data.append(cls._get_db_obj_data_dict(hotel, fields))
         return raw_data, total 
 
 
@@ -358,6 +393,16 @@ class HotelFeeService(BaseService):
         fee = HotelFee.get_by_hotel_id(hotel_id)
         return cls._get_db_obj_data_dict(fee)
 
+    @classmethod
+    def get_detail(cls, id=None, hotel_id=None):
+        """费用及其房价, 餐饮价格, 附加费, 不存在时返回{}"""
+        fee = get_hotel_fee_aggregate(id=id, hotel_id=hotel_id)
+        if fee is None:
+            return {}
+        for key in HOTEL_FEE_PRICE_TABLES:
+            fee[key] = [cls._format_data_dict(item) for item in fee[key]]
+        return cls._format_data_dict(fee)
+
     @classmethod
     def create_hotel_fee(cls, hotel_id, confirm_person, free_policy=None,
                          free=None, note=None, attachment_hash=None):
@@ -410,18 +455,68 @@ class RoomPriceService(BaseService):
     def edit_room_service(cls, create_list=None, update_list=None,
                           delete_id_list=None):
         session = DBSession()
+        # 写请求, 修改前的区间要从主库读
+        session.stick_to_primary = True
+        check_price_overlap(
+            RoomPrice, create_list, update_list, delete_id_list)
+        # 先锁住受影响的城市和星级, 同一组的编辑串行执行
+        refresh_span = cls._lock_refresh_span(
+            create_list, update_list, delete_id_list)
         if create_list:
             cls.create_room_price(filter(_func, create_list))
         if update_list:
             cls.update_room_price(filter(_func, update_list))
         if delete_id_list:
             cls.delete_room_price(delete_id_list)
+        if refresh_span:
+            session.flush()
+            groups, start_date, end_date = refresh_span
+            CityMinRoomPrice.refresh(groups, start_date, end_date)
         try:
             session.commit()
         except SQLAlchemyError as e:
             session.rollback()
             raise_error_json(DatabaseError(msg=repr(e)))
 
+    @classmethod
+    def _lock_refresh_span(cls, create_list=None, update_list=None,
+                           delete_id_list=None):
+        """锁住城市最低价表需要刷新的城市和星级, 返回(groups, 开始日期, 结束日期)
+
+        包括修改前和修改后的区间, 没有变化时返回None. 修改前的区间在锁住
+        城市和星级之后再加锁读取, 同一组并发的编辑已经提交, 不会漏掉日期.
+        """
+        fee_ids = set()
+        times = []
+        for price_dict in filter(_func, (create_list or []) +
+                                 (update_list or [])):
+            fee_ids.add(int(price_dict['hotel_fee_id']))
+            times.append(timestamp_to_date(int(price_dict['start_time'])))
+            times.append(timestamp_to_date(int(price_dict['end_time'])))
+        old_ids = [int(price_dict['id'])
+                   for price_dict in filter(_func, update_list or [])]
+        old_ids.extend(int(id) for id in delete_id_list or [])
+        fee_ids.update(
+            price.hotel_fee_id
+            for price in RoomPrice.get_by_ids(old_ids).itervalues())
+        if not fee_ids:
+            return None
+        groups = CityMinRoomPrice.lock_groups(fee_ids)
+        if old_ids:
+            price_list = DBSession().query(RoomPrice).filter(
+                RoomPrice.id.in_(old_ids)
+            ).with_for_update().populate_existing().all()
+            # 加锁之前价格被改到了其他费用, 把它的城市和星级也锁上
+            extra_fee_ids = set(
+                price.hotel_fee_id for price in price_list) - fee_ids
+            if extra_fee_ids:
+                groups |= CityMinRoomPrice.lock_groups(extra_fee_ids)
+            for price in price_list:
+                times.extend([price.start_time, price.end_time])
+        if not times:
+            return None
+        return groups, min(times), max(times)
+
     @classmethod
     def create_room_price(cls, price_list):
         for price_dict in price_list:
@@ -456,6 +551,8 @@ class MealPriceService(BaseService):
     def edit_meal_service(cls, create_list=None, update_list=None,
                           delete_id_list=None):
         session = DBSession()
+        check_price_overlap(
+            MealPrice, create_list, update_list, delete_id_list)
         if create_list:
             cls.create_meal_price(filter(_func, create_list))
         if update_list:
@@ -503,6 +600,8 @@ class RoomAdditionalChargeService(BaseService):
             cls, create_list=None, update_list=None,
             delete_id_list=None):
         session = DBSession()
+        check_price_overlap(
+            RoomAdditionalCharge, create_list, update_list, delete_id_list)
         if create_list:
             cls.create_additional_charge_price(filter(_func, create_list))
         if update_list:
@@ -550,6 +649,8 @@ class FestivalAdditionalChargeService(BaseService):
             cls, create_list=None, update_list=None,
             delete_id_list=None):
         session = DBSession()
+        check_price_overlap(
+            FestivalAdditionalCharge, create_list, update_list, delete_id_list)
         if create_list:
             cls.create_additional_charge_price(filter(_func, create_list))
         if update_list:
@@ -584,3 +685,253 @@ class FestivalAdditionalChargeService(BaseService):
     def delete_additional_charge_price(cls, delete_id_list):
         for id in delete_id_list:
             FestivalAdditionalCharge.delete(id)
+
+
+class HotelRateService(BaseService):
+    # 一次最多查询多少晚
+    MAX_NIGHTS = 366
+    # 房型 -> 房间级别附加费使用的房间级别, 未列出的房型按标准间
+    ROOM_TYPE_LEVEL_MAP = {
+        RoomPrice.ROOM_TYPE.SUITE: RoomAdditionalCharge.ROOM_LEVEL.SUITE,
+    }
+
+    @classmethod
+    def get_rates(cls, hotel_id, from_time, to_time, room_type,
+                  room_level=None):
+        """按晚返回房价日历, from_time当晚入住, to_time当天离店
+
+        每晚的价格 = 基础房价 + 房间级别附加费 + 当晚所有节日附加费,
+        没有基础房价的晚上price为None, 此时总价也为None.
+        """
+        start_date, end_date = cls._get_date_range(from_time, to_time)
+        if room_type not in RoomPrice.ROOM_TYPE.values():
+            raise_error_json(InvalidateError(args=('room_type', room_type,)))
+        if room_level is None:
+            room_level = cls.get_room_level(room_type)
+        fee = HotelFee.get_by_hotel_id(hotel_id)
+        if not fee:
+            raise_error_json(
+                ClientError(errcode=CreoleErrCode.HOTEL_FEE_NOT_EXIST))
+
+        calendar = rate_calendar_cache.get(fee.id)
+        night_list = []
+        total = 0
+        for day in iter_days(start_date, end_date):
+            base_price, room_level_charge, festival_charges, price = \
+                cls._get_night_price(calendar, day, room_type, room_level)
+            if total is not None:
+                total = total + price if price is not None else None
+            night_list.append({
+                'date': datetime_to_timestamp(
+                    datetime.datetime.combine(day, datetime.time())),
+                'base_price': base_price,
+                'room_level_charge': room_level_charge,
+                'festival_charge': festival_charges,
+                'price': price,
+            })
+        return {
+            'hotel_id': hotel_id,
+            'hotel_fee_id': fee.id,
+            'room_type': room_type,
+            'room_level': room_level,
+            'nights': night_list,
+            'total': total,
+        }
+
+    @classmethod
+    def _get_date_range(cls, from_time, to_time):
+        """返回[入住日期, 离店日期)"""
+        start_date = timestamp_to_date(from_time).date()
+        end_date = timestamp_to_date(to_time).date()
+        if not 0 < (end_date - start_date).days <= cls.MAX_NIGHTS:
+            raise_error_json(InvalidateError(args=('to', to_time,)))
+        return start_date, end_date
+
+    @classmethod
+    def get_room_level(cls, room_type):
+        return cls.ROOM_TYPE_LEVEL_MAP.get(
+            room_type, RoomAdditionalCharge.ROOM_LEVEL.STANDARD)
+
+    @classmethod
+    def _get_night_price(cls, calendar, day, room_type, room_level):
+        """返回(基础房价, 房间级别附加费, {节日类型: 附加费}, 当晚房价)"""
+        base_price = calendar.room_price(day, room_type)
+        room_level_charge = calendar.room_level_charge(day, room_level)
+        festival_charges = calendar.festival_charges(day)
+        price = None
+        if base_price is not None:
+            price = (base_price + (room_level_charge or 0) +
+                     sum(festival_charges.itervalues()))
+        return base_price, room_level_charge, festival_charges, price
+
+
+class HotelQuoteService(BaseService):
+    # 房间数参数 -> 房型, 参数名与Hotel.*_room_number一致
+    ROOM_NUMBER_TYPE_MAP = OrderedDict([
+        ('standard_room_number', RoomPrice.ROOM_TYPE.SINGLE),
+        ('standard_double_room_number', RoomPrice.ROOM_TYPE.DOUBLE),
+        ('triple_room_number', RoomPrice.ROOM_TYPE.TRIPLE),
+        ('suite_room_number', RoomPrice.ROOM_TYPE.SUITE),
+        ('tour_guide_room_number', RoomPrice.ROOM_TYPE.TOUR_GUIDE),
+    ])
+    # 没有传人数时按房型入住人数估算
+    ROOM_TYPE_OCCUPANCY = {
+        RoomPrice.ROOM_TYPE.SINGLE: 1,
+        RoomPrice.ROOM_TYPE.DOUBLE: 2,
+        RoomPrice.ROOM_TYPE.TRIPLE: 3,
+        RoomPrice.ROOM_TYPE.SUITE: 2,
+        RoomPrice.ROOM_TYPE.TOUR_GUIDE: 1,
+    }
+
+    @classmethod
+    def quote(cls, hotel_id_list, from_time, to_time, room_number_map,
+              meal_type_list=None, people=None):
+        """批量报价, 返回[每个酒店的报价, ...], 不存在的酒店不在结果中
+
+        room_number_map: {房间数参数: 间数}; 餐饮按人数 * 每人每晚的价格计算.
+        每个酒店先构造"晚 x 价格列"的矩阵(每个房型, 每种餐饮一列),
+        按列求和得到每间房/每人的总价, 再乘以数量; 某列有一晚没有价格时
+        该酒店的总价为None, 缺价格的列见missing.
+        """
+        start_date, end_date = HotelRateService._get_date_range(
+            from_time, to_time)
+        meal_type_list = meal_type_list or []
+        for meal_type in meal_type_list:
+            if meal_type not in MealPrice.MEAL_TYPE.values():
+                raise_error_json(
+                    InvalidateError(args=('meal_types', meal_type,)))
+        room_list = []
+        for name, room_type in cls.ROOM_NUMBER_TYPE_MAP.iteritems():
+            number = room_number_map.get(name) or 0
+            if number < 0:
+                raise_error_json(InvalidateError(args=(name, number,)))
+            if number:
+                room_list.append((room_type, number))
+        if not room_list:
+            raise_error_json(InvalidateError(args=('room_number', 0,)))
+        if people is not None and people < 0:
+            raise_error_json(InvalidateError(args=('people', people,)))
+        if people is None:
+            people = sum(
+                cls.ROOM_TYPE_OCCUPANCY[room_type] * number
+                for room_type, number in room_list)
+
+        hotel_map = HotelService.get_by_ids(
+            hotel_id_list, fields=cls.ROOM_NUMBER_TYPE_MAP.keys())
+        fee_map = HotelFee.get_by_hotel_ids(hotel_map.keys())
+        calendar_map = rate_calendar_cache.get_many(
+            [fee.id for fee in fee_map.itervalues()])
+        days = list(iter_days(start_date, end_date))
+
+        quote_list = []
+        for hotel_id in hotel_id_list:
+            if hotel_id not in hotel_map:
+                continue
+            fee = fee_map.get(hotel_id)
+            quote = {
+                'hotel_id': hotel_id,
+                'hotel_fee_id': fee.id if fee else None,
+                # 酒店的房间数是否满足需要
+                'enough_rooms': all(
+                    hotel_map[hotel_id][name] >= (room_number_map.get(name) or 0)
+                    for name in cls.ROOM_NUMBER_TYPE_MAP),
+            }
+            if fee is None:
+                quote.update(total=None, missing=['hotel_fee'])
+            else:
+                quote.update(cls._quote_hotel(
+                    fee, calendar_map[fee.id], days, room_list,
+                    meal_type_list, people))
+            quote_list.append(quote)
+        return quote_list
+
+    @classmethod
+    def _quote_hotel(cls, fee, calendar, days, room_list, meal_type_list,
+                     people):
+        # 每晚一行: 各房型的当晚房价, 各餐饮类型的当晚每人价格
+        matrix = [
+            [HotelRateService._get_night_price(
+                calendar, day, room_type,
+                HotelRateService.get_room_level(room_type))[3]
+             for room_type, _ in room_list] +
+            [calendar.meal_price(day, meal_type)
+             for meal_type in meal_type_list]
+            for day in days
+        ]
+        column_totals = [
+            None if None in column else sum(column)
+            for column in zip(*matrix)
+        ]
+        room_totals = column_totals[:len(room_list)]
+        meal_totals = column_totals[len(room_list):]
+
+        missing = []
+        rooms = []
+        for (room_type, number), price in zip(room_list, room_totals):
+            if price is None:
+                missing.append('room_type:{}'.format(room_type))
+            rooms.append({
+                'room_type': room_type,
+                'number': number,
+                'price': price,
+                'total': price * number if price is not None else None,
+            })
+        meals = []
+        for meal_type, price in zip(meal_type_list, meal_totals):
+            if price is None:
+                missing.append('meal_type:{}'.format(meal_type))
+            meals.append({
+                'meal_type': meal_type,
+                'people': people,
+                'price': price,
+                'total': price * people if price is not None else None,
+            })
+        result = {
+            'rooms': rooms,
+            'meals': meals,
+            'free_policy': fee.free_policy,
+            'free': fee.free,
+            'discount': None,
+            'missing': missing,
+            'total': None,
+        }
+        if missing:
+            return result
+
+        total = (sum(item['total'] for item in rooms) +
+                 sum(item['total'] for item in meals))
+        discount = 0
+        if fee.free:
+            if fee.free_policy == HotelFee.FREE_TYPE.ROOM:
+                # 每free间免一间, 免最便宜的房型
+                free_number = sum(number for _, number in room_list) // fee.free
+                discount = free_number * min(item['price'] for item in rooms)
+            elif fee.free_policy == HotelFee.FREE_TYPE.PEOPLE and people:
+                # 每free人免一人, 按人均费用减免
+                free_number = people // fee.free
+                discount = free_number * total / people
+        result.update(discount=discount, total=total - discount)
+        return result
+
+
+class CityMinRoomPriceService(BaseService):
+    @classmethod
+    def search(cls, city_id, from_time, to_time=None, star_level=None,
+               room_type=None):
+        """城市每天的最低房价, 直接读物化的city_min_room_price表
+
+        from_time, to_time都包含, to_time为空时只查from_time当天.
+        """
+        # 表中的日期都是当天0点, 按天比较
+        start_date = timestamp_to_date(from_time).date()
+        end_date = start_date
+        if to_time is not None:
+            end_date = timestamp_to_date(to_time).date()
+        if not 0 <= (end_date - start_date).days < HotelRateService.MAX_NIGHTS:
+            raise_error_json(InvalidateError(args=('to', to_time,)))
+        start_date = datetime.datetime.combine(start_date, datetime.time())
+        end_date = datetime.datetime.combine(end_date, datetime.time())
+        row_list = CityMinRoomPrice.search(
+            city_id, start_date, end_date, star_level=star_level,
+            room_type=room_type)
+        return [cls._format_data_dict(row) for row in row_list]
@@ -0,0 +1,72 @@
+# coding: utf-8
+from .base import BaseService
+from .hotel import HotelService
+from .restaurant import RestaurantService
+from .attraction import AttractionService
+from .shop import ShopService
+from ..config import setting
+from ..model.geo import geo_index
+from ..exc import raise_error_json, InvalidateError, ParameterError
+
+
+class NearbyService(BaseService):
+    # 资源名 -> 批量获取详情的service, 资源名与geo_index中注册的一致
+    SERVICE_MAP = {
+        'hotel': HotelService,
+        'restaurant': RestaurantService,
+        'attraction': AttractionService,
+        'shop': ShopService,
+    }
+
+    @classmethod
+    def _get_center(cls, latitude, longitude, entity, id):
+        """返回(纬度, 经度, 要排除的资源); 传了entity和id时以该资源为中心"""
+        if entity is None:
+            if latitude is None or longitude is None:
+                raise_error_json(InvalidateError(args=('latitude', latitude,)))
+            return latitude, longitude, None
+        if entity not in cls.SERVICE_MAP:
+            raise_error_json(ParameterError(args=(entity,)))
+        point = geo_index.get_point(entity, id)
+        if point is None:
+            raise_error_json(InvalidateError(args=('id', id,)))
+        return point[0], point[1], (entity, id)
+
+    @classmethod
+    def search(cls, latitude=None, longitude=None, entity=None, id=None,
+               types=None, radius=5, number=10, fields=None):
+        """返回半径(公里)内最近的number个资源, 按距离从近到远
+
+        [{'type': 资源名, 'id': id, 'distance': 公里数, 'data': {...}}, ...]
+        """
+        latitude, longitude, exclude = cls._get_center(
+            latitude, longitude, entity, id)
+        for kind in types or ():
+            if kind not in cls.SERVICE_MAP:
+                raise_error_json(ParameterError(args=(kind,)))
+        if not 0 < radius <= setting.CREOLE_NEARBY_MAX_RADIUS_KM:
+            raise_error_json(InvalidateError(args=('radius', radius,)))
+
+        result = geo_index.nearby(
+            latitude, longitude, radius, kinds=types, number=number,
+            exclude=exclude)
+        kind_ids_map = {}
+        for _, kind, id in result:
+            kind_ids_map.setdefault(kind, []).append(id)
+        data_map = {
+            kind: cls.SERVICE_MAP[kind].get_by_ids(ids, fields=fields)
+            for kind, ids in kind_ids_map.iteritems()
+        }
+        data_list = []
+        for distance, kind, id in result:
+            data = data_map[kind].get(id)
+            # 其他进程刚删除, 本进程的索引还没有刷新
+            if data is None:
+                continue
+            data_list.append({
+                'type': kind,
+                'id': id,
+                'distance': round(distance, 3),
+                'data': data,
+            })
+        return data_list
@@ -1,8 +1,11 @@
 # coding: utf-8
+from collections import defaultdict
+
 from sqlalchemy.exc import SQLAlchemyError
 
 from ..util import _func
 from .base import BaseService
+from ..redis import entity_cache
 from ..model import DBSession
 from ..model.restaurant import (
     Restaurant,
@@ -20,20 +23,56 @@ from ..exc import (
 
 class RestaurantService(BaseService):
     @classmethod
-    def _get_db_obj_data_dict(cls, restaurant_obj):
+    def _split_fields(cls, fields):
+        """meal_type不是餐厅表的列, 返回(餐厅表的列, 是否需要meal_type)"""
+        if not fields:
+            return None, True
+        return [f for f in fields if f != 'meal_type'], 'meal_type' in fields
+
+    @classmethod
+    def _get_db_obj_data_dict(cls, restaurant_obj, fields=None):
+        column_fields, with_meal_type = cls._split_fields(fields)
         _dict = super(RestaurantService, cls).\
-            _get_db_obj_data_dict(restaurant_obj)
-        if restaurant_obj:
+            _get_db_obj_data_dict(restaurant_obj, column_fields)
+        if restaurant_obj and with_meal_type:
             # 拉取餐厅对应的套餐类型
             meal_list = MealService.get_by_restaurant_id(restaurant_obj.id)
             _dict['meal_type'] = meal_list
         return _dict
 
     @classmethod
-    def get_by_id(cls, id):
-        restaurant = Restaurant.get_by_id(id)
+    def get_by_id(cls, id, fields=None):
+        restaurant = entity_cache.get_or_load(
+            Restaurant.__tablename__, id, cls._load_by_id)
+        return cls._project_fields(restaurant, fields)
+
+    @classmethod
+    def _load_by_id(cls, id):
+        restaurant = Restaurant.get_detail_by_id(id)
         return cls._get_db_obj_data_dict(restaurant)
 
+    @classmethod
+    def get_by_ids(cls, ids, fields=None):
+        restaurant_map = entity_cache.get_many_or_load(
+            Restaurant.__tablename__, ids, cls._load_by_ids)
+        return cls._project_fields_map(restaurant_map, fields)
+
+    @classmethod
+    def _load_by_ids(cls, ids):
+        restaurant_map = Restaurant.get_details_by_ids(ids)
+        # 一次拉取所有餐厅的套餐类型
+        meal_map = defaultdict(list)
+        for meal in Meal.get_by_restaurant_ids(restaurant_map.keys()):
+            meal_map[meal.restaurant_id].append(
+                MealService._get_db_obj_data_dict(meal))
+        data = {}
+        for id, restaurant in restaurant_map.iteritems():
+            _dict = super(RestaurantService, cls).\
+                _get_db_obj_data_dict(restaurant)
+            _dict['meal_type'] = meal_map[id]
+            data[id] = _dict
+        return data
+
     @classmethod
     def delete_restaurant_by_id(cls, id):
         session = DBSession()
@@ -59,7 +98,7 @@ class RestaurantService(BaseService):
                standard_meal_intro_cn=None, standard_meal_intro_en=None,
                upgrade_meal_intro_cn=None, upgrade_meal_intro_en=None,
                luxury_meal_intro_cn=None, luxury_meal_intro_en=None,
-               intro_cn=None, intro_en=None):
+               intro_cn=None, intro_en=None, latitude=None, longitude=None):
         return Restaurant.create(
             name=name, name_en=name_en, nickname_en=nickname_en,
             restaurant_type=restaurant_type, country_id=country_id,
@@ -79,19 +118,22 @@ class RestaurantService(BaseService):
             upgrade_meal_intro_en=upgrade_meal_intro_en,
             luxury_meal_intro_cn=luxury_meal_intro_cn,
             luxury_meal_intro_en=luxury_meal_intro_en,
-            intro_cn=intro_cn, intro_en=intro_en
+            intro_cn=intro_cn, intro_en=intro_en,
+            latitude=latitude, longitude=longitude
         )
 
     @classmethod
     def search_restaurant(cls, country_id=None, city_id=None,
-                          restaurant_type=None, page=1, number=20):
+                          restaurant_type=None, page=1, number=20,
+                          cursor=None, q=None, fields=None):
         raw_data = []
         restaurant_list, total = Restaurant.search(
             country_id=country_id, city_id=city_id,
             restaurant_type=restaurant_type,
-            page=page, number=number)
+            page=page, number=number, cursor=cursor, q=q,
+            fields=cls._split_fields(fields)[0])
         for restaurant in restaurant_list:
-            raw_data.append(cls._get_db_obj_data_dict(restaurant))
+            raw_data.append(cls._get_db_obj_data_dict(restaurant, fields))
         return raw_data, total
 
 
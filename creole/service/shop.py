@@ -10,6 +10,7 @@ from ..model.shop import (
     ShopContact,
 )
 from .base import BaseService
+from ..redis import entity_cache
 from ..exc import (
     raise_error_json,
     DatabaseError,
@@ -18,19 +19,36 @@ from ..exc import (
 
 class ShopService(BaseService):
     @classmethod
-    def get_by_id(cls, id):
-        shop = Shop.get_by_id(id)
+    def get_by_id(cls, id, fields=None):
+        shop = entity_cache.get_or_load(
+            Shop.__tablename__, id, cls._load_by_id)
+        return cls._project_fields(shop, fields)
+
+    @classmethod
+    def _load_by_id(cls, id):
+        shop = Shop.get_detail_by_id(id)
         return cls._get_db_obj_data_dict(shop)
 
+    @classmethod
+    def get_by_ids(cls, ids, fields=None):
+        shop_map = entity_cache.get_many_or_load(
+            Shop.__tablename__, ids, cls._load_by_ids)
+        return cls._project_fields_map(shop_map, fields)
+
+    @classmethod
+    def _load_by_ids(cls, ids):
+        return cls._get_data_dict_map(Shop.get_details_by_ids(ids))
+
     @classmethod
     def create_shop(cls, name, name_en, nickname_en, address, country_id,
                     city_id, company_id, shop_type, note=None,
-                    intro_cn='', intro_en=''):
+                    intro_cn='', intro_en='', latitude=None, longitude=None):
         Shop.create(
             name=name, name_en=name_en, address=address,
             nickname_en=nickname_en, country_id=country_id,
             city_id=city_id, company_id=company_id, shop_type=shop_type,
-            intro_cn=intro_cn, note=note, intro_en=intro_en)
+            intro_cn=intro_cn, note=note, intro_en=intro_en,
+            latitude=latitude, longitude=longitude)
         session = DBSession()
         try:
             session.commit()
@@ -60,14 +78,15 @@ class ShopService(BaseService):
 
     @classmethod
     def search_shop(cls, country_id=None, city_id=None,
-                    company_id=None, shop_type=None, page=1, number=20):
+                    company_id=None, shop_type=None, page=1, number=20,
+                    cursor=None, q=None, fields=None):
         raw_data = []
         shop_list, total = Shop.search(
             country_id=country_id, city_id=city_id,
             company_id=company_id, shop_type=shop_type,
-            page=page, number=number)
+            page=page, number=number, cursor=cursor, q=q, fields=fields)
         for shop in shop_list:
-            raw_data.append(cls._get_db_obj_data_dict(shop))
+            raw_data.append(cls._get_db_obj_data_dict(shop, fields))
         return raw_data, total
 
 
@@ -168,9 +187,9 @@ class ShopFeeService(BaseService):
 
 class ShopCompanyService(BaseService):
     @classmethod
-    def get_by_id(cls, id):
+    def get_by_id(cls, id, fields=None):
         company = ShopCompany.get_by_id(id)
-        return cls._get_db_obj_data_dict(company)
+        return cls._project_fields(cls._get_db_obj_data_dict(company), fields)
 
     @classmethod
     def delete_shop_company_by_id(cls, id):
@@ -216,12 +235,15 @@ class ShopCompanyService(BaseService):
 
     @classmethod
     def search_company(cls, name=None, name_en=None, country_id=None,
-                       city_id=None, page=1, number=20):
+                       city_id=None, page=1, number=20, cursor=None,
+                       fields=None):
         shop_company, total = \
             ShopCompany.search(
                 name=name, name_en=name_en, country_id=country_id,
-                city_id=city_id, page=page, number=number)
-        return [cls._get_db_obj_data_dict(item) for item in shop_company], total
+                city_id=city_id, page=page, number=number,
+                cursor=cursor, fields=fields)
+        return [cls._get_db_obj_data_dict(item, fields)
+                for item in shop_company], total
 
 
 class ShopCompanyContactService(BaseService):
@@ -8,6 +8,7 @@ from ..model.tour_guide import (
     TourGuideAccount,
 )
 from .base import BaseService
+from ..redis import entity_cache
 from ..exc import (
     raise_error_json,
     DatabaseError,
@@ -19,10 +20,26 @@ from ..util import _func
 
 class TourGuideService(BaseService):
     @classmethod
-    def get_by_id(cls, id):
-        tour_guide = TourGuide.get_by_id(id)
+    def get_by_id(cls, id, fields=None):
+        tour_guide = entity_cache.get_or_load(
+            TourGuide.__tablename__, id, cls._load_by_id)
+        return cls._project_fields(tour_guide, fields)
+
+    @classmethod
+    def _load_by_id(cls, id):
+        tour_guide = TourGuide.get_detail_by_id(id)
         return cls._get_db_obj_data_dict(tour_guide)
 
+    @classmethod
+    def get_by_ids(cls, ids, fields=None):
+        tour_guide_map = entity_cache.get_many_or_load(
+            TourGuide.__tablename__, ids, cls._load_by_ids)
+        return cls._project_fields_map(tour_guide_map, fields)
+
+    @classmethod
+    def _load_by_ids(cls, ids):
+        return cls._get_data_dict_map(TourGuide.get_details_by_ids(ids))
+
     @classmethod
     def create_tour_guide(cls, guide_type, country_id, name, name_en, nickname_en,
                           gender, birthday, start_work, first_language, first_language_level,
@@ -80,14 +97,15 @@ class TourGuideService(BaseService):
 
     @classmethod
     def search_tour_guide(cls, country_id=None, gender=None,
-                          guide_type=None, number=20, page=1):
+                          guide_type=None, number=20, page=1, cursor=None,
+                          q=None, fields=None):
         raw_data = []
         tour_guide_list, total = TourGuide.search(
             country_id=country_id, gender=gender,
             guide_type=guide_type,
-            number=number, page=page)
+            number=number, page=page, cursor=cursor, q=q, fields=fields)
         for tour_guide in tour_guide_list:
-            raw_data.append(cls._get_db_obj_data_dict(tour_guide))
+            raw_data.append(cls._get_db_obj_data_dict(tour_guide, fields))
         return raw_data, total
 
 
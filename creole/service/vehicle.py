@@ -11,6 +11,7 @@ from ..model.vehicle import (
     VehicleType,
 )
 from .base import BaseService
+from ..redis import entity_cache
 from ..exc import (
     raise_error_json,
     DatabaseError,
@@ -19,9 +20,9 @@ from ..exc import (
 
 class VehicleCompanyService(BaseService):
     @classmethod
-    def get_by_id(cls, id):
+    def get_by_id(cls, id, fields=None):
         company = VehicleCompany.get_by_id(id)
-        return cls._get_db_obj_data_dict(company)
+        return cls._project_fields(cls._get_db_obj_data_dict(company), fields)
 
     @classmethod
     def delete_vehicle_company_by_id(cls, id):
@@ -34,10 +35,8 @@ class VehicleCompanyService(BaseService):
         """
         session = DBSession()
         VehicleCompany.delete(id)   # 删除公司
-        vehicle_list = Vehicle.get_by_company_id(id)
         # 删除公司下的车辆
-        for vehicle in vehicle_list:
-            session.delete(vehicle)
+        Vehicle.delete_by_company_id(id)
         # 删除公司结算账号
         account_list = VehicleAccount.get_by_company_id(id)
         for account in account_list:
@@ -84,13 +83,15 @@ class VehicleCompanyService(BaseService):
 
     @classmethod
     def search_company(cls, name=None, name_en=None, country_id=None,
-                       city_id=None, company_type=None, number=20, page=1):
+                       city_id=None, company_type=None, number=20, page=1,
+                       cursor=None, fields=None):
         vehicle_company, total = \
             VehicleCompany.search(
                 name=name, name_en=name_en, country_id=country_id,
                 city_id=city_id, company_type=company_type,
-                number=number, page=page)
-        return [cls._get_db_obj_data_dict(item) for item in vehicle_company], total
+                number=number, page=page, cursor=cursor, fields=fields)
+        return [cls._get_db_obj_data_dict(item, fields)
+                for item in vehicle_company], total
 
 
 class VehicleAccountService(BaseService):
@@ -147,9 +148,9 @@ class VehicleAccountService(BaseService):
 
 class VehicleFeeService(BaseService):
     @classmethod
-    def get_by_id(cls, id):
+    def get_by_id(cls, id, fields=None):
         fee = VehicleFee.get_by_id(id)
-        return cls._get_db_obj_data_dict(fee)
+        return cls._project_fields(cls._get_db_obj_data_dict(fee), fields)
 
     @classmethod
     def get_by_company_id(cls, company_id):
@@ -197,12 +198,15 @@ class VehicleFeeService(BaseService):
     @classmethod
     def search_fee(cls, vehicle_type_id=None, company_id=None,
                    unit_price=None, start_time=None, end_time=None,
-                   confirm_person=None, number=20, page=1):
+                   confirm_person=None, number=20, page=1, cursor=None,
+                   fields=None):
         fee_list, total = VehicleFee.search(
             vehicle_type_id=vehicle_type_id, company_id=company_id,
             unit_price=unit_price, start_time=start_time, end_time=end_time,
-            confirm_person=confirm_person, number=number, page=page)
-        return [cls._get_db_obj_data_dict(item) for item in fee_list], total
+            confirm_person=confirm_person, number=number, page=page,
+            cursor=cursor, fields=fields)
+        return [cls._get_db_obj_data_dict(item, fields)
+                for item in fee_list], total
 
 
 class VehicleContactService(BaseService):
@@ -254,9 +258,9 @@ class VehicleContactService(BaseService):
 
 class VehicleTypeService(BaseService):
     @classmethod
-    def get_type_by_id(cls, id):
+    def get_type_by_id(cls, id, fields=None):
         type = VehicleType.get_by_id(id)
-        return cls._get_db_obj_data_dict(type)
+        return cls._project_fields(cls._get_db_obj_data_dict(type), fields)
 
     @classmethod
     def create_type(cls, vehicle_type, brand, seat,
@@ -293,18 +297,37 @@ class VehicleTypeService(BaseService):
             raise_error_json(DatabaseError(msg=repr(e)))
 
     @classmethod
-    def search_type(cls, vehicle_type=None, number=20, page=1):
+    def search_type(cls, vehicle_type=None, number=20, page=1, cursor=None,
+                    fields=None):
         type_list, total = VehicleType.search(
-            vehicle_type=vehicle_type, number=number, page=page)
-        return [cls._get_db_obj_data_dict(item) for item in type_list], total
+            vehicle_type=vehicle_type, number=number, page=page,
+            cursor=cursor, fields=fields)
+        return [cls._get_db_obj_data_dict(item, fields)
+                for item in type_list], total
 
 
 class VehicleService(BaseService):
     @classmethod
-    def get_by_id(cls, id):
+    def get_by_id(cls, id, fields=None):
+        vehicle = entity_cache.get_or_load(
+            Vehicle.__tablename__, id, cls._load_by_id)
+        return cls._project_fields(vehicle, fields)
+
+    @classmethod
+    def _load_by_id(cls, id):
         vehicle = Vehicle.get_by_id(id)
         return cls._get_db_obj_data_dict(vehicle)
 
+    @classmethod
+    def get_by_ids(cls, ids, fields=None):
+        vehicle_map = entity_cache.get_many_or_load(
+            Vehicle.__tablename__, ids, cls._load_by_ids)
+        return cls._project_fields_map(vehicle_map, fields)
+
+    @classmethod
+    def _load_by_ids(cls, ids):
+        return cls._get_data_dict_map(Vehicle.get_by_ids(ids))
+
     @classmethod
     def create_vehicle(cls, country_id, city_id, company_id, license,
                        insurance_number, start_use, register_number,
@@ -345,12 +368,14 @@ class VehicleService(BaseService):
     @classmethod
     def search_vehicle(
             cls, country_id=None, city_id=None, company_id=None,
-            vehicle_type_id=None , license=None,page=1, number=20):
+            vehicle_type_id=None , license=None,page=1, number=20,
+            cursor=None, fields=None):
         raw_data = []
         vehicle_list, total = Vehicle.search(
             country_id=country_id, city_id=city_id,
             company_id=company_id, vehicle_type_id=vehicle_type_id,
-            license=license, page=page, number=number)
+            license=license, page=page, number=number, cursor=cursor,
+            fields=fields)
         for vehicle in vehicle_list:
-            raw_data.append(cls._get_db_obj_data_dict(vehicle))
+            raw_data.append(cls._get_db_obj_data_dict(vehicle, fields))
         return raw_data, total
@@ -2,6 +2,7 @@
 import os
 import sys
 import time
+import base64
 import datetime
 
 
@@ -18,6 +19,35 @@ def datetime_to_timestamp(dt):
     return 0
 
 
+def encode_cursor(last_id):
+    """把上一页最后一条记录的id编码成不透明的分页cursor"""
+    return base64.urlsafe_b64encode('id:{}'.format(last_id)).rstrip('=')
+
+
+def decode_cursor(cursor):
+    """`encode_cursor`的逆操作, cursor不合法时抛出ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(
+            str(cursor) + '=' * (-len(cursor) % 4))
+        prefix, last_id = raw.split(':', 1)
+        if prefix != 'id':
+            raise ValueError
+        return int(last_id)
+    except (TypeError, ValueError, UnicodeEncodeError):
+        raise ValueError('Invalid cursor: {!r}'.format(cursor))
+
+
+def gen_next_cursor(data_list, number, q=None):
+    """本页取满时返回下一页的cursor, 否则返回None
+
+    有全文检索q时结果按相关度排序, 而cursor分页只能按id排序,
+    接着翻页既不是相关度顺序也不是本页的延续, 所以不返回cursor.
+    """
+    if q or not data_list or len(data_list) < number:
+        return None
+    return encode_cursor(data_list[-1]['id'])
+
+
 class CachedProperty(object):
     def __init__(self, func):
         self.func = func
@@ -102,6 +132,13 @@ class EnvReader(object):
             return int(value)
         return default
 
+    def get_list(self, key, default=None, separator=','):
+        value = self.__getitem__(key)
+        if value is not None:
+            return [item.strip() for item in value.split(separator)
+                    if item.strip()]
+        return default if default is not None else []
+
 
 def get_setting_manager():
     return EnvReader()
@@ -4,9 +4,10 @@ import logging
 from flask import request, jsonify, make_response
 from flask_restful import Resource as BaseResource
 from flask_restful.reqparse import RequestParser, Argument
+from sqlalchemy.exc import TimeoutError
 from werkzeug.exceptions import BadRequest
 
-from ...exc import get_translation, CreoleErrCode
+from ...exc import get_translation, CreoleErrCode, ClientError
 
 logger = logging.getLogger(__name__)
 
@@ -76,7 +77,18 @@ class Resource(BaseResource):
     def dispatch_request(self, *args, **kwargs):
         self._set_method_decorate()
         logger.info(kwargs)
-        return super(Resource, self).dispatch_request(*args, **kwargs)
+        try:
+            return super(Resource, self).dispatch_request(*args, **kwargs)
+        except TimeoutError as e:
+            # 数据库连接池排队超时, 快速失败
+            logger.warning(repr(e))
+            response = api_response(
+                code=CreoleErrCode.DATABASE_BUSY, status_code=503)
+            response.headers['Retry-After'] = '1'
+            return response
+        except ClientError as e:
+            # 没有自己捕获ClientError的接口(如fields中有不存在的字段)
+            return api_response(code=e.errcode, message=e.msg)
 
 
 def api_response(data=None, code=200, message=None, status_code=200):
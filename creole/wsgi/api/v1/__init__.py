@@ -12,6 +12,7 @@ from .endpoint.country import (
 )
 from .endpoint.shop import (
     ShopApi,
+    BatchGetShopApi,
     CreateShopApi,
     ShopCompanyApi,
     ShopSearchApi,
@@ -29,6 +30,7 @@ from .endpoint.shop import (
 )
 from .endpoint.vehicle import (
     VehicleApi,
+    BatchGetVehicleApi,
     SearchVehicleApi,
     CreateVehicleApi,
     VehicleCompanyApi,
@@ -49,6 +51,7 @@ from .endpoint.vehicle import (
 )
 from .endpoint.attraction import (
     AttractionApi,
+    BatchGetAttractionApi,
     CreateAttractionApi,
     SearchAttractionApi,
     CreateAttractionFeeApi,
@@ -57,6 +60,7 @@ from .endpoint.attraction import (
 )
 from .endpoint.restaurant import (
     RestaurantApi,
+    BatchGetRestaurantApi,
     CreateRestaurantApi,
     SearchRestaurantApi,
     EditRestaurantAccountApi,
@@ -66,6 +70,7 @@ from .endpoint.restaurant import (
 )
 from .endpoint.tour_guide import (
     TourGuideApi,
+    BatchGetTourGuideApi,
     SearchTourGuideApi,
     CreateTourGuideApi,
     TourGuideFeeApi,
@@ -81,6 +86,7 @@ from .endpoint.hotel import (
     GetHotelCompanyContactApi,
     CreateHotelCompanyContactApi,
     HotelApi,
+    BatchGetHotelApi,
     CreateHotelApi,
     SearchHotelApi,
     GetHotelApi,
@@ -93,11 +99,18 @@ from .endpoint.hotel import (
     CreateHotelFeeApi,
     HotelFeeApi,
     GetHotelFeeApi,
+    HotelRatesApi,
+    HotelQuoteApi,
+    CityMinRoomPriceApi,
     EditRoomPriceApi,
     EditMealPriceApi,
     EditRoomAdditionalChargeApi,
     EditFestivalAdditionalChargeApi,
 )
+from .endpoint.catalog import CatalogSearchApi
+from .endpoint.export import ExportApi
+from .endpoint.nearby import NearbyApi
+from .endpoint.internal import DBPoolStatsApi, DBSessionStatsApi
 
 
 blue_print = Blueprint('api_v1', __name__)
@@ -116,6 +129,7 @@ app.add_resource(CreateCityApi, '/city/create', endpoint='create-city')
 
 # 购物店
 app.add_resource(ShopApi, '/shop/<int:id>', endpoint='get-shop')
+app.add_resource(BatchGetShopApi, '/shop/batch', endpoint='batch-get-shop')
 app.add_resource(ShopSearchApi, '/shop/search', endpoint='search-shop')
 app.add_resource(CreateShopApi, '/shop/create', endpoint='create-shop')
 app.add_resource(ShopCompanyApi, '/shop/company/<int:id>', endpoint='get-shop-company')
@@ -133,6 +147,7 @@ app.add_resource(GetShopContactApi, '/shop/contact/shop/<int:shop_id>', endpoint
 
 # 车辆
 app.add_resource(VehicleApi, '/vehicle/<int:id>', endpoint='get-vehicle')
+app.add_resource(BatchGetVehicleApi, '/vehicle/batch', endpoint='batch-get-vehicle')
 app.add_resource(CreateVehicleApi, '/vehicle/create', endpoint='create-vehicle')
 app.add_resource(SearchVehicleApi, '/vehicle/search', endpoint='search-vehicle')
 app.add_resource(VehicleCompanyApi, '/vehicle/company/<int:id>', endpoint='get-vehicle-company')
@@ -153,6 +168,7 @@ app.add_resource(SearchVehicleTypeApi, '/vehicle/type/search', endpoint='search-
 
 # 景点
 app.add_resource(AttractionApi, '/attraction/<int:id>', endpoint='get-attraction')
+app.add_resource(BatchGetAttractionApi, '/attraction/batch', endpoint='batch-get-attraction')
 app.add_resource(CreateAttractionApi, '/attraction/create', endpoint='create-attraction')
 app.add_resource(SearchAttractionApi, '/attraction/search', endpoint='search-attraction')
 app.add_resource(CreateAttractionFeeApi, '/attraction/fee/create', endpoint='create-attraction-fee')
@@ -161,6 +177,7 @@ app.add_resource(GetAttractionFeeApi, '/attraction/fee/attraction/<int:attractio
 
 # 餐饮
 app.add_resource(RestaurantApi, '/restaurant/<int:id>', endpoint='get-restaurant')
+app.add_resource(BatchGetRestaurantApi, '/restaurant/batch', endpoint='batch-get-restaurant')
 app.add_resource(CreateRestaurantApi, '/restaurant/create', endpoint='create-restaurant')
 app.add_resource(SearchRestaurantApi, '/restaurant/search', endpoint='search-restaurant')
 app.add_resource(RestaurantAccountApi, '/restaurant/account/<int:restaurant_id>', endpoint='get-restaurant-account')
@@ -170,6 +187,7 @@ app.add_resource(EditMealApi, '/restaurant/meal/edit', endpoint='edit-restaurant
 
 # 导游
 app.add_resource(TourGuideApi, '/tour_guide/<int:id>', endpoint='get-tour-guide')
+app.add_resource(BatchGetTourGuideApi, '/tour_guide/batch', endpoint='batch-get-tour-guide')
 app.add_resource(SearchTourGuideApi, '/tour_guide/search', endpoint='search-tour-guide')
 app.add_resource(CreateTourGuideApi, '/tour_guide/create', endpoint='create-tour-guide')
 app.add_resource(TourGuideFeeApi, '/tour_guide/fee/<int:id>', endpoint='get-tour-guide-fee')
@@ -179,12 +197,16 @@ app.add_resource(EditTourGuideAccountApi, '/tour_guide/account/edit', endpoint='
 
 # 酒店
 app.add_resource(HotelApi, '/hotel/<int:id>', endpoint='get-hotel')
+app.add_resource(BatchGetHotelApi, '/hotel/batch', endpoint='batch-get-hotel')
 app.add_resource(CreateHotelApi, '/hotel/create', endpoint='create-hotel')
 app.add_resource(GetHotelApi, '/hotel/get/<int:company>', endpoint='get-hotel-by-company')
 app.add_resource(CreateHotelFeeApi, '/hotel/fee/create', endpoint='create-hotel-fee')
 app.add_resource(HotelFeeApi, '/hotel/fee/<int:id>', endpoint='get-hotel-fee')
 app.add_resource(SearchHotelApi, '/hotel/search', endpoint='search-hotel')
 app.add_resource(GetHotelFeeApi, '/hotel/fee/hotel/<int:hotel_id>', endpoint='get-hotel-fee-by-hotel-id')
+app.add_resource(HotelRatesApi, '/hotel/<int:id>/rates', endpoint='get-hotel-rates')
+app.add_resource(HotelQuoteApi, '/hotel/quote', endpoint='hotel-quote')
+app.add_resource(CityMinRoomPriceApi, '/hotel/min_price', endpoint='get-city-min-room-price')
 app.add_resource(EditRoomPriceApi, '/hotel/room_price/edit', endpoint='edit-room-price')
 app.add_resource(EditMealPriceApi, '/hotel/meal_price/edit', endpoint='edit-meal-price')
 app.add_resource(EditRoomAdditionalChargeApi, '/hotel/room_additional_charge', endpoint='edit-room-additional-charge')
@@ -201,3 +223,14 @@ app.add_resource(CreateHotelContactApi, '/hotel/contact/create', endpoint='creat
 app.add_resource(HotelAccountApi, '/hotel/account/<int:id>', endpoint='get-hotel-account')
 app.add_resource(CreateHotelAccountApi, '/hotel/account/create', endpoint='create-hotel-account')
 app.add_resource(GetHotelAccountApi, '/hotel/account/hotel/<int:hotel_id>', endpoint='get-hotel-account-by-hotel-id')
+
+# 跨资源搜索
+app.add_resource(CatalogSearchApi, '/catalog/search', endpoint='search-catalog')
+app.add_resource(NearbyApi, '/nearby', endpoint='search-nearby')
+
+# 全量导出
+app.add_resource(ExportApi, '/export/<string:entity>', endpoint='export-entity')
+
+# 内部接口
+app.add_resource(DBPoolStatsApi, '/internal/db/stats', endpoint='internal-db-stats')
+app.add_resource(DBSessionStatsApi, '/internal/db/session/stats', endpoint='internal-db-session-stats')
@@ -5,19 +5,24 @@ from ..req_param.attraction import (
     CreateAttractionApiParser,
     SearchAttractionApiParser,
     CreateAttractionFeeApiParser,
+    BatchGetAttractionApiParser,
+    GetAttractionApiParser,
 )
 from creole.exc import ClientError
+from .....util import gen_next_cursor
 
 
 class AttractionApi(Resource):
     meta = {
         'args_parser_dict': {
+            'get': GetAttractionApiParser(),
             'put': CreateAttractionApiParser(),
         }
     }
 
     def get(self, id):
-        attraction = AttractionService.get_by_id(id)
+        attraction = AttractionService.get_by_id(
+            id, fields=self.parsed_data['fields'])
         return api_response(data=attraction)
 
     def put(self, id):
@@ -65,10 +70,13 @@ class SearchAttractionApi(Resource):
                 AttractionService.search_attraction(**self.parsed_data)
         except ClientError as e:
             return api_response(code=e.errcode, message=e.msg)
-        if self.parsed_data['page'] == 1:
+        if self.parsed_data['page'] == 1 \
+                and self.parsed_data['cursor'] is None:
             data = {'attraction_data': attraction_list, 'total': total}
         else:
             data = {'attraction_data': attraction_list}
+        data['next_cursor'] = gen_next_cursor(
+            attraction_list, self.parsed_data['number'], q=self.parsed_data['q'])
         return api_response(data=data)
 
 
@@ -118,3 +126,17 @@ class CreateAttractionFeeApi(Resource):
         except ClientError as e:
             return api_response(code=e.errcode, message=e.msg)
         return api_response()
+
+
+class BatchGetAttractionApi(Resource):
+    meta = {
+        'args_parser_dict': {
+            'get': BatchGetAttractionApiParser(),
+        }
+    }
+
+    def get(self):
+        """根据?ids=1,2,3批量查询景点, 返回{id: 景点信息}"""
+        attraction_map = AttractionService.get_by_ids(
+            self.parsed_data['ids'], fields=self.parsed_data['fields'])
+        return api_response(data=attraction_map)
@@ -0,0 +1,20 @@
+# coding: utf-8
+from ...util import Resource, api_response
+from .....service.catalog import CatalogService
+from ..req_param.catalog import CatalogSearchApiParser
+from creole.exc import ClientError
+
+
+class CatalogSearchApi(Resource):
+    meta = {
+        'args_parser_dict': {
+            'get': CatalogSearchApiParser(),
+        }
+    }
+
+    def get(self):
+        try:
+            data = CatalogService.search(**self.parsed_data)
+        except ClientError as e:
+            return api_response(code=e.errcode, message=e.msg)
+        return api_response(data=data)
@@ -0,0 +1,35 @@
+# coding: utf-8
+import json
+
+from flask import Response, stream_with_context
+
+from ...util import Resource, api_response
+from .....service.export import ExportService
+from ..req_param.export import ExportApiParser
+from creole.exc import ClientError
+
+
+def _iter_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False).encode('utf-8') + '\n'
+
+
+class ExportApi(Resource):
+    meta = {
+        'args_parser_dict': {
+            'get': ExportApiParser(),
+        }
+    }
+
+    def get(self, entity):
+        # 参数错误只能在开始输出之前返回
+        try:
+            statement = ExportService.get_export_statement(
+                entity, **self.parsed_data)
+        except ClientError as e:
+            return api_response(code=e.errcode, message=e.msg)
+        rows = ExportService.iter_rows(statement)
+        return Response(
+            stream_with_context(_iter_ndjson(rows)),
+            mimetype='application/x-ndjson',
+        )
@@ -11,6 +11,9 @@ from .....service.hotel import (
     MealPriceService,
     RoomAdditionalChargeService,
     FestivalAdditionalChargeService,
+    HotelRateService,
+    HotelQuoteService,
+    CityMinRoomPriceService,
 )
 from ..req_param.hotel import (
     CreateHotelCompanyContactApiParser,
@@ -25,8 +28,15 @@ from ..req_param.hotel import (
     EditMealPriceApiParser,
     EditRoomAdditionalChargeApiParser,
     EditFestivalAdditionalChargeApiParser,
+    BatchGetHotelApiParser,
+    GetHotelApiParser,
+    GetHotelCompanyApiParser,
+    GetHotelRatesApiParser,
+    HotelQuoteApiParser,
+    CityMinRoomPriceApiParser,
 )
 from creole.exc import ClientError
+from .....util import gen_next_cursor
 
 
 class HotelCompanyContactApi(Resource):
@@ -81,12 +91,16 @@ class GetHotelCompanyContactApi(Resource):
 class HotelCompanyApi(Resource):
     meta = {
         'args_parser_dict': {
+            'get': GetHotelCompanyApiParser(),
             'put': CreateHotelCompanyApiParser(),
         }
     }
 
     def get(self, id):
-        company = HotelCompanyService.get_by_id(id)
+        fields = self.parsed_data['fields']
+        company = HotelCompanyService.get_by_id(id, fields=fields)
+        if fields:
+            return api_response(data=company)
         # 获得公司下的所有联系人列表
         contact_list = \
             HotelCompanyContactService.get_contact_list_by_company_id(id)
@@ -119,10 +133,13 @@ class SearchHotelCompanyApi(Resource):
     def get(self):
         company_data, total = \
             HotelCompanyService.search_hotel_company(**self.parsed_data)
-        if self.parsed_data['page'] == 1:
+        if self.parsed_data['page'] == 1 \
+                and self.parsed_data['cursor'] is None:
             data = {'company_data': company_data, 'total': total}
         else:
             data = {'company_data': company_data}
+        data['next_cursor'] = \
+            gen_next_cursor(company_data, self.parsed_data['number'])
         return api_response(data=data)
 
 
@@ -144,12 +161,16 @@ class CreateHotelCompanyApi(Resource):
 class HotelApi(Resource):
     meta = {
         'args_parser_dict': {
+            'get': GetHotelApiParser(),
             'put': CreateHotelApiParser(),
         }
     }
 
     def get(self, id):
-        hotel = HotelService.get_by_id(id)
+        fields = self.parsed_data['fields']
+        hotel = HotelService.get_by_id(id, fields=fields)
+        if fields:
+            return api_response(data=hotel)
         hotel['contact_list'] = \
             HotelContactService.get_contact_list_by_hotel_id(id)
         hotel['account_list'] = HotelAccountService.get_by_hotel_id(id)
@@ -187,10 +208,13 @@ class SearchHotelApi(Resource):
     def get(self):
         hotel_data, total = \
             HotelService.search_hotel(**self.parsed_data)
-        if self.parsed_data['page'] == 1:
+        if self.parsed_data['page'] == 1 \
+                and self.parsed_data['cursor'] is None:
             data = {'hotel_data': hotel_data, 'total': total}
         else:
             data = {'hotel_data': hotel_data}
+        data['next_cursor'] = gen_next_cursor(
+            hotel_data, self.parsed_data['number'], q=self.parsed_data['q'])
         return api_response(data=data)
 
 
@@ -329,13 +353,7 @@ class HotelFeeApi(Resource):
     }
 
     def get(self, id):
-        fee = HotelFeeService.get_by_id(id)
-        fee['room_price'] = RoomPriceService.get_by_hotel_fee_id(id)
-        fee['meal_price'] = MealPriceService.get_by_hotel_fee_id(id)
-        fee['room_additional_charge'] = \
-            RoomAdditionalChargeService.get_by_hotel_fee_id(id)
-        fee['festival_additional_charge'] = \
-            FestivalAdditionalChargeService.get_by_hotel_fee_id(id)
+        fee = HotelFeeService.get_detail(id=id)
         return api_response(data=fee)
 
     def put(self, id):
@@ -356,18 +374,67 @@ class HotelFeeApi(Resource):
 
 class GetHotelFeeApi(Resource):
     def get(cls, hotel_id):
-        fee = HotelFeeService.get_by_hotel_id(hotel_id)
-        id = fee.get('id', None)
-        if id:
-            fee['room_price'] = RoomPriceService.get_by_hotel_fee_id(id)
-            fee['meal_price'] = MealPriceService.get_by_hotel_fee_id(id)
-            fee['room_additional_charge'] = \
-                RoomAdditionalChargeService.get_by_hotel_fee_id(id)
-            fee['festival_additional_charge'] = \
-                FestivalAdditionalChargeService.get_by_hotel_fee_id(id)
+        fee = HotelFeeService.get_detail(hotel_id=hotel_id)
         return api_response(data=fee)
 
 
+class HotelRatesApi(Resource):
+    meta = {
+        'args_parser_dict': {
+            'get': GetHotelRatesApiParser(),
+        }
+    }
+
+    def get(self, id):
+        try:
+            data = HotelRateService.get_rates(id, **self.parsed_data)
+        except ClientError as e:
+            return api_response(code=e.errcode, message=e.msg)
+        return api_response(data=data)
+
+
+class HotelQuoteApi(Resource):
+    meta = {
+        'args_parser_dict': {
+            'get': HotelQuoteApiParser(),
+        }
+    }
+
+    def get(self):
+        """?ids=1,2,3&from=&to=&suite_room_number=2&meal_types=1,3批量报价"""
+        parsed_data = self.parsed_data
+        room_number_map = {
+            name: parsed_data[name]
+            for name in HotelQuoteService.ROOM_NUMBER_TYPE_MAP
+        }
+        try:
+            data = HotelQuoteService.quote(
+                parsed_data['ids'], parsed_data['from_time'],
+                parsed_data['to_time'], room_number_map,
+                meal_type_list=parsed_data['meal_types'],
+                people=parsed_data['people'],
+            )
+        except ClientError as e:
+            return api_response(code=e.errcode, message=e.msg)
+        return api_response(data=data)
+
+
+class CityMinRoomPriceApi(Resource):
+    meta = {
+        'args_parser_dict': {
+            'get': CityMinRoomPriceApiParser(),
+        }
+    }
+
+    def get(self):
+        """城市每天(按星级, 房型)的最低房价和对应的酒店"""
+        try:
+            data = CityMinRoomPriceService.search(**self.parsed_data)
+        except ClientError as e:
+            return api_response(code=e.errcode, message=e.msg)
+        return api_response(data=data)
+
+
 class EditRoomPriceApi(Resource):
     meta = {
         'args_parser_dict': {
@@ -458,3 +525,17 @@ class EditFestivalAdditionalChargeApi(Resource):
         except ClientError as e:
             return api_response(code=e.errcode, message=e.msg)
         return api_response()
+
+
+class BatchGetHotelApi(Resource):
+    meta = {
+        'args_parser_dict': {
+            'get': BatchGetHotelApiParser(),
+        }
+    }
+
+    def get(self):
+        """根据?ids=1,2,3批量查询酒店, 返回{id: 酒店信息}"""
+        hotel_map = HotelService.get_by_ids(
+            self.parsed_data['ids'], fields=self.parsed_data['fields'])
+        return api_response(data=hotel_map)
@@ -0,0 +1,15 @@
+# coding: utf-8
+from ...util import Resource, api_response
+from .....db import db_manager
+
+
+class DBPoolStatsApi(Resource):
+    def get(self):
+        """查看各数据库连接池的统计信息"""
+        return api_response(data=db_manager.get_pool_stats())
+
+
+class DBSessionStatsApi(Resource):
+    def get(self):
+        """查看请求结束时Session的identity map大小统计"""
+        return api_response(data=db_manager.get_session_stats())
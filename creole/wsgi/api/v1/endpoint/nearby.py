@@ -0,0 +1,20 @@
+# coding: utf-8
+from ...util import Resource, api_response
+from .....service.nearby import NearbyService
+from ..req_param.nearby import NearbyApiParser
+from creole.exc import ClientError
+
+
+class NearbyApi(Resource):
+    meta = {
+        'args_parser_dict': {
+            'get': NearbyApiParser(),
+        }
+    }
+
+    def get(self):
+        try:
+            data = NearbyService.search(**self.parsed_data)
+        except ClientError as e:
+            return api_response(code=e.errcode, message=e.msg)
+        return api_response(data=data)
@@ -10,19 +10,24 @@ from ..req_param.restaurant import (
     CreateRestaurantApiParser,
     SearchRestaurantApiParser,
     EditRestaurantAccountApiParser,
+    BatchGetRestaurantApiParser,
+    GetRestaurantApiParser,
 )
 from creole.exc import ClientError
+from .....util import gen_next_cursor
 
 
 class RestaurantApi(Resource):
     meta = {
         'args_parser_dict': {
+            'get': GetRestaurantApiParser(),
             'put': CreateRestaurantApiParser(),
         }
     }
 
     def get(self, id):
-        restaurant = RestaurantService.get_by_id(id)
+        restaurant = RestaurantService.get_by_id(
+            id, fields=self.parsed_data['fields'])
         return api_response(data=restaurant)
 
     def put(self, id):
@@ -68,10 +73,13 @@ class SearchRestaurantApi(Resource):
     def get(self):
         restaurant_data, total = \
             RestaurantService.search_restaurant(**self.parsed_data)
-        if self.parsed_data['page'] == 1:
+        if self.parsed_data['page'] == 1 \
+                and self.parsed_data['cursor'] is None:
             data = {'restaurant_data': restaurant_data, 'total': total}
         else:
             data = {'restaurant_data': restaurant_data}
+        data['next_cursor'] = gen_next_cursor(
+            restaurant_data, self.parsed_data['number'], q=self.parsed_data['q'])
         return api_response(data=data)
 
 
@@ -130,3 +138,17 @@ class EditMealApi(Resource):
         except ClientError as e:
             return api_response(code=e.errcode, message=e.msg)
         return api_response()
+
+
+class BatchGetRestaurantApi(Resource):
+    meta = {
+        'args_parser_dict': {
+            'get': BatchGetRestaurantApiParser(),
+        }
+    }
+
+    def get(self):
+        """根据?ids=1,2,3批量查询餐厅, 返回{id: 餐厅信息}"""
+        restaurant_map = RestaurantService.get_by_ids(
+            self.parsed_data['ids'], fields=self.parsed_data['fields'])
+        return api_response(data=restaurant_map)
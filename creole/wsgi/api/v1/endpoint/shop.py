@@ -15,21 +15,29 @@ from ..req_param.shop import (
     CreateShopCompanyContactApiParser,
     CreateShopFeeApiParser,
     CreateShopContactApiParser,
+    BatchGetShopApiParser,
+    GetShopApiParser,
+    GetShopCompanyApiParser,
 )
 from creole.exc import ClientError, CreoleErrCode
+from .....util import gen_next_cursor
 from creole.model.shop import Shop
 
 
 class ShopApi(Resource):
     meta = {
         'args_parser_dict': {
+            'get': GetShopApiParser(),
             'put': CreateShopApiParser(),
         }
     }
 
     def get(self, id):
         """根据ID查询店铺"""
-        shop = ShopService.get_by_id(id)
+        fields = self.parsed_data['fields']
+        shop = ShopService.get_by_id(id, fields=fields)
+        if fields:
+            return api_response(data=shop)
         contact_list = ShopContactService.get_by_shop_id(id)
         fee_list = ShopFeeService.get_fee_by_shop_id(id)
         shop['contact_list'] = contact_list
@@ -81,10 +89,13 @@ class ShopSearchApi(Resource):
         if shop_type and shop_type not in Shop.SHOP_TYPE.values():
             return api_response(code=CreoleErrCode.PARAMETER_ERROR)
         shop_data, total = ShopService.search_shop(**self.parsed_data)
-        if self.parsed_data['page'] == 1:
+        if self.parsed_data['page'] == 1 \
+                and self.parsed_data['cursor'] is None:
             data = {'shop_data': shop_data, 'total': total}
         else:
             data = {'shop_data': shop_data}
+        data['next_cursor'] = gen_next_cursor(
+            shop_data, self.parsed_data['number'], q=self.parsed_data['q'])
         return api_response(data=data)
 
 
@@ -140,13 +151,17 @@ class GetShopContactApi(Resource):
 class ShopCompanyApi(Resource):
     meta = {
         'args_parser_dict': {
+            'get': GetShopCompanyApiParser(),
             'put': CreateShopCompanyApiParser(),
         }
     }
 
     def get(self, id):
         """根据ID查询公司"""
-        company = ShopCompanyService.get_by_id(id)
+        fields = self.parsed_data['fields']
+        company = ShopCompanyService.get_by_id(id, fields=fields)
+        if fields:
+            return api_response(data=company)
         contact_list = ShopCompanyContactService.get_by_company_id(id)
         company['contact_list'] = contact_list
         return api_response(data=company)
@@ -198,11 +213,13 @@ class SearchShopCompanyApi(Resource):
                 ShopCompanyService.search_company(**self.parsed_data)
         except ClientError as e:
             return api_response(code=e.errcode, message=e.msg)
-        if self.parsed_data['page'] == 1:
+        if self.parsed_data['page'] == 1 \
+                and self.parsed_data['cursor'] is None:
             data = {'shop_company_list': shop_company_list, 'total': total}
         else:
             data = {'shop_company_list': shop_company_list}
-
+        data['next_cursor'] = \
+            gen_next_cursor(shop_company_list, self.parsed_data['number'])
         return api_response(data=data)
 
 
@@ -300,3 +317,17 @@ class GetShopFeeApi(Resource):
     def get(self, shop_id):
         fee_list = ShopFeeService.get_fee_by_shop_id(shop_id)
         return api_response(data=fee_list)
+
+
+class BatchGetShopApi(Resource):
+    meta = {
+        'args_parser_dict': {
+            'get': BatchGetShopApiParser(),
+        }
+    }
+
+    def get(self):
+        """根据?ids=1,2,3批量查询购物店, 返回{id: 购物店信息}"""
+        shop_map = ShopService.get_by_ids(
+            self.parsed_data['ids'], fields=self.parsed_data['fields'])
+        return api_response(data=shop_map)
@@ -10,19 +10,24 @@ from ..req_param.tour_guide import (
     CreateTourGuideApiParser,
     CreateTourGuideFeeApiParser,
     EditTourGuideAccountApiParser,
+    BatchGetTourGuideApiParser,
+    GetTourGuideApiParser,
 )
 from creole.exc import ClientError
+from .....util import gen_next_cursor
 
 
 class TourGuideApi(Resource):
     meta = {
         'args_parser_dict': {
+            'get': GetTourGuideApiParser(),
             'put': CreateTourGuideApiParser(),
         }
     }
 
     def get(self, id):
-        tour_guide = TourGuideService.get_by_id(id)
+        tour_guide = TourGuideService.get_by_id(
+            id, fields=self.parsed_data['fields'])
         return api_response(data=tour_guide)
 
     def put(self, id):
@@ -67,10 +72,13 @@ class SearchTourGuideApi(Resource):
     def get(self):
         tour_guide_data, total = \
             TourGuideService.search_tour_guide(**self.parsed_data)
-        if self.parsed_data['page'] == 1:
+        if self.parsed_data['page'] == 1 \
+                and self.parsed_data['cursor'] is None:
             data = {'tour_guide_data': tour_guide_data, 'total': total}
         else:
             data = {'tour_guide_data': tour_guide_data}
+        data['next_cursor'] = gen_next_cursor(
+            tour_guide_data, self.parsed_data['number'], q=self.parsed_data['q'])
         return api_response(data=data)
 
 
@@ -145,3 +153,17 @@ class EditTourGuideAccountApi(Resource):
         except ClientError as e:
             return api_response(code=e.errcode, message=e.msg)
         return api_response()
+
+
+class BatchGetTourGuideApi(Resource):
+    meta = {
+        'args_parser_dict': {
+            'get': BatchGetTourGuideApiParser(),
+        }
+    }
+
+    def get(self):
+        """根据?ids=1,2,3批量查询导游, 返回{id: 导游信息}"""
+        tour_guide_map = TourGuideService.get_by_ids(
+            self.parsed_data['ids'], fields=self.parsed_data['fields'])
+        return api_response(data=tour_guide_map)
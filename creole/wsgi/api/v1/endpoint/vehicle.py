@@ -19,20 +19,29 @@ from ..req_param.vehicle import (
     CreateVehicleTypeApiParser,
     SearchVehicleTypeApiParser,
     CreateVehicleContactApiParser,
+    BatchGetVehicleApiParser,
+    GetVehicleApiParser,
+    GetVehicleCompanyApiParser,
+    GetVehicleFeeApiParser,
+    GetVehicleTypeApiParser,
 )
 from creole.exc import ClientError
-from .....util import timestamp_to_date
+from .....util import timestamp_to_date, gen_next_cursor
 
 
 class VehicleCompanyApi(Resource):
     meta = {
         'args_parser_dict': {
+            'get': GetVehicleCompanyApiParser(),
             'put': CreateVehicleCompanyApiParser(),
         }
     }
 
     def get(self, id):
-        company = VehicleCompanyService.get_by_id(id)
+        fields = self.parsed_data['fields']
+        company = VehicleCompanyService.get_by_id(id, fields=fields)
+        if fields:
+            return api_response(data=company)
         # 获得公司下的所有联系人列表
         contact_list = \
             VehicleContactService.get_contact_list_by_company_id(id)
@@ -88,10 +97,13 @@ class SearchVehicleCompanyApi(Resource):
                 VehicleCompanyService.search_company(**self.parsed_data)
         except ClientError as e:
             return api_response(code=e.errcode, message=e.msg)
-        if self.parsed_data['page'] == 1:
+        if self.parsed_data['page'] == 1 \
+                and self.parsed_data['cursor'] is None:
             data = {'vehicle_company_list': vehicle_company_list, 'total': total}
         else:
             data = {'vehicle_company_list': vehicle_company_list}
+        data['next_cursor'] = \
+            gen_next_cursor(vehicle_company_list, self.parsed_data['number'])
         return api_response(data=data)
 
 
@@ -143,12 +155,14 @@ class CreateVehicleAccountApi(Resource):
 class VehicleTypeApi(Resource):
     meta = {
         'args_parser_dict': {
+            'get': GetVehicleTypeApiParser(),
             'put': CreateVehicleTypeApiParser(),
         }
     }
 
     def get(self, id):
-        vehicle_type = VehicleTypeService.get_type_by_id(id)
+        vehicle_type = VehicleTypeService.get_type_by_id(
+            id, fields=self.parsed_data['fields'])
         return api_response(data=vehicle_type)
 
     def put(self, id):
@@ -176,10 +190,13 @@ class SearchVehicleTypeApi(Resource):
     def get(self):
         vehicle_type_list, total = \
             VehicleTypeService.search_type(**self.parsed_data)
-        if self.parsed_data['page'] == 1:
+        if self.parsed_data['page'] == 1 \
+                and self.parsed_data['cursor'] is None:
             data = {'vehicle_type_list': vehicle_type_list, 'total': total}
         else:
             data = {'vehicle_type_list': vehicle_type_list}
+        data['next_cursor'] = \
+            gen_next_cursor(vehicle_type_list, self.parsed_data['number'])
         return api_response(data=data)
 
 
@@ -206,12 +223,14 @@ class GetVehicleFeeApi(Resource):
 class VehicleFeeApi(Resource):
     meta = {
         'args_parser_dict': {
+            'get': GetVehicleFeeApiParser(),
             'put': CreateVehicleFeeApiParser(),
         }
     }
 
     def get(self, id):
-        fee = VehicleFeeService.get_by_id(id)
+        fee = VehicleFeeService.get_by_id(
+            id, fields=self.parsed_data['fields'])
         return api_response(data=fee)
 
     def put(self, id):
@@ -252,10 +271,13 @@ class SearchVehicleFeeApi(Resource):
             end_time_stamp = int(end_time)
             parsed_data['end_time'] = timestamp_to_date(end_time_stamp)
         vehicle_fee_list, total = VehicleFeeService.search_fee(**parsed_data)
-        if self.parsed_data['page'] == 1:
+        if self.parsed_data['page'] == 1 \
+                and self.parsed_data['cursor'] is None:
             data = {'vehicle_fee_list': vehicle_fee_list, 'total': total}
         else:
             data = {'vehicle_fee_list': vehicle_fee_list}
+        data['next_cursor'] = \
+            gen_next_cursor(vehicle_fee_list, self.parsed_data['number'])
         return api_response(data=data)
 
 
@@ -331,12 +353,14 @@ class CreateVehicleContactApi(Resource):
 class VehicleApi(Resource):
     meta = {
         'args_parser_dict': {
+            'get': GetVehicleApiParser(),
             'put': CreateVehicleApiParser(),
         }
     }
 
     def get(self, id):
-        vehicle = VehicleService.get_by_id(id)
+        vehicle = VehicleService.get_by_id(
+            id, fields=self.parsed_data['fields'])
         return api_response(data=vehicle)
 
     def put(self, id):
@@ -385,8 +409,25 @@ class SearchVehicleApi(Resource):
             vehicle_list, total = VehicleService.search_vehicle(**self.parsed_data)
         except ClientError as e:
             return api_response(code=e.errcode, message=e.msg)
-        if self.parsed_data['page'] == 1:
+        if self.parsed_data['page'] == 1 \
+                and self.parsed_data['cursor'] is None:
             data = {'vehicle_data': vehicle_list, 'total': total}
         else:
             data = {'vehicle_data': vehicle_list}
+        data['next_cursor'] = \
+            gen_next_cursor(vehicle_list, self.parsed_data['number'])
         return api_response(data=data)
+
+
+class BatchGetVehicleApi(Resource):
+    meta = {
+        'args_parser_dict': {
+            'get': BatchGetVehicleApiParser(),
+        }
+    }
+
+    def get(self):
+        """根据?ids=1,2,3批量查询车辆, 返回{id: 车辆信息}"""
+        vehicle_map = VehicleService.get_by_ids(
+            self.parsed_data['ids'], fields=self.parsed_data['fields'])
+        return api_response(data=vehicle_map)
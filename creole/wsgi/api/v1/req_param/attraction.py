@@ -1,18 +1,26 @@
 # coding: utf-8
 from flask_restful.reqparse import Argument
 
+from .mixins import (
+    BatchGetParserMixin,
+    CursorParserMixin,
+    FieldsParserMixin,
+    GeoParserMixin,
+)
 from ...util import BaseRequestParser
 
 
-class SearchAttractionApiParser(BaseRequestParser):
+class SearchAttractionApiParser(
+        CursorParserMixin, FieldsParserMixin, BaseRequestParser):
     country_id = Argument('country_id', type=int, required=False)
     city_id = Argument('city_id', type=int, required=False)
     name = Argument('name', required=False)
+    q = Argument('q', required=False)
     page = Argument('page', type=int, default=1, required=False)
     number = Argument('number', type=int, default=20, required=False)
 
 
-class CreateAttractionApiParser(BaseRequestParser):
+class CreateAttractionApiParser(GeoParserMixin, BaseRequestParser):
     country_id = Argument('country_id', type=int, nullable=False, required=True)
     city_id = Argument('city_id', type=int, nullable=False, required=True)
     address = Argument('address', nullable=False, required=True)
@@ -33,3 +41,12 @@ class CreateAttractionFeeApiParser(BaseRequestParser):
     free_policy = Argument('free_policy', type=int, nullable=False, required=True)
     child_discount = Argument('child_discount', type=float, nullable=False, required=True)
     note = Argument('note', required=False)
+
+
+class BatchGetAttractionApiParser(
+        BatchGetParserMixin, FieldsParserMixin, BaseRequestParser):
+    pass
+
+
+class GetAttractionApiParser(FieldsParserMixin, BaseRequestParser):
+    pass
@@ -0,0 +1,11 @@
+# coding: utf-8
+from flask_restful.reqparse import Argument
+
+from ...util import BaseRequestParser
+
+
+class CatalogSearchApiParser(BaseRequestParser):
+    country_id = Argument('country_id', type=int, required=False)
+    city_id = Argument('city_id', type=int, required=False)
+    q = Argument('q', required=False)
+    number = Argument('number', type=int, default=10, required=False)
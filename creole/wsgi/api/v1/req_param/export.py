@@ -0,0 +1,9 @@
+# coding: utf-8
+from flask_restful.reqparse import Argument
+
+from ...util import BaseRequestParser
+from .mixins import FieldsParserMixin
+
+
+class ExportApiParser(FieldsParserMixin, BaseRequestParser):
+    updated_since = Argument('updated_since', type=int, required=False)
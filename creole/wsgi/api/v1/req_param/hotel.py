@@ -8,6 +8,11 @@ from .mixins import (
     ContactParserMixin,
     CompanyParserMixin,
     AccountParserMixin,
+    BatchGetParserMixin,
+    CursorParserMixin,
+    FieldsParserMixin,
+    GeoParserMixin,
+    id_list_type,
 )
 from ...util import BaseRequestParser
 from creole.util import Enum
@@ -24,14 +29,15 @@ class CreateHotelCompanyApiParser(CompanyParserMixin, BaseRequestParser):
     note = Argument('intro')
 
 
-class SearchHotelCompanyApiParser(BaseRequestParser):
+class SearchHotelCompanyApiParser(
+        CursorParserMixin, FieldsParserMixin, BaseRequestParser):
     country_id = Argument('country_id', type=int, required=False)
     city_id = Argument('city_id', type=int, required=False)
     number = Argument('number', type=int, default=20, required=False)
     page = Argument('page', type=int, default=1, required=False)
 
 
-class CreateHotelApiParser(BaseRequestParser):
+class CreateHotelApiParser(GeoParserMixin, BaseRequestParser):
     LEVEL = Enum(
         ('ONE', 1, u'一星'),
         ('TWO', 2, u'二星'),
@@ -66,7 +72,8 @@ class CreateHotelApiParser(BaseRequestParser):
     intro_en = Argument('intro_en')
 
 
-class SearchHotelApiParser(BaseRequestParser):
+class SearchHotelApiParser(
+        CursorParserMixin, FieldsParserMixin, BaseRequestParser):
     country_id = Argument('country_id', type=int, required=False)
     city_id = Argument('city_id', type=int, required=False)
     company_id = Argument('company_id', type=int, required=False)
@@ -74,6 +81,7 @@ class SearchHotelApiParser(BaseRequestParser):
     name_en = Argument('name_en', required=False)
     nickname_en = Argument('nickname_en', required=False)
     star_level = Argument('star_level', type=int, required=False)
+    q = Argument('q', required=False)
     page = Argument('page', type=int, default=1, required=False)
     number = Argument('number', type=int, default=20, required=False)
 
@@ -192,3 +200,54 @@ class EditFestivalAdditionalChargeApiParser(BaseRequestParser):
         type=dict_parser_func(param_mapping=_UPDATE_PARAM_MAPPING))
     delete_id_list = Argument(
         'delete_id_list', type=int, required=False, action='append')
+
+
+class BatchGetHotelApiParser(
+        BatchGetParserMixin, FieldsParserMixin, BaseRequestParser):
+    pass
+
+
+class GetHotelApiParser(FieldsParserMixin, BaseRequestParser):
+    pass
+
+
+class GetHotelCompanyApiParser(FieldsParserMixin, BaseRequestParser):
+    pass
+
+
+class GetHotelRatesApiParser(BaseRequestParser):
+    # from/to是入住和离店日期的时间戳
+    from_time = Argument(
+        'from', dest='from_time', type=int, nullable=False, required=True)
+    to_time = Argument(
+        'to', dest='to_time', type=int, nullable=False, required=True)
+    room_type = Argument('room_type', type=int, nullable=False, required=True)
+    room_level = Argument('room_level', type=int, required=False)
+
+
+class HotelQuoteApiParser(BatchGetParserMixin, BaseRequestParser):
+    from_time = Argument(
+        'from', dest='from_time', type=int, nullable=False, required=True)
+    to_time = Argument(
+        'to', dest='to_time', type=int, nullable=False, required=True)
+    standard_room_number = Argument(
+        'standard_room_number', type=int, default=0, required=False)
+    standard_double_room_number = Argument(
+        'standard_double_room_number', type=int, default=0, required=False)
+    triple_room_number = Argument(
+        'triple_room_number', type=int, default=0, required=False)
+    suite_room_number = Argument(
+        'suite_room_number', type=int, default=0, required=False)
+    tour_guide_room_number = Argument(
+        'tour_guide_room_number', type=int, default=0, required=False)
+    meal_types = Argument('meal_types', type=id_list_type, required=False)
+    people = Argument('people', type=int, required=False)
+
+
+class CityMinRoomPriceApiParser(BaseRequestParser):
+    city_id = Argument('city_id', type=int, nullable=False, required=True)
+    from_time = Argument(
+        'from', dest='from_time', type=int, nullable=False, required=True)
+    to_time = Argument('to', dest='to_time', type=int, required=False)
+    star_level = Argument('star_level', type=int, required=False)
+    room_type = Argument('room_type', type=int, required=False)
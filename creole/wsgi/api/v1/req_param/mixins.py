@@ -1,7 +1,7 @@
 # coding: utf-8
 from flask_restful.reqparse import Argument
 
-from creole.util import Enum
+from creole.util import Enum, decode_cursor
 
 
 class AccountParserMixin(object):
@@ -39,6 +39,53 @@ class CompanyParserMixin(object):
     register_number = Argument('register_number', nullable=False, required=True)
 
 
+# 批量查询时一次最多允许的id个数
+MAX_BATCH_ID_NUMBER = 200
+
+
+def id_list_type(value):
+    """解析逗号分隔的id列表, 如: 1,2,3"""
+    try:
+        id_list = [int(item) for item in value.split(',') if item.strip()]
+    except ValueError:
+        raise ValueError('Invalid ids: {!r}'.format(value))
+    if not id_list:
+        raise ValueError('Required value: ids')
+    if len(id_list) > MAX_BATCH_ID_NUMBER:
+        raise ValueError(
+            'Too many ids, at most {}'.format(MAX_BATCH_ID_NUMBER))
+    return id_list
+
+
+class BatchGetParserMixin(object):
+    ids = Argument('ids', type=id_list_type, required=True, nullable=False)
+
+
+class CursorParserMixin(object):
+    """keyset分页, 传了cursor时忽略page, 按id从上一页最后一条之后开始取"""
+    cursor = Argument('cursor', type=decode_cursor, required=False)
+
+
+def field_list_type(value):
+    """解析逗号分隔的字段列表, 如: name,city_id; 总是包含id(cursor分页需要)"""
+    field_list = ['id']
+    for item in value.split(','):
+        item = item.strip()
+        if item and item not in field_list:
+            field_list.append(item)
+    return field_list
+
+
+class FieldsParserMixin(object):
+    """只返回fields中的字段, 不传时返回全部字段"""
+    fields = Argument('fields', type=field_list_type, required=False)
+
+
+class GeoParserMixin(object):
+    latitude = Argument('latitude', type=float, required=False)
+    longitude = Argument('longitude', type=float, required=False)
+
+
 def dict_parser_func(param_mapping):
     def wrapper(item_dict):
         _item_dict = {}
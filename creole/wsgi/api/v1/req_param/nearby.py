@@ -0,0 +1,21 @@
+# coding: utf-8
+from flask_restful.reqparse import Argument
+
+from ...util import BaseRequestParser
+from .mixins import FieldsParserMixin
+
+
+def type_list_type(value):
+    """解析逗号分隔的资源类型, 如: restaurant,shop"""
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+class NearbyApiParser(FieldsParserMixin, BaseRequestParser):
+    latitude = Argument('latitude', type=float, required=False)
+    longitude = Argument('longitude', type=float, required=False)
+    # 以某个资源为中心搜索, 代替latitude/longitude
+    entity = Argument('entity', required=False)
+    id = Argument('id', type=int, required=False)
+    types = Argument('types', type=type_list_type, required=False)
+    radius = Argument('radius', type=float, default=5, required=False)
+    number = Argument('number', type=int, default=10, required=False)
@@ -3,7 +3,13 @@ from flask_restful.reqparse import Argument
 
 from creole.util import Enum
 from ...util import BaseRequestParser
-from .mixins import dict_parser_func
+from .mixins import (
+    dict_parser_func,
+    BatchGetParserMixin,
+    CursorParserMixin,
+    FieldsParserMixin,
+    GeoParserMixin,
+)
 
 
 # 餐厅类型
@@ -16,7 +22,7 @@ RESTAURANT_TYPE = Enum(
 )
 
 
-class CreateRestaurantApiParser(BaseRequestParser):
+class CreateRestaurantApiParser(GeoParserMixin, BaseRequestParser):
     ENVIRON_LEVEL = Enum(
         ('EXCELLENT', 1, u'卓越'),
         ('VERY_GOOD', 2, u'非常好'),
@@ -132,12 +138,14 @@ class EditRestaurantAccountApiParser(BaseRequestParser):
         'delete_id_list', type=int, required=False, action='append')
 
 
-class SearchRestaurantApiParser(BaseRequestParser):
+class SearchRestaurantApiParser(
+        CursorParserMixin, FieldsParserMixin, BaseRequestParser):
     country_id = Argument('country_id', type=int, required=False)
     city_id = Argument('city_id', type=int, required=False)
     restaurant_type = Argument(
         'restaurant_type', required=False, type=int,
         choices=RESTAURANT_TYPE.values())
+    q = Argument('q', required=False)
     page = Argument('page', type=int, default=1, required=False)
     number = Argument('number', type=int, default=20, required=False)
 
@@ -174,3 +182,12 @@ class EditMealApiParser(BaseRequestParser):
         required=False, action='append')
     delete_id_list = Argument(
         'delete_id_list', type=int, required=False, action='append')
+
+
+class BatchGetRestaurantApiParser(
+        BatchGetParserMixin, FieldsParserMixin, BaseRequestParser):
+    pass
+
+
+class GetRestaurantApiParser(FieldsParserMixin, BaseRequestParser):
+    pass
@@ -3,10 +3,17 @@ from flask_restful.reqparse import Argument
 
 from creole.util import Enum
 from ...util import BaseRequestParser
-from .mixins import CompanyParserMixin, ContactParserMixin
+from .mixins import (
+    CompanyParserMixin,
+    ContactParserMixin,
+    BatchGetParserMixin,
+    CursorParserMixin,
+    FieldsParserMixin,
+    GeoParserMixin,
+)
 
 
-class CreateShopApiParser(BaseRequestParser):
+class CreateShopApiParser(GeoParserMixin, BaseRequestParser):
     SHOP_TYPE = Enum(
         ('JEWELRY', 1, u'珠宝'),
         ('TEA', 2, u'红茶'),
@@ -27,11 +34,13 @@ class CreateShopApiParser(BaseRequestParser):
     note = Argument('note')
 
 
-class ShopSearchApiParser(BaseRequestParser):
+class ShopSearchApiParser(
+        CursorParserMixin, FieldsParserMixin, BaseRequestParser):
     country_id = Argument('country_id', type=int, required=False)
     city_id = Argument('city_id', type=int, required=False)
     company_id = Argument('company_id', type=int, required=False)
     shop_type = Argument('shop_type', type=int, required=False)
+    q = Argument('q', required=False)
     page = Argument('page', type=int, default=1, required=False)
     number = Argument('number', type=int, default=20, required=False)
 
@@ -39,7 +48,8 @@ class CreateShopCompanyApiParser(CompanyParserMixin, BaseRequestParser):
     intro = Argument('intro')
 
 
-class SearchShopCompanyApiParser(BaseRequestParser):
+class SearchShopCompanyApiParser(
+        CursorParserMixin, FieldsParserMixin, BaseRequestParser):
     name = Argument('name', required=False)
     name_en = Argument('name_en', required=False)
     country_id = Argument('country_id', type=int, required=False)
@@ -82,3 +92,16 @@ class CreateShopFeeApiParser(BaseRequestParser):
         'account_way', type=int, choices=ACCOUNT_WAY.values(),
         required=True, nullable=False)
     note = Argument('note')
+
+
+class BatchGetShopApiParser(
+        BatchGetParserMixin, FieldsParserMixin, BaseRequestParser):
+    pass
+
+
+class GetShopApiParser(FieldsParserMixin, BaseRequestParser):
+    pass
+
+
+class GetShopCompanyApiParser(FieldsParserMixin, BaseRequestParser):
+    pass
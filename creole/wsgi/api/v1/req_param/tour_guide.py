@@ -1,7 +1,12 @@
 # coding: utf-8
 from flask_restful.reqparse import Argument
 
-from .mixins import dict_parser_func
+from .mixins import (
+    dict_parser_func,
+    BatchGetParserMixin,
+    CursorParserMixin,
+    FieldsParserMixin,
+)
 from ...util import BaseRequestParser
 from creole.util import Enum
 
@@ -20,10 +25,12 @@ GENDER = Enum(
 )
 
 
-class SearchTourGuideApiParser(BaseRequestParser):
+class SearchTourGuideApiParser(
+        CursorParserMixin, FieldsParserMixin, BaseRequestParser):
     country_id = Argument('country_id', type=int)
     gender = Argument('gender', type=int, choices=GENDER.values())
     guide_type = Argument('guide_type', type=int, choices=GUIDE_TYPE.values())
+    q = Argument('q', required=False)
     page = Argument('page', type=int, default=1, required=False)
     number = Argument('number', type=int, default=20, required=False)
 
@@ -130,3 +137,12 @@ class EditTourGuideAccountApiParser(BaseRequestParser):
         required=False, action='append')
     delete_id_list = Argument(
         'delete_id_list', type=int, required=False, action='append')
+
+
+class BatchGetTourGuideApiParser(
+        BatchGetParserMixin, FieldsParserMixin, BaseRequestParser):
+    pass
+
+
+class GetTourGuideApiParser(FieldsParserMixin, BaseRequestParser):
+    pass
@@ -5,6 +5,9 @@ from .mixins import (
     AccountParserMixin,
     ContactParserMixin,
     CompanyParserMixin,
+    BatchGetParserMixin,
+    CursorParserMixin,
+    FieldsParserMixin,
 )
 from ...util import BaseRequestParser
 from creole.util import Enum
@@ -32,7 +35,8 @@ class CreateVehicleCompanyApiParser(CompanyParserMixin, BaseRequestParser):
     vehicle_number = Argument('vehicle_number', type=int, nullable=False, required=True)
 
 
-class SearchVehicleCompanyApiParser(BaseRequestParser):
+class SearchVehicleCompanyApiParser(
+        CursorParserMixin, FieldsParserMixin, BaseRequestParser):
     COMPANY_TYPE = Enum(
         ('COMPANY', 1, u'公司'),
         ('PERSON', 2, u'个人'),
@@ -48,7 +52,8 @@ class SearchVehicleCompanyApiParser(BaseRequestParser):
     page = Argument('page', type=int, default=1, required=False)
 
 
-class SearchVehicleApiParser(BaseRequestParser):
+class SearchVehicleApiParser(
+        CursorParserMixin, FieldsParserMixin, BaseRequestParser):
     country_id = Argument('country_id', type=int, required=False)
     city_id = Argument('city_id', type=int, required=False)
     company_id = Argument('company_id', type=int, required=False)
@@ -85,7 +90,8 @@ class CreateVehicleFeeApiParser(BaseRequestParser):
         nullable=False, location=('json', 'form'))
 
 
-class SearchVehicleFeeApiParser(BaseRequestParser):
+class SearchVehicleFeeApiParser(
+        CursorParserMixin, FieldsParserMixin, BaseRequestParser):
     vehicle_type_id = Argument('vehicle_type_id', required=False, type=int)
     company_id = Argument('company_id', required=False, type=int)
     unit_price = Argument('unit_price', required=False, type=float)
@@ -119,7 +125,8 @@ class CreateVehicleTypeApiParser(BaseRequestParser):
     note = Argument('note')
 
 
-class SearchVehicleTypeApiParser(BaseRequestParser):
+class SearchVehicleTypeApiParser(
+        CursorParserMixin, FieldsParserMixin, BaseRequestParser):
     VEHICLE_TYPE = Enum(
         ('CAR', 1, u'轿车'),
         ('VAN', 2, u'货车'),
@@ -140,3 +147,24 @@ class CreateVehicleContactApiParser(ContactParserMixin, BaseRequestParser):
     company_id = Argument(
         'company_id', required=True, nullable=False,
         type=int, location=('json', 'form'))
+
+
+class BatchGetVehicleApiParser(
+        BatchGetParserMixin, FieldsParserMixin, BaseRequestParser):
+    pass
+
+
+class GetVehicleApiParser(FieldsParserMixin, BaseRequestParser):
+    pass
+
+
+class GetVehicleCompanyApiParser(FieldsParserMixin, BaseRequestParser):
+    pass
+
+
+class GetVehicleFeeApiParser(FieldsParserMixin, BaseRequestParser):
+    pass
+
+
+class GetVehicleTypeApiParser(FieldsParserMixin, BaseRequestParser):
+    pass
@@ -1,7 +1,9 @@
 import logging
 
-from flask import Flask
+from flask import Flask, request
 
+from .. import profiler
+from ..db import db_manager
 from ..request import CreoleRequest
 from ..log import setup_logging
 from .api.v1 import blue_print as v1_bp
@@ -31,10 +33,28 @@ class CreoleApp(Flask):
         pass
 
     def _register_before_request_handlers(self):
-        pass
+        self.before_request(self._start_sql_profile)
 
     def _register_after_request_handlers(self):
-        pass
+        self.after_request(self._report_sql_profile)
+        self.teardown_request(self._finish_sql_profile)
+        self.teardown_request(self._remove_db_sessions)
+
+    def _start_sql_profile(self):
+        profiler.start(request.rid)
+
+    def _report_sql_profile(self, response):
+        profile = profiler.get(request.rid)
+        if profile is not None:
+            response.headers['Server-Timing'] = profile.server_timing()
+            profile.log(request.endpoint)
+        return response
+
+    def _finish_sql_profile(self, exc=None):
+        profiler.finish(request.rid)
+
+    def _remove_db_sessions(self, exc=None):
+        db_manager.remove_sessions()
 
 
 _wsgi_app = CreoleApp('creole')
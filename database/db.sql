@@ -35,6 +35,8 @@ CREATE TABLE `attraction` (
   `intro_cn` varchar(128) DEFAULT NULL,
   `intro_en` varchar(128) DEFAULT NULL,
   `note` varchar(100) DEFAULT NULL,
+  `latitude` double DEFAULT NULL,
+  `longitude` double DEFAULT NULL,
   PRIMARY KEY (`id`),
   UNIQUE KEY `name` (`name`),
   UNIQUE KEY `name_en` (`name_en`),
@@ -42,7 +44,9 @@ CREATE TABLE `attraction` (
   KEY `ix_country_id` (`country_id`),
   KEY `ix_updated_at` (`updated_at`),
   KEY `ix_city_id` (`city_id`),
-  KEY `ix_created_at` (`created_at`)
+  KEY `ix_created_at` (`created_at`),
+  FULLTEXT KEY `ft_intro_cn` (`intro_cn`) /*!50100 WITH PARSER `ngram` */,
+  FULLTEXT KEY `ft_intro_en` (`intro_en`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8;
 /*!40101 SET character_set_client = @saved_cs_client */;
 
@@ -100,6 +104,30 @@ CREATE TABLE `city` (
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8;
 /*!40101 SET character_set_client = @saved_cs_client */;
 
+--
+-- Table structure for table `city_min_room_price`
+--
+
+DROP TABLE IF EXISTS `city_min_room_price`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!40101 SET character_set_client = utf8 */;
+CREATE TABLE `city_min_room_price` (
+  `id` int(11) NOT NULL AUTO_INCREMENT,
+  `created_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  `updated_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  `city_id` int(11) NOT NULL,
+  `date` datetime NOT NULL,
+  `star_level` tinyint(4) NOT NULL,
+  `room_type` tinyint(4) NOT NULL,
+  `price` float NOT NULL,
+  `hotel_id` int(11) NOT NULL,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `uq_city_star_date_room` (`city_id`,`star_level`,`date`,`room_type`),
+  KEY `ix_created_at` (`created_at`),
+  KEY `ix_updated_at` (`updated_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
 --
 -- Table structure for table `country`
 --
@@ -129,6 +157,28 @@ CREATE TABLE `country` (
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8;
 /*!40101 SET character_set_client = @saved_cs_client */;
 
+--
+-- Table structure for table `data_version`
+--
+
+DROP TABLE IF EXISTS `data_version`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!40101 SET character_set_client = utf8 */;
+CREATE TABLE `data_version` (
+  `id` int(11) NOT NULL AUTO_INCREMENT,
+  `created_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  `updated_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  `name` varchar(30) NOT NULL,
+  `version` int(11) NOT NULL,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `name` (`name`),
+  KEY `ix_updated_at` (`updated_at`),
+  KEY `ix_created_at` (`created_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+INSERT INTO `data_version` (`name`, `version`) VALUES ('country_city', 0);
+
 --
 -- Table structure for table `festival_additional_charge`
 --
@@ -183,13 +233,22 @@ CREATE TABLE `hotel` (
   `email` varchar(30) NOT NULL,
   `intro_cn` varchar(500) DEFAULT NULL,
   `intro_en` varchar(800) DEFAULT NULL,
+  `latitude` double DEFAULT NULL,
+  `longitude` double DEFAULT NULL,
   PRIMARY KEY (`id`),
   UNIQUE KEY `name` (`name`),
   UNIQUE KEY `name_en` (`name_en`),
   UNIQUE KEY `nickname_en` (`nickname_en`),
   KEY `ix_updated_at` (`updated_at`),
   KEY `ix_company_id` (`company_id`),
-  KEY `ix_created_at` (`created_at`)
+  KEY `ix_created_at` (`created_at`),
+  KEY `ix_country_id` (`country_id`),
+  KEY `ix_city_id` (`city_id`),
+  KEY `ix_star_level` (`star_level`),
+  KEY `idx_country_id_star_level` (`country_id`,`star_level`),
+  KEY `idx_city_id_star_level` (`city_id`,`star_level`),
+  FULLTEXT KEY `ft_intro_cn` (`intro_cn`) /*!50100 WITH PARSER `ngram` */,
+  FULLTEXT KEY `ft_intro_en` (`intro_en`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8;
 /*!40101 SET character_set_client = @saved_cs_client */;
 
@@ -319,7 +378,8 @@ CREATE TABLE `hotel_fee` (
   `attachment_hash` varchar(128) DEFAULT NULL,
   PRIMARY KEY (`id`),
   KEY `ix_created_at` (`created_at`),
-  KEY `ix_updated_at` (`updated_at`)
+  KEY `ix_updated_at` (`updated_at`),
+  KEY `ix_hotel_id` (`hotel_id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8;
 /*!40101 SET character_set_client = @saved_cs_client */;
 
@@ -416,6 +476,8 @@ CREATE TABLE `restaurant` (
   `upgrade_meal_intro_en` varchar(800) DEFAULT NULL,
   `luxury_meal_intro_cn` varchar(500) DEFAULT NULL,
   `luxury_meal_intro_en` varchar(800) DEFAULT NULL,
+  `latitude` double DEFAULT NULL,
+  `longitude` double DEFAULT NULL,
   PRIMARY KEY (`id`),
   UNIQUE KEY `name` (`name`),
   UNIQUE KEY `name_en` (`name_en`),
@@ -426,7 +488,11 @@ CREATE TABLE `restaurant` (
   KEY `ix_name` (`name`),
   KEY `ix_city_id` (`city_id`),
   KEY `ix_country_id` (`country_id`),
-  KEY `ix_restaurant_type` (`restaurant_type`)
+  KEY `ix_restaurant_type` (`restaurant_type`),
+  KEY `idx_country_id_restaurant_type` (`country_id`,`restaurant_type`),
+  KEY `idx_city_id_restaurant_type` (`city_id`,`restaurant_type`),
+  FULLTEXT KEY `ft_meal_intro_cn` (`standard_meal_intro_cn`,`upgrade_meal_intro_cn`,`luxury_meal_intro_cn`) /*!50100 WITH PARSER `ngram` */,
+  FULLTEXT KEY `ft_meal_intro_en` (`standard_meal_intro_en`,`upgrade_meal_intro_en`,`luxury_meal_intro_en`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8;
 /*!40101 SET character_set_client = @saved_cs_client */;
 
@@ -551,6 +617,8 @@ CREATE TABLE `shop` (
   `intro_cn` varchar(500) DEFAULT NULL,
   `intro_en` varchar(500) DEFAULT NULL,
   `note` varchar(100) DEFAULT NULL,
+  `latitude` double DEFAULT NULL,
+  `longitude` double DEFAULT NULL,
   PRIMARY KEY (`id`),
   UNIQUE KEY `name` (`name`),
   UNIQUE KEY `name_en` (`name_en`),
@@ -561,7 +629,9 @@ CREATE TABLE `shop` (
   KEY `ix_company_id` (`company_id`),
   KEY `ix_country_id` (`country_id`),
   KEY `ix_city_id` (`city_id`),
-  KEY `idx_country_id_city_id_company_id_shop_type` (`country_id`,`city_id`,`company_id`,`shop_type`)
+  KEY `idx_country_id_city_id_company_id_shop_type` (`country_id`,`city_id`,`company_id`,`shop_type`),
+  FULLTEXT KEY `ft_intro_cn` (`intro_cn`) /*!50100 WITH PARSER `ngram` */,
+  FULLTEXT KEY `ft_intro_en` (`intro_en`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8;
 /*!40101 SET character_set_client = @saved_cs_client */;
 
@@ -733,7 +803,10 @@ CREATE TABLE `tour_guide` (
   KEY `idx_name_name_en` (`name`,`name_en`),
   KEY `ix_updated_at` (`updated_at`),
   KEY `ix_country_id` (`country_id`),
-  KEY `ix_name` (`name`)
+  KEY `ix_name` (`name`),
+  KEY `ix_guide_type` (`guide_type`),
+  KEY `idx_country_id_guide_type` (`country_id`,`guide_type`),
+  FULLTEXT KEY `ft_intro` (`intro`) /*!50100 WITH PARSER `ngram` */
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8;
 /*!40101 SET character_set_client = @saved_cs_client */;
 
@@ -952,7 +1025,13 @@ CREATE TABLE `vehicle_fee` (
   `attachment_hash` varchar(128) NOT NULL,
   PRIMARY KEY (`id`),
   KEY `ix_created_at` (`created_at`),
-  KEY `ix_updated_at` (`updated_at`)
+  KEY `ix_updated_at` (`updated_at`),
+  KEY `idx_company_id_start_time` (`company_id`,`start_time`),
+  KEY `idx_vehicle_type_id_start_time` (`vehicle_type_id`,`start_time`),
+  KEY `ix_start_time` (`start_time`),
+  KEY `ix_end_time` (`end_time`),
+  KEY `ix_unit_price` (`unit_price`),
+  KEY `ix_confirm_person` (`confirm_person`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8;
 /*!40101 SET character_set_client = @saved_cs_client */;
 
@@ -994,7 +1073,8 @@ CREATE TABLE `vehicle_type` (
   `note` varchar(100) DEFAULT NULL,
   PRIMARY KEY (`id`),
   KEY `ix_created_at` (`created_at`),
-  KEY `ix_updated_at` (`updated_at`)
+  KEY `ix_updated_at` (`updated_at`),
+  KEY `ix_vehicle_type` (`vehicle_type`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8;
 /*!40101 SET character_set_client = @saved_cs_client */;
 
@@ -1,8 +1,21 @@
 # -*- coding:utf-8 -*-
+import sys
 import argparse
 from sqlalchemy import create_engine
 
 from creole.model.user import Base
+from creole.model import (
+    DBSession,
+    attraction,
+    hotel,
+    restaurant,
+    shop,
+    tour_guide,
+    fulltext,
+    index_check,
+    bulk_import,
+    city_min_price,
+)
 from creole.config import setting
 
 engine = create_engine(setting.CREOLE_DB_URL, echo=True)
@@ -16,10 +29,65 @@ def drop_all():
     Base.metadata.drop_all(engine)
 
 
+def ensure_fulltext():
+    for name in fulltext.ensure_indexes(engine):
+        print('created fulltext index: {}'.format(name))
+
+
+def ensure_indexes():
+    for name in index_check.ensure_indexes(engine):
+        print('created index: {}'.format(name))
+
+
+def explain_searches():
+    """EXPLAIN所有search()过滤条件组合, 有全表扫描时以非0状态退出"""
+    problems = index_check.check_searches()
+    for model_name, kwargs, statement, row in problems:
+        print('full scan: {} {!r}'.format(model_name, kwargs))
+        print('    {}'.format(' '.join(statement.split())))
+        print('    {!r}'.format(row))
+    if problems:
+        sys.exit(1)
+    print('ok: no full table scan found')
+
+
+def import_file(entity, path, file_format=None, reject_path=None,
+                batch_size=bulk_import.IMPORT_BATCH_SIZE):
+    """批量导入, 有被拒绝的行时以非0状态退出"""
+    result = bulk_import.import_file(
+        entity, path, file_format=file_format, reject_path=reject_path,
+        batch_size=batch_size)
+    print('read: {} inserted: {} rejected: {}'.format(
+        result.read, result.inserted, result.rejected))
+    if result.rejected:
+        if reject_path:
+            print('rejected rows written to {}'.format(reject_path))
+        sys.exit(1)
+
+
+def rebuild_min_price():
+    """全量重建城市每天的最低房价表"""
+    session = DBSession()
+    city_min_price.CityMinRoomPrice.rebuild_all()
+    session.commit()
+    print('rebuilt city_min_room_price')
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('-c', '--cmd', help='db command',
-                        choices=['create', 'drop', 'refresh', 'import'])
+                        choices=['create', 'drop', 'refresh', 'import',
+                                 'fulltext', 'index', 'explain',
+                                 'min_price'])
+    parser.add_argument('-e', '--entity', help='entity to import',
+                        choices=sorted(bulk_import.IMPORT_SPECS))
+    parser.add_argument('-f', '--file', help='csv/json/ndjson file to import')
+    parser.add_argument('--format', help='file format, default by extension',
+                        choices=sorted(bulk_import.READERS))
+    parser.add_argument('--rejects', help='write rejected rows to this file')
+    parser.add_argument('--batch-size', type=int,
+                        default=bulk_import.IMPORT_BATCH_SIZE,
+                        help='rows per validation batch and transaction')
     args = parser.parse_args()
 
     if args.cmd and args.cmd == 'create':
@@ -29,6 +97,19 @@ def main():
     elif args.cmd and args.cmd == 'refresh':
         drop_all()
         create_all()
+    elif args.cmd and args.cmd == 'fulltext':
+        ensure_fulltext()
+    elif args.cmd and args.cmd == 'index':
+        ensure_indexes()
+    elif args.cmd and args.cmd == 'explain':
+        explain_searches()
+    elif args.cmd and args.cmd == 'min_price':
+        rebuild_min_price()
+    elif args.cmd and args.cmd == 'import':
+        if not args.entity or not args.file:
+            parser.error('import requires --entity and --file')
+        import_file(args.entity, args.file, file_format=args.format,
+                    reject_path=args.rejects, batch_size=args.batch_size)
 
 if __name__ == '__main__':
     main()